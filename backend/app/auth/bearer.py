@@ -1,20 +1,28 @@
 """
 Bearer token authentication dependency for FastAPI.
 
-Extracts the JWT from the Authorization header and validates it.
+Extracts the JWT from the Authorization header, validates it and checks it
+against the revocation list; the payload is left on ``request.state.user``
+for the access log. Rejections are recorded as audit events. require_admin
+additionally requires one of the ``ADMIN_GROUPS`` in the caller's groups
+or roles claim.
 In MOCK_MODE, any non-empty token structured as a JWT is accepted.
 """
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from app.auth.entra import validate_token
+from app.auth.entra import verify_token
+from app.auth.revocation import get_revocation_list
 from app.config import Settings, get_settings
+from app.metrics import AUTH_FAILURES
+from app.services.access_log import audit
 
 _bearer_scheme = HTTPBearer(auto_error=True)
 
 
 async def require_auth(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(_bearer_scheme),
     settings: Settings = Depends(get_settings),
 ) -> dict:
@@ -26,12 +34,45 @@ async def require_auth(
     """
     token = credentials.credentials
 
-    payload = validate_token(token, settings)
+    payload = await verify_token(token, settings)
     if payload is None:
+        AUTH_FAILURES.inc()
+        audit("authenticate", None, outcome="invalid_token", path=request.url.path)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if get_revocation_list(settings).is_revoked(payload):
+        AUTH_FAILURES.inc()
+        audit("authenticate", payload, outcome="revoked", path=request.url.path)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    request.state.user = payload
     return payload
+
+
+async def require_admin(
+    user: dict = Depends(require_auth),
+    settings: Settings = Depends(get_settings),
+) -> dict:
+    """
+    FastAPI dependency for the admin API.
+
+    Raises HTTP 403 unless the caller is in one of ``ADMIN_GROUPS``
+    (matched against the groups claim and the ``roles`` claim).
+    """
+    admin_groups = {group.strip() for group in settings.ADMIN_GROUPS.split(",") if group.strip()}
+    memberships = set()
+    for claim in (settings.MODEL_GROUPS_CLAIM, "roles"):
+        values = user.get(claim) or ()
+        memberships.update((values,) if isinstance(values, str) else values)
+    if not admin_groups & memberships:
+        audit("admin_access", user, outcome="forbidden")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return user
@@ -3,17 +3,23 @@ Entra ID (Azure AD) OAuth2 / OIDC helpers.
 
 In MOCK_MODE the helpers return fake tokens without contacting Azure.
 In production mode they call the real Microsoft identity platform endpoints.
+
+PyJWT (and the cryptography backend it loads) is imported on first use
+rather than with this module, which every authenticated router pulls in.
+The app lifespan pre-warms it in a worker thread.
 """
 
 from datetime import datetime, timedelta, timezone
+import time
 from typing import Optional
 from urllib.parse import urlencode
 import uuid
 
-import httpx
-import jwt as pyjwt
-
+from app.auth.jwks import get_jwks_store, token_kid
+from app.auth.token_cache import get_token_cache
 from app.config import Settings, get_settings
+from app.http_client import outbound_client, request_with_retry
+from app.metrics import UPSTREAM_LATENCY
 
 
 # ─── Authorization URL ───────────────────────────────────────────────────────
@@ -53,10 +59,14 @@ async def exchange_code_for_token(
     if settings.MOCK_MODE:
         return _mock_token(settings)
 
-    # ── Real Entra ID call ──
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
+    # ── Real Entra ID call (shared pooled client) ──
+    started = time.perf_counter()
+    async with outbound_client(settings) as client:
+        response = await request_with_retry(
+            client,
+            "POST",
             settings.entra_token_url,
+            settings,
             data={
                 "client_id": settings.ENTRA_CLIENT_ID,
                 "client_secret": settings.ENTRA_CLIENT_SECRET,
@@ -66,6 +76,7 @@ async def exchange_code_for_token(
                 "scope": "openid profile email",
             },
         )
+        UPSTREAM_LATENCY.observe(time.perf_counter() - started, "token_exchange", str(response.status_code))
         response.raise_for_status()
         return response.json()
 
@@ -75,12 +86,34 @@ async def exchange_code_for_token(
 
 def validate_token(token: str, settings: Optional[Settings] = None) -> Optional[dict]:
     """
-    Validate a bearer token.
+    Validate a bearer token using only in-memory state.
 
-    In MOCK_MODE, decodes using the local JWT_SECRET.
+    Previously verified tokens are served from the in-process token cache
+    until their ``exp``; otherwise the token is fully decoded and verified.
     Returns the decoded payload dict on success, or None on failure.
     """
     settings = settings or get_settings()
+    cache = get_token_cache(settings)
+
+    payload = cache.get(token, settings)
+    if payload is not None:
+        return payload
+
+    payload = _decode_token(token, settings)
+    if payload is not None:
+        cache.put(token, payload, settings)
+    return payload
+
+
+def _decode_token(token: str, settings: Settings) -> Optional[dict]:
+    """
+    Decode and verify a bearer token without consulting the cache.
+
+    In MOCK_MODE, decodes using the local JWT_SECRET; otherwise verifies the
+    RS256 signature with the matching key from the JWKS store, or the HMAC of
+    a proxy-signed session token with SESSION_TOKEN_SECRET (only if one is set).
+    """
+    import jwt as pyjwt
 
     if settings.MOCK_MODE:
         try:
@@ -95,24 +128,109 @@ def validate_token(token: str, settings: Optional[Settings] = None) -> Optional[
         except pyjwt.PyJWTError:
             return None
 
-    # In production you would verify against Entra ID JWKS:
-    # 1. Fetch JWKS from https://login.microsoftonline.com/{tenant}/discovery/v2.0/keys
-    # 2. Decode + verify audience, issuer, expiration
-    # Placeholder — always reject in non-mock prod until JWKS is wired up
-    return None
+    # ── Session token signed by this proxy after a refresh (see sign_session_token) ──
+    if _unverified_issuer(token) == settings.SESSION_TOKEN_ISSUER:
+        if not settings.session_tokens_enabled:
+            return None
+        try:
+            return pyjwt.decode(
+                token,
+                settings.session_token_secret,
+                algorithms=[settings.JWT_ALGORITHM],
+                audience=settings.ENTRA_CLIENT_ID,
+                issuer=settings.SESSION_TOKEN_ISSUER,
+            )
+        except pyjwt.PyJWTError:
+            return None
+
+    # ── Real Entra ID token: verify against the in-memory JWKS key store ──
+    signing_key = get_jwks_store(settings).get_signing_key(token_kid(token))
+    if signing_key is None:
+        return None
+    try:
+        return pyjwt.decode(
+            token,
+            signing_key,
+            algorithms=["RS256"],
+            audience=settings.ENTRA_CLIENT_ID,
+            issuer=settings.entra_issuer,
+        )
+    except pyjwt.PyJWTError:
+        return None
+
+
+async def verify_token(token: str, settings: Optional[Settings] = None) -> Optional[dict]:
+    """
+    Async variant of validate_token used by the bearer dependency.
+
+    Verification itself never performs I/O. Only when a production token is
+    signed with a ``kid`` the key store has not seen yet (key rotation) does
+    this await a single shared JWKS refetch and then retry once.
+    """
+    settings = settings or get_settings()
+
+    payload = validate_token(token, settings)
+    if payload is None and not settings.MOCK_MODE:
+        store = get_jwks_store(settings)
+        kid = token_kid(token)
+        if store.get_signing_key(kid) is None and await store.refresh_for_kid(kid):
+            payload = validate_token(token, settings)
+    return payload
 
 
 # ─── Helpers ──────────────────────────────────────────────────────────────────
 
 
+def _unverified_issuer(token: str) -> Optional[str]:
+    import jwt as pyjwt
+
+    try:
+        return pyjwt.decode(token, options={"verify_signature": False}).get("iss")
+    except pyjwt.PyJWTError:
+        return None
+
+
+def sign_session_token(claims: dict, settings: Settings) -> dict:
+    """
+    Sign an access token for ``claims`` locally (HMAC, no identity-provider
+    call). Mock-mode tokens carry the Entra authority as issuer, like the
+    mock login; production session tokens carry ``SESSION_TOKEN_ISSUER``
+    and are signed with ``SESSION_TOKEN_SECRET``. Raises RuntimeError when
+    session tokens are disabled (see ``Settings.session_tokens_enabled``).
+    """
+    import jwt as pyjwt
+
+    if not settings.session_tokens_enabled:
+        raise RuntimeError("Session tokens are disabled; set SESSION_TOKEN_SECRET")
+
+    now = datetime.now(timezone.utc)
+    payload = {
+        **claims,
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": now + timedelta(minutes=settings.JWT_EXPIRATION_MINUTES),
+        "iss": settings.entra_authority if settings.MOCK_MODE else settings.SESSION_TOKEN_ISSUER,
+        "aud": settings.ENTRA_CLIENT_ID,
+    }
+    access_token = pyjwt.encode(payload, settings.session_token_secret, algorithm=settings.JWT_ALGORITHM)
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": settings.JWT_EXPIRATION_MINUTES * 60,
+    }
+
+
 def _mock_token(settings: Settings) -> dict:
     """Generate a locally-signed mock JWT for development / testing."""
+    import jwt as pyjwt
+
     now = datetime.now(timezone.utc)
     payload = {
         "sub": "mock-user-id",
         "name": "Mock User",
         "email": "mock.user@enterprise.local",
         "oid": str(uuid.uuid4()),
+        "jti": uuid.uuid4().hex,
         "iat": now,
         "exp": now + timedelta(minutes=settings.JWT_EXPIRATION_MINUTES),
         "iss": settings.entra_authority,
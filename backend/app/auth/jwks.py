@@ -0,0 +1,187 @@
+"""
+Entra ID signing-key store (JWKS).
+
+Production tokens are RS256-signed by Entra ID. The store fetches the tenant's
+JWKS document once, indexes the public keys by ``kid`` and refreshes them in
+the background on a TTL, so token verification is a pure in-memory lookup.
+
+When a token arrives with an unknown ``kid`` (key rotation), a single refetch
+is started and every concurrent caller awaits that same fetch instead of
+hitting the discovery endpoint independently. Refetches triggered this way are
+rate-limited so that garbage ``kid`` values cannot be used to hammer Entra.
+
+httpx and PyJWT are imported on first fetch, so mock-mode workers never
+load them for this module.
+"""
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional
+
+from app.auth.token_cache import clear_token_cache
+from app.config import Settings
+from app.http_client import outbound_client, request_with_retry
+from app.services.single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    import jwt as pyjwt
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSKeyStore:
+    """kid-indexed cache of signing keys with background and on-demand refresh."""
+
+    def __init__(
+        self,
+        jwks_url: str,
+        refresh_interval: float = 3600,
+        min_refetch_interval: float = 30,
+        timeout: float = 5.0,
+    ):
+        self.jwks_url = jwks_url
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.fetch_count = 0
+        self._keys: dict[str, "pyjwt.PyJWK"] = {}
+        self._last_demand_fetch = float("-inf")
+        self._fetches: SingleFlight[None] = SingleFlight()
+        self._refresher: Optional[asyncio.Task] = None
+        # Called after keys were retired (e.g. to tell the other workers)
+        self.on_keys_removed: Optional[Callable[[], Awaitable[object]]] = None
+
+    # ── Lookup (sync, never does I/O) ──
+
+    def get_signing_key(self, kid: Optional[str]) -> Optional["pyjwt.PyJWK"]:
+        """Return the key for ``kid`` if it is currently known."""
+        if kid is None:
+            return None
+        return self._keys.get(kid)
+
+    @property
+    def kids(self) -> set[str]:
+        return set(self._keys)
+
+    # ── Fetching ──
+
+    async def _fetch(self) -> None:
+        import jwt as pyjwt
+
+        async with outbound_client() as client:
+            response = await request_with_retry(client, "GET", self.jwks_url, timeout=self.timeout)
+            response.raise_for_status()
+            document = response.json()
+
+        entries = document.get("keys") if isinstance(document, dict) else None
+        if not isinstance(entries, list) or not all(isinstance(jwk, dict) for jwk in entries):
+            raise ValueError("JWKS document is not an object with a list of keys")  # keep the current keys
+
+        keys: dict[str, pyjwt.PyJWK] = {}
+        for jwk in entries:
+            kid = jwk.get("kid")
+            if not kid or not isinstance(kid, str) or jwk.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[kid] = pyjwt.PyJWK.from_dict(jwk)
+            except pyjwt.PyJWTError:
+                logger.warning("Skipping unusable JWKS key %s", kid)
+
+        removed = set(self._keys) - set(keys)
+        self._keys = keys  # atomic swap — readers never see a partial set
+        self.fetch_count += 1
+
+        if removed:
+            # Tokens signed by a retired key must be re-verified.
+            clear_token_cache()
+            if self.on_keys_removed is not None:
+                await self.on_keys_removed()
+
+    async def refresh(self) -> None:
+        """Refetch the JWKS document; concurrent callers share one request."""
+        await self._fetches.do(self.jwks_url, self._fetch)
+
+    async def refresh_for_kid(self, kid: Optional[str]) -> bool:
+        """
+        Make sure ``kid`` is known. Unknown-kid refetches start at most once
+        per ``min_refetch_interval``; callers arriving while one is in flight
+        join it. Returns True if the key is now available.
+        """
+        import httpx
+
+        if kid is None:
+            return False
+        if kid in self._keys:
+            return True
+
+        if not self._fetches.in_flight(self.jwks_url):
+            now = time.monotonic()
+            if now - self._last_demand_fetch < self.min_refetch_interval:
+                return False
+            self._last_demand_fetch = now
+
+        try:
+            await self.refresh()
+        except (httpx.HTTPError, ValueError):
+            logger.exception("JWKS refetch for kid %s failed", kid)
+            return False
+        return kid in self._keys
+
+    # ── Background refresh ──
+
+    async def _refresh_loop(self) -> None:
+        import httpx
+
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except (httpx.HTTPError, ValueError):
+                logger.exception("Background JWKS refresh failed")
+
+    async def start(self) -> None:
+        """Load the keys once and start the background refresh task."""
+        import httpx
+
+        try:
+            await self.refresh()
+        except (httpx.HTTPError, ValueError):
+            logger.exception("Initial JWKS fetch failed; will retry in background")
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Cancel the background refresh task."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+
+def token_kid(token: str) -> Optional[str]:
+    """Read the ``kid`` from a token header without verifying it."""
+    import jwt as pyjwt
+
+    try:
+        return pyjwt.get_unverified_header(token).get("kid")
+    except pyjwt.PyJWTError:
+        return None
+
+
+_store: Optional[JWKSKeyStore] = None
+
+
+def get_jwks_store(settings: Settings) -> JWKSKeyStore:
+    """Process-wide key store for the configured tenant."""
+    global _store
+    if _store is None or _store.jwks_url != settings.entra_jwks_url:
+        _store = JWKSKeyStore(
+            settings.entra_jwks_url,
+            refresh_interval=settings.JWKS_REFRESH_SECONDS,
+            min_refetch_interval=settings.JWKS_MIN_REFETCH_SECONDS,
+        )
+    return _store
@@ -0,0 +1,124 @@
+"""
+Refresh-token store with rotation and reuse detection.
+
+A successful SSO login starts a *session family* and hands the CLI an opaque
+refresh token next to its access token. POST /sso/refresh redeems a refresh
+token for a fresh, locally signed access token and a new refresh token in
+the same family — no browser and no identity-provider round trip.
+
+Only SHA-256 digests of refresh tokens are stored, in the shared state
+backend, so every worker can redeem any token:
+
+    refresh:<digest>         → {"family", "claims", "family_expires"}  (TTL)
+    refresh-used:<digest>    → set once when the token is redeemed     (TTL)
+    refresh-revoked:<family> → set when the family is revoked          (TTL)
+
+Each token is single-use. Marking it used is an atomic set-if-absent, so of
+two concurrent redemptions exactly one wins; presenting an already-used
+token is treated as theft and revokes the whole family (RFC 6819 §5.2.2.3,
+OAuth 2.0 Security BCP §4.14).
+"""
+
+import hashlib
+import json
+import secrets
+import time
+from typing import Optional
+
+from app.config import Settings, get_settings
+from app.shared_state import StateBackend, get_state_backend
+
+# Registered claims are re-issued on every refresh rather than carried over.
+_REGISTERED_CLAIMS = frozenset({"iat", "nbf", "exp", "iss", "aud", "jti"})
+
+
+class RefreshTokenError(Exception):
+    """The refresh token is unknown, expired or revoked."""
+
+
+class RefreshTokenReuseError(RefreshTokenError):
+    """An already-redeemed refresh token was presented; the family is revoked."""
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def session_claims(payload: dict) -> dict:
+    """The identity claims from an access-token payload worth carrying forward."""
+    return {key: value for key, value in payload.items() if key not in _REGISTERED_CLAIMS}
+
+
+class RefreshTokenStore:
+    """Issues, rotates and revokes refresh tokens in a shared backend."""
+
+    def __init__(self, backend: StateBackend, ttl: float, max_age: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_age = max_age
+
+    def issue(self, claims: dict, family: Optional[str] = None, family_expires: Optional[float] = None) -> str:
+        """Mint a refresh token for ``claims`` (starting a new family if none given)."""
+        now = time.time()
+        family = family or secrets.token_hex(16)
+        family_expires = family_expires or now + self.max_age
+        token = secrets.token_urlsafe(32)
+        record = {"family": family, "claims": claims, "family_expires": family_expires}
+        ttl = min(self.ttl, family_expires - now)
+        self.backend.set(f"refresh:{_digest(token)}", json.dumps(record).encode(), ttl=ttl)
+        return token
+
+    def rotate(self, token: str) -> tuple[dict, str]:
+        """
+        Redeem ``token`` once. Returns the session claims and the replacement
+        refresh token; raises RefreshTokenError / RefreshTokenReuseError.
+        """
+        digest = _digest(token)
+        raw = self.backend.get(f"refresh:{digest}")
+        if raw is None:
+            raise RefreshTokenError("Unknown or expired refresh token")
+        record = json.loads(raw)
+        family = record["family"]
+        if self.backend.get(f"refresh-revoked:{family}") is not None:
+            raise RefreshTokenError("Session has been revoked")
+        remaining = record["family_expires"] - time.time()
+        if remaining <= 0:
+            raise RefreshTokenError("Session has expired")
+
+        if not self.backend.add(f"refresh-used:{digest}", b"1", ttl=min(self.ttl, remaining)):
+            self.revoke_family(family)
+            raise RefreshTokenReuseError("Refresh token reuse detected; session revoked")
+
+        replacement = self.issue(record["claims"], family, record["family_expires"])
+        return record["claims"], replacement
+
+    def revoke_family(self, family: str) -> None:
+        """Invalidate every refresh token of a session family."""
+        self.backend.set(f"refresh-revoked:{family}", b"1", ttl=self.max_age)
+
+    def revoke(self, token: str) -> None:
+        """Invalidate the session family ``token`` belongs to."""
+        family = self.family_of(token)
+        if family is not None:
+            self.revoke_family(family)
+
+    def family_of(self, token: str) -> Optional[str]:
+        """The session family ``token`` belongs to, if it is known."""
+        raw = self.backend.get(f"refresh:{_digest(token)}")
+        return json.loads(raw)["family"] if raw is not None else None
+
+
+_store: Optional[RefreshTokenStore] = None
+
+
+def get_refresh_store(settings: Optional[Settings] = None) -> RefreshTokenStore:
+    """Process-wide refresh-token store on the shared state backend."""
+    global _store
+    if _store is None:
+        settings = settings or get_settings()
+        _store = RefreshTokenStore(
+            get_state_backend(settings),
+            ttl=settings.REFRESH_TOKEN_TTL_SECONDS,
+            max_age=settings.REFRESH_TOKEN_MAX_AGE_SECONDS,
+        )
+    return _store
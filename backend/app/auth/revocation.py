@@ -0,0 +1,156 @@
+"""
+Token revocation list.
+
+Tokens can be revoked by:
+
+- ``jti`` — one specific token (Entra's ``uti`` claim counts as its jti);
+- ``sub`` / ``oid`` — every session of a user that was authenticated at or
+  before the revocation time. Logins after that work normally; disabling an
+  account is the identity provider's job.
+
+Membership lives in per-kind dicts, so the check on the bearer path is at
+most three hash lookups, independent of the number of entries. (A Bloom
+filter in front would cost more per check in Python than the exact lookup
+it guards.)
+
+Revocations are shared between workers as an append-only event log in the
+shared state backend: ``revocation-seq`` allocates an index, the event is
+written to ``revocation:<n>``, then the ``revocations`` topic is bumped.
+Each worker applies only the events past the last index it has seen, so
+propagation is incremental — never a reload of the full list. Events expire
+after ``REVOCATION_RETENTION_SECONDS``, by which time every token they could
+affect has expired as well.
+"""
+
+import json
+import threading
+import time
+from typing import Optional
+
+from app.config import Settings, get_settings
+from app.shared_state import StateBackend, StateSync, get_state_sync
+
+KINDS = ("jti", "sub", "oid")
+
+_BATCH = 500
+# Indexes this close to the head may be allocated but not written yet; the
+# reader waits for them instead of skipping them as expired.
+_IN_FLIGHT_WINDOW = 64
+_PRUNE_INTERVAL_SECONDS = 60.0
+
+
+class RevocationList:
+    """In-memory revocation index fed from the shared event log."""
+
+    def __init__(self, sync: StateSync, default_ttl: float, retention: float):
+        self.sync = sync
+        self.default_ttl = default_ttl
+        self.retention = retention
+        # kind → value → (revoked_at, expires)
+        self._entries: dict[str, dict[str, tuple[float, float]]] = {kind: {} for kind in KINDS}
+        self._applied = 0
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+
+    @property
+    def backend(self) -> StateBackend:
+        return self.sync.backend
+
+    # ── Bearer-path check ──
+
+    def is_revoked(self, payload: dict) -> bool:
+        """True if ``payload`` matches a revocation; a few dict lookups."""
+        jti = payload.get("jti") or payload.get("uti")
+        if jti is not None and jti in self._entries["jti"]:
+            return True
+        authenticated = payload.get("auth_time") or payload.get("iat") or 0
+        for kind in ("sub", "oid"):
+            value = payload.get(kind)
+            if value is None:
+                continue
+            entry = self._entries[kind].get(value)
+            if entry is not None and authenticated <= entry[0]:
+                return True
+        return False
+
+    # ── Updates ──
+
+    def _apply(self, event: dict) -> None:
+        kind, value = event["kind"], event["value"]
+        if event["expires"] <= time.time():
+            return
+        current = self._entries[kind].get(value)
+        if current is None or current[0] < event["revoked_at"]:
+            self._entries[kind][value] = (event["revoked_at"], event["expires"])
+
+    def revoke(self, kind: str, value: str, expires_at: Optional[float] = None) -> dict:
+        """Record a revocation, apply it locally and publish it to the other workers."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown revocation kind {kind!r} (expected one of {', '.join(KINDS)})")
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + (self.default_ttl if kind == "jti" else self.retention)
+        event = {"kind": kind, "value": value, "revoked_at": now, "expires": min(expires_at, now + self.retention)}
+        with self._lock:
+            self._apply(event)
+
+        index = self.backend.incr("revocation-seq")
+        self.backend.set(f"revocation:{index}", json.dumps(event).encode(), ttl=self.retention)
+        self.sync.bump("revocations")
+        return event
+
+    def catch_up(self) -> int:
+        """Apply events written since the last call; returns how many were applied."""
+        head = int(self.backend.get("revocation-seq") or 0)
+        applied = 0
+        with self._lock:
+            index = self._applied + 1
+            while index <= head:
+                batch = range(index, min(head, index + _BATCH - 1) + 1)
+                values = self.backend.get_many([f"revocation:{i}" for i in batch])
+                for position, raw in zip(batch, values):
+                    if raw is None:
+                        if head - position < _IN_FLIGHT_WINDOW:
+                            return applied  # its writer bumps the topic once written
+                        self._applied = position  # expired
+                        continue
+                    self._apply(json.loads(raw))
+                    self._applied = position
+                    applied += 1
+                index = batch[-1] + 1
+            self._prune()
+        return applied
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        if now - self._last_prune < _PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = now
+        wall = time.time()
+        for kind in KINDS:
+            entries = self._entries[kind]
+            expired = [value for value, (_, expires) in entries.items() if expires <= wall]
+            for value in expired:
+                del entries[value]
+
+    def stats(self) -> dict:
+        return {kind: len(self._entries[kind]) for kind in KINDS}
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+
+_revocations: Optional[RevocationList] = None
+
+
+def get_revocation_list(settings: Optional[Settings] = None) -> RevocationList:
+    """Process-wide revocation list on the shared state backend."""
+    global _revocations
+    if _revocations is None:
+        settings = settings or get_settings()
+        _revocations = RevocationList(
+            get_state_sync(settings),
+            default_ttl=settings.REVOCATION_DEFAULT_TTL_SECONDS,
+            retention=settings.REVOCATION_RETENTION_SECONDS,
+        )
+    return _revocations
@@ -0,0 +1,138 @@
+"""
+In-process cache of verified JWT payloads.
+
+Every authenticated route calls validate_token(), and the Go CLI heartbeats
+/v1/models with the same token every few minutes. Caching the decoded payload
+keyed by a SHA-256 digest of the token lets repeat checks skip signature
+verification entirely.
+
+Entries expire at the token's own ``exp`` claim, the cache is bounded with
+LRU eviction, and it is cleared whenever the validation-relevant Settings
+change (secret, algorithm, audience, issuer, mode).
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+from typing import Optional
+
+from app.config import Settings
+
+
+def _settings_fingerprint(settings: Settings) -> tuple:
+    """The subset of Settings that influences whether a token is valid."""
+    return (
+        settings.MOCK_MODE,
+        settings.JWT_SECRET,
+        settings.JWT_ALGORITHM,
+        settings.ENTRA_CLIENT_ID,
+        settings.entra_authority,
+        settings.entra_issuer,
+        settings.SESSION_TOKEN_ISSUER,
+        settings.session_tokens_enabled,
+        settings.session_token_secret,
+    )
+
+
+class TokenCache:
+    """Bounded LRU map of token digest → (exp, payload) with hit/miss counters."""
+
+    def __init__(self, max_size: int = 10_000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._settings: Optional[Settings] = None
+        self._fingerprint: Optional[tuple] = None
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def _bind(self, settings: Settings) -> None:
+        """Drop all entries if the validation-relevant settings changed."""
+        if settings is self._settings:
+            return
+        fingerprint = _settings_fingerprint(settings)
+        if fingerprint != self._fingerprint:
+            self._entries.clear()
+            self._fingerprint = fingerprint
+        self._settings = settings
+
+    def get(self, token: str, settings: Settings) -> Optional[dict]:
+        """Return the cached payload for ``token``, or None on a miss."""
+        key = self._key(token)
+        with self._lock:
+            self._bind(settings)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            exp, payload = entry
+            if exp <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def peek(self, token: str, settings: Settings) -> Optional[dict]:
+        """Like get(), but without touching the counters or the LRU order."""
+        with self._lock:
+            self._bind(settings)
+            entry = self._entries.get(self._key(token))
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    def put(self, token: str, payload: dict, settings: Settings) -> None:
+        """Store a verified payload until its ``exp`` claim."""
+        exp = payload.get("exp")
+        if self.max_size <= 0 or not isinstance(exp, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._bind(settings)
+            self._entries[key] = (float(exp), payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry; the hit/miss counters are cumulative and kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Counters for observability: hits, misses, size and hit ratio."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_token_cache: Optional[TokenCache] = None
+
+
+def get_token_cache(settings: Settings) -> TokenCache:
+    """Process-wide token cache, sized from ``TOKEN_CACHE_MAX_SIZE``."""
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = TokenCache(max_size=settings.TOKEN_CACHE_MAX_SIZE)
+    return _token_cache
+
+
+def clear_token_cache() -> None:
+    """Drop every cached payload (e.g. after a signing key is retired)."""
+    if _token_cache is not None:
+        _token_cache.clear()
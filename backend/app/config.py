@@ -6,6 +6,8 @@ Uses pydantic-settings for type-safe config with .env support.
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
+MOCK_JWT_SECRET = "super-secret-mock-key-change-in-prod"  # public; only ever valid in MOCK_MODE
+
 
 class Settings(BaseSettings):
     """All application settings, loaded from env vars or .env file."""
@@ -22,19 +24,151 @@ class Settings(BaseSettings):
     ENTRA_CLIENT_SECRET: str = "mock-client-secret"
     ENTRA_REDIRECT_URI: str = "http://localhost:8000/sso/callback"
     ENTRA_AUTHORITY: str = ""  # computed in property
+    ENTRA_ISSUER: str = ""  # computed in property
+    ENTRA_JWKS_URL: str = ""  # computed in property
+    JWKS_REFRESH_SECONDS: int = 3600
+    JWKS_MIN_REFETCH_SECONDS: int = 30  # floor between unknown-kid refetches
 
     # ── JWT ──
-    JWT_SECRET: str = "super-secret-mock-key-change-in-prod"
+    JWT_SECRET: str = MOCK_JWT_SECRET
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_MINUTES: int = 60
 
+    # ── Multi-worker shared state ──
+    STATE_BACKEND: str = "memory"  # memory | file | redis
+    STATE_FILE_DIR: str = ""  # file backend directory; empty → /dev/shm/wrapper-ai-proxy
+    STATE_REDIS_URL: str = "redis://localhost:6379/0"
+    STATE_KEY_PREFIX: str = "wrapper-ai-proxy:"
+    STATE_SYNC_SECONDS: float = 1.0  # how quickly other workers follow a reload
+
+    # ── Refresh tokens / proxy-issued sessions ──
+    REFRESH_TOKEN_ENABLED: bool = True
+    REFRESH_TOKEN_TTL_SECONDS: int = 14 * 86_400  # idle lifetime of each refresh token
+    REFRESH_TOKEN_MAX_AGE_SECONDS: int = 90 * 86_400  # absolute session lifetime
+    SESSION_TOKEN_ISSUER: str = "wrapper-ai-proxy"  # iss of access tokens signed by the proxy
+    SESSION_TOKEN_SECRET: str = ""  # HMAC key for those tokens outside MOCK_MODE; unset disables refresh
+
+    # ── Revocation / admin API ──
+    REVOCATION_DEFAULT_TTL_SECONDS: int = 86_400  # jti revocations without an explicit expiry
+    REVOCATION_RETENTION_SECONDS: int = 90 * 86_400  # sub/oid revocations; ≥ REFRESH_TOKEN_MAX_AGE_SECONDS
+    ADMIN_GROUPS: str = ""  # comma-separated groups/roles allowed on /admin; empty disables it
+
+    # ── Rate limiting (token buckets, per worker) ──
+    RATE_LIMIT_ENABLED: bool = True
+    # "<path pattern>=<requests>/<seconds>" or "=off", first match wins; keyed per user (oid/sub) or IP
+    RATE_LIMIT_RULES: str = "/health=off;/metrics=off;/sso/*=300/60;/cli/*=60/60;/v1/models=120/60;*=600/60"
+    RATE_LIMIT_SWEEP_SECONDS: float = 60.0
+
+    # ── Observability ──
+    METRICS_ENABLED: bool = True  # /metrics endpoint + instrumentation middleware
+    STARTUP_PROFILE: bool = False  # log startup phase timings; import times: python -m app.startup
+
+    # ── Access / audit log (JSON lines, written in background batches) ──
+    ACCESS_LOG_ENABLED: bool = True
+    ACCESS_LOG_PATH: str = "-"  # file appended to; "-" → stdout
+    ACCESS_LOG_QUEUE_SIZE: int = 10_000  # records waiting for the writer; new ones dropped (and counted) when full
+    ACCESS_LOG_BATCH_SIZE: int = 256  # records per write
+    ACCESS_LOG_FLUSH_SECONDS: float = 1.0  # write at least this often (sooner once a batch is full)
+    # "<path pattern>=<rate 0..1>", first match wins; error responses and audit events are always kept
+    ACCESS_LOG_SAMPLE_RULES: str = "/health=0;/metrics=0;/v1/models=0.05"
+
+    # ── Token cache ──
+    TOKEN_CACHE_MAX_SIZE: int = 10_000  # 0 disables the verified-token cache
+
+    # ── Outbound HTTP (identity provider) ──
+    HTTP2_ENABLED: bool = True
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_TIMEOUT_SECONDS: float = 10.0
+    HTTP_MAX_RETRIES: int = 2  # retries on 429 / 5xx
+    HTTP_RETRY_BACKOFF_SECONDS: float = 0.2
+
+    # ── Inference upstream (/v1/messages, /v1/chat/completions) ──
+    UPSTREAM_BASE_URL: str = ""  # e.g. https://api.anthropic.com (comma-separated for several); empty → disabled
+    UPSTREAM_API_KEY: str = ""  # sent as x-api-key (messages) / Bearer (chat completions)
+    UPSTREAM_HTTP2_ENABLED: bool = True
+    UPSTREAM_POOL_MAX_CONNECTIONS: int = 200  # also caps concurrent upstream streams per worker
+    UPSTREAM_POOL_MAX_KEEPALIVE: int = 50
+    UPSTREAM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    UPSTREAM_READ_TIMEOUT_SECONDS: float = 300.0  # longest silence allowed between streamed chunks
+    UPSTREAM_POOL_TIMEOUT_SECONDS: float = 10.0  # wait for a free pooled connection before 503
+
+    # ── Upstream pools (catalog entries pick one with "upstream"; UPSTREAM_BASE_URL is "default") ──
+    UPSTREAM_POOLS: str = ""  # "<pool>=<url>[,<url>...];..." e.g. "us=https://us-1,https://us-2;eu=https://eu-1"
+    UPSTREAM_BALANCER: str = "ewma"  # "ewma" (peak-EWMA latency × in-flight) or "least_outstanding"
+    UPSTREAM_EWMA_DECAY_SECONDS: float = 10.0
+    UPSTREAM_MAX_ATTEMPTS: int = 3  # targets tried per request when connects fail or 429 / 502-504 / 529 come back
+    UPSTREAM_HEALTH_PATH: str = "/v1/models"  # active checks: GET <target><path>; empty disables them
+    UPSTREAM_HEALTH_INTERVAL_SECONDS: float = 10.0
+    UPSTREAM_BREAKER_WINDOW_SECONDS: float = 10.0
+    UPSTREAM_BREAKER_MIN_REQUESTS: int = 5  # requests in a window before its error ratio can open the breaker
+    UPSTREAM_BREAKER_ERROR_RATIO: float = 0.5  # connect failures and 5xx
+    UPSTREAM_BREAKER_OPEN_SECONDS: float = 15.0  # no traffic, then one probe request
+
+    # ── Response cache (models opt in with response_cache_ttl in the catalog) ──
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_DISK_DIR: str = ""  # spill tier directory; empty → memory tier only
+    RESPONSE_CACHE_DISK_BYTES: int = 1024 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 1024 * 1024  # larger responses are not cached
+
+    # ── Usage accounting ──
+    USAGE_ACCOUNTING_ENABLED: bool = True
+    USAGE_DB_PATH: str = "./usage.sqlite3"  # append-only SQLite store; workers on one host may share it
+    USAGE_BUFFER_SIZE: int = 50_000  # in-memory ring buffer; oldest unflushed records dropped when full
+    USAGE_BATCH_SIZE: int = 500  # records per write transaction
+    USAGE_FLUSH_SECONDS: float = 2.0  # flush at least this often (sooner once a batch is full)
+
+    # ── Model catalog ──
+    MODEL_CATALOG_PATH: str = ""  # JSON file; empty → built-in mock catalog
+    MODEL_CATALOG_RELOAD_SECONDS: float = 5.0
+    MODEL_GROUPS_CLAIM: str = "groups"  # JWT claim used for per-group filtering
+
+    # ── Enterprise settings policy ──
+    SETTINGS_POLICY_PATH: str = ""  # JSON policy file; empty → built-in defaults
+    SETTINGS_POLICY_RELOAD_SECONDS: float = 5.0
+    SETTINGS_HISTORY_SIZE: int = 16  # revisions kept to answer ?since= with a merge patch
+
+    # ── Change subscriptions ──
+    UPDATES_HEARTBEAT_SECONDS: float = 15.0
+    UPDATES_LONG_POLL_MAX_SECONDS: float = 60.0
+
     # ── CLI Binaries ──
     CLI_BINARIES_DIR: str = "./cli_binaries"
+    CLI_PRECOMPRESS_ENCODINGS: str = "zstd,gzip"  # variants built once per binary
+    CLI_ZSTD_LEVEL: int = 19
+    CLI_GZIP_LEVEL: int = 9
+    CLI_DELTA_ENABLED: bool = True  # zstd patches from earlier builds (needs zstandard)
+    CLI_DELTA_HISTORY: int = 3  # earlier builds per platform that patches are made from
+    CLI_CHUNK_SIZE: int = 8 * 1024 * 1024  # bytes per chunk in /cli/{platform}/chunks
 
     @property
     def entra_authority(self) -> str:
         return self.ENTRA_AUTHORITY or f"https://login.microsoftonline.com/{self.ENTRA_TENANT_ID}"
 
+    @property
+    def entra_issuer(self) -> str:
+        return self.ENTRA_ISSUER or f"{self.entra_authority}/v2.0"
+
+    @property
+    def entra_jwks_url(self) -> str:
+        return self.ENTRA_JWKS_URL or f"{self.entra_authority}/discovery/v2.0/keys"
+
+    @property
+    def session_token_secret(self) -> str:
+        """Key for proxy-signed session tokens; empty when they must not be issued or accepted."""
+        if self.MOCK_MODE:
+            return self.JWT_SECRET
+        if self.SESSION_TOKEN_SECRET in ("", MOCK_JWT_SECRET):
+            return ""
+        return self.SESSION_TOKEN_SECRET
+
+    @property
+    def session_tokens_enabled(self) -> bool:
+        return self.REFRESH_TOKEN_ENABLED and bool(self.session_token_secret)
+
     @property
     def entra_authorize_url(self) -> str:
         return f"{self.entra_authority}/oauth2/v2.0/authorize"
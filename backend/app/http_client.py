@@ -0,0 +1,148 @@
+"""
+Shared outbound HTTP client for identity-provider calls.
+
+A single pooled httpx.AsyncClient is created in the app lifespan and reused
+by the Entra ID helpers (token exchange, JWKS fetches), so SSO callbacks ride
+warm keep-alive / HTTP/2 connections instead of paying a TCP + TLS handshake
+per request. Transient 429 / 5xx answers are retried with jittered backoff.
+
+httpx is imported only when a client is built: its transport stack and CA
+bundle are the slowest part of process start, and the lifespan builds the
+client in a worker thread while the app is already answering /health.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+import random
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from app.config import Settings, get_settings
+from app.services.single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    import httpx
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_client: Optional["httpx.AsyncClient"] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_builds: SingleFlight["httpx.AsyncClient"] = SingleFlight()
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_http_client(settings: Optional[Settings] = None) -> "httpx.AsyncClient":
+    """Create a pooled AsyncClient configured from Settings."""
+    import httpx
+
+    settings = settings or get_settings()
+    return httpx.AsyncClient(
+        http2=settings.HTTP2_ENABLED and http2_available(),
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            settings.HTTP_TIMEOUT_SECONDS,
+            connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+# ─── Lifespan ────────────────────────────────────────────────────────────────
+
+
+async def start_http_client(settings: Optional[Settings] = None) -> "httpx.AsyncClient":
+    """
+    Create the shared client; called from the app lifespan.
+
+    The client is built in a worker thread so the event loop keeps serving
+    meanwhile. Callers that need it before then wait for that same build.
+    """
+    global _client, _client_loop
+    loop = _client_loop = asyncio.get_running_loop()
+    if _client is None:
+        client = await _builds.do("client", lambda: asyncio.to_thread(build_http_client, settings))
+        if _client is None and _client_loop is loop:  # not closed meanwhile
+            _client = client
+        return client
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and its pooled connections."""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def get_http_client() -> Optional["httpx.AsyncClient"]:
+    """Return the shared client if it belongs to the running event loop."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    return _client if loop is _client_loop else None
+
+
+@asynccontextmanager
+async def outbound_client(settings: Optional[Settings] = None) -> AsyncIterator["httpx.AsyncClient"]:
+    """
+    Yield the shared client, or a short-lived one when running outside the
+    app lifespan (scripts, tests, another event loop).
+    """
+    client = get_http_client()
+    if client is None and _client_loop is asyncio.get_running_loop():
+        client = await start_http_client(settings)  # still being built by the lifespan
+    if client is not None:
+        yield client
+        return
+    async with build_http_client(settings) as temporary:
+        yield temporary
+
+
+# ─── Retry ───────────────────────────────────────────────────────────────────
+
+
+def _retry_delay(response: "httpx.Response", attempt: int, backoff: float) -> float:
+    """Honour Retry-After when present, otherwise full-jitter exponential backoff."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), backoff * 2 ** (attempt + 4))
+        except ValueError:
+            pass
+    return random.uniform(0, backoff * 2**attempt)
+
+
+async def request_with_retry(
+    client: "httpx.AsyncClient",
+    method: str,
+    url: str,
+    settings: Optional[Settings] = None,
+    **kwargs,
+) -> "httpx.Response":
+    """
+    Send a request, retrying on 429 / 5xx up to ``HTTP_MAX_RETRIES`` times.
+
+    The last response is returned as-is once retries are exhausted, so the
+    caller still decides how to handle the error status.
+    """
+    settings = settings or get_settings()
+    attempt = 0
+    while True:
+        response = await client.request(method, url, **kwargs)
+        if response.status_code not in RETRY_STATUSES or attempt >= settings.HTTP_MAX_RETRIES:
+            return response
+        await response.aclose()
+        await asyncio.sleep(_retry_delay(response, attempt, settings.HTTP_RETRY_BACKOFF_SECONDS))
+        attempt += 1
@@ -5,11 +5,152 @@ Creates and configures the FastAPI app, registers all route modules,
 and sets up CORS middleware.
 """
 
+import asyncio
+from contextlib import asynccontextmanager
+import logging
+import time
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.auth.jwks import get_jwks_store
+from app.auth.revocation import get_revocation_list
 from app.config import get_settings
-from app.routes import sso, models, settings, cli, health
+from app.http_client import close_http_client
+from app.middleware import AccessLogMiddleware, MetricsMiddleware, RateLimitMiddleware
+from app.routes import sso, models, inference, settings, cli, health, updates, metrics, admin
+from app.services.access_log import get_access_log
+from app.services.artifact_store import close_artifact_index, get_artifact_index
+from app.services.broadcaster import get_broadcaster
+from app.services.inference_proxy import close_upstream_client, start_upstream_client
+from app.services.model_service import get_model_catalog
+from app.services.response_cache import get_response_cache
+from app.services.settings_service import (
+    get_settings_version,
+    on_settings_change,
+    refresh_enterprise_settings,
+    watch_settings_policy,
+)
+from app.services.upstream_pool import get_upstream_pool
+from app.services.usage import get_usage_ledger
+from app.shared_state import close_state_sync, env_file_fingerprint, get_state_sync
+from app.startup import new_startup_profile, start_prewarm
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """Start and stop long-lived background subsystems."""
+    _settings = get_settings()
+    profile = new_startup_profile()
+    started = time.perf_counter()
+
+    # Pooled outbound clients and deferred imports are built in the
+    # background; /health answers meanwhile (see app.startup)
+    warmup = start_prewarm(_settings, profile)
+
+    if _settings.REFRESH_TOKEN_ENABLED and not _settings.session_tokens_enabled:
+        logger.warning("SESSION_TOKEN_SECRET is unset (or the public mock key); token refresh is disabled")
+
+    # In production, load Entra ID signing keys before serving traffic
+    jwks_store = None if _settings.MOCK_MODE else get_jwks_store(_settings)
+    if jwks_store is not None:
+        with profile.phase("jwks"):
+            await jwks_store.start()
+
+    # Hash / precompress CLI binaries in the background
+    with profile.phase("artifact_index"):
+        get_artifact_index(_settings).refresh_all()
+
+    # Index response-cache entries spilled to disk by an earlier run
+    if _settings.RESPONSE_CACHE_ENABLED:
+        with profile.phase("response_cache"):
+            await asyncio.to_thread(get_response_cache(_settings).load)
+
+    # Write access / audit records in the background
+    access_log = get_access_log(_settings) if _settings.ACCESS_LOG_ENABLED else None
+    if access_log is not None:
+        with profile.phase("access_log"):
+            access_log.start()
+
+    # Flush usage records to the accounting store in the background
+    usage_ledger = get_usage_ledger(_settings) if _settings.USAGE_ACCOUNTING_ENABLED else None
+    if usage_ledger is not None:
+        with profile.phase("usage_ledger"):
+            usage_ledger.start()
+
+    # Probe inference upstreams in the background; requests skip failing ones
+    upstream_pool = None
+    if _settings.UPSTREAM_BASE_URL or _settings.UPSTREAM_POOLS:
+        with profile.phase("upstream_pool"):
+            upstream_pool = get_upstream_pool(_settings)
+            upstream_pool.start(lambda: start_upstream_client(_settings))
+
+    # Hot-reload the model catalog when its source changes
+    with profile.phase("model_catalog"):
+        catalog = get_model_catalog(_settings)
+        catalog.start()
+
+    # Compile the settings policy and claim its shared version (backend I/O) off the event loop
+    with profile.phase("settings_policy"):
+        settings_version = await asyncio.to_thread(get_settings_version)
+
+    # Fan version bumps out to /api/updates subscribers
+    broadcaster = get_broadcaster()
+    broadcaster.bind(asyncio.get_running_loop())
+    broadcaster.publish("models", catalog.version)
+    broadcaster.publish("settings", settings_version)
+    # The catalog and settings outlive this lifespan (tests and reloads re-run it): unregister on shutdown
+    unsubscribe = [
+        catalog.on_change(lambda snapshot: broadcaster.publish("models", snapshot.version)),
+        on_settings_change(lambda version: broadcaster.publish("settings", version)),
+    ]
+
+    # Recompile the settings policy when its file changes
+    policy_watcher = None
+    if _settings.SETTINGS_POLICY_PATH:
+        policy_watcher = asyncio.create_task(watch_settings_policy(_settings))
+
+    # Follow reloads made by other workers (config, catalog, policy, keys)
+    with profile.phase("state_sync"):
+        sync = get_state_sync(_settings)
+        sync.watch("config", env_file_fingerprint)
+        sync.subscribe("config", lambda generation: get_settings.cache_clear())
+        sync.subscribe("models", lambda generation: catalog.refresh(True, generation))
+        sync.subscribe("settings", lambda generation: refresh_enterprise_settings(_settings, generation))
+        revocations = get_revocation_list(_settings)
+        await asyncio.to_thread(revocations.catch_up)
+        sync.subscribe("revocations", lambda generation: asyncio.to_thread(revocations.catch_up))
+        if jwks_store is not None:
+            sync.subscribe("jwks", lambda generation: jwks_store.refresh())
+            jwks_store.on_keys_removed = lambda: sync.notify("jwks")
+        sync.start()
+
+    profile.record("ready", time.perf_counter() - started)
+    if _settings.STARTUP_PROFILE:
+        logger.info("Startup phases before serving:\n%s", profile.report())
+
+    yield
+
+    await warmup
+    for remove_listener in unsubscribe:
+        remove_listener()
+    await close_state_sync()
+    if policy_watcher is not None:
+        policy_watcher.cancel()
+    await catalog.stop()
+    close_artifact_index()
+    if jwks_store is not None:
+        await jwks_store.stop()
+    if upstream_pool is not None:
+        await upstream_pool.stop()
+    await close_upstream_client()
+    if usage_ledger is not None:
+        await usage_ledger.stop()
+    if access_log is not None:
+        await access_log.stop()
+    await close_http_client()
 
 
 def create_app() -> FastAPI:
@@ -22,10 +163,11 @@ def create_app() -> FastAPI:
         description=(
             "Enterprise AI Proxy backend for the Wrapper AI CLI. "
             "Handles SSO authentication via Entra ID, model catalog, "
-            "enterprise settings distribution, and CLI binary downloads."
+            "inference proxying, enterprise settings distribution, and CLI binary downloads."
         ),
         docs_url="/docs",
         redoc_url="/redoc",
+        lifespan=lifespan,
     )
 
     # ── CORS ─────────────────────────────────────────────────────────────
@@ -37,12 +179,28 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    # ── Rate limiting (configured per route in RATE_LIMIT_RULES) ────────
+    application.add_middleware(RateLimitMiddleware)
+
+    # ── Instrumentation ──────────────────────────────────────────────────
+    if _settings.METRICS_ENABLED:
+        application.add_middleware(MetricsMiddleware)
+
+    # ── Access log (outermost, so 429s are logged too) ──────────────────
+    if _settings.ACCESS_LOG_ENABLED:
+        application.add_middleware(AccessLogMiddleware)
+
     # ── Routers ──────────────────────────────────────────────────────────
     application.include_router(health.router)
     application.include_router(sso.router)
     application.include_router(models.router)
+    application.include_router(inference.router)
     application.include_router(settings.router)
+    application.include_router(updates.router)
     application.include_router(cli.router)
+    application.include_router(admin.router)
+    if _settings.METRICS_ENABLED:
+        application.include_router(metrics.router)
 
     return application
 
@@ -0,0 +1,336 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain per-worker dicts keyed by label
+values — no locks and no external dependency. Recording is a dict lookup and
+an integer/float add on the event-loop thread, so instrumentation itself
+costs well under a microsecond. Each worker process exposes its own values;
+Prometheus aggregates across workers/replicas at query time.
+
+Values that already live elsewhere (e.g. token-cache counters) are exported
+through collectors evaluated only when /metrics is scraped.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+
+from app.auth import revocation, token_cache
+from app.services import access_log, response_cache, upstream_pool, usage
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self.values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # per label-set: [bucket counts..., +Inf count], sum
+        self.counts: dict[LabelValues, list[int]] = {}
+        self.sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self.counts.get(labels)
+        if counts is None:
+            counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+            self.sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def count(self, *labels: str) -> int:
+        return sum(self.counts.get(labels, ()))
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for labels, counts in self.counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            label_str = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(self.sums[labels])}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+Collector = Callable[[], Iterable[str]]
+
+
+class Registry:
+    """Holds metrics and scrape-time collectors."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Collector] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))  # type: ignore[return-value]
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def gauge_lines(name: str, documentation: str, value: float, kind: str = "gauge") -> list[str]:
+    """Exposition lines for a single unlabelled value (used by collectors)."""
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"]
+
+
+# ── Application metrics ──────────────────────────────────────────────────────
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "Requests currently being served.")
+HTTP_RESPONSE_BYTES = REGISTRY.counter(
+    "http_response_bytes_total", "Response body bytes sent, by route template.", ("route",)
+)
+AUTH_FAILURES = REGISTRY.counter("auth_failures_total", "Bearer tokens rejected by require_auth (HTTP 401).")
+RATE_LIMITED = REGISTRY.counter(
+    "rate_limited_requests_total", "Requests rejected with 429, by rate limit rule.", ("rule",)
+)
+TOKEN_REFRESHES = REGISTRY.counter(
+    "token_refreshes_total", "POST /sso/refresh outcomes (issued, rejected, reused).", ("outcome",)
+)
+SETTINGS_RESPONSES = REGISTRY.counter(
+    "settings_responses_total", "GET /api/claude-settings answers by kind (full, patch, unchanged).", ("kind",)
+)
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "upstream_request_duration_seconds",
+    "Latency of calls to upstream services.",
+    ("operation", "status"),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+STARTUP_PHASE_SECONDS = REGISTRY.gauge(
+    "startup_phase_seconds",
+    "Duration of each startup step of this worker (prewarm_* run in the background).",
+    ("phase",),
+)
+PROXY_RESPONSES = REGISTRY.counter(
+    "proxy_responses_total",
+    "Relayed inference responses by API and outcome (completed, cancelled, failed).",
+    ("api", "outcome"),
+)
+
+
+def _token_cache_collector() -> list[str]:
+    cache: Optional[token_cache.TokenCache] = token_cache._token_cache
+    stats = cache.stats() if cache is not None else {"hits": 0, "misses": 0, "size": 0, "hit_ratio": 0.0}
+    return (
+        gauge_lines("token_cache_hits_total", "Verified-token cache hits.", stats["hits"], kind="counter")
+        + gauge_lines("token_cache_misses_total", "Verified-token cache misses.", stats["misses"], kind="counter")
+        + gauge_lines("token_cache_entries", "Verified tokens currently cached.", stats["size"])
+        + gauge_lines("token_cache_hit_ratio", "Share of token validations served from cache.", stats["hit_ratio"])
+    )
+
+
+REGISTRY.add_collector(_token_cache_collector)
+
+
+def _revocation_collector() -> list[str]:
+    revocations: Optional[revocation.RevocationList] = revocation._revocations
+    return gauge_lines(
+        "revocation_entries", "Active token revocations.", len(revocations) if revocations is not None else 0
+    )
+
+
+REGISTRY.add_collector(_revocation_collector)
+
+
+def _usage_collector() -> list[str]:
+    ledger: Optional[usage.UsageLedger] = usage._ledger
+    stats = ledger.stats() if ledger is not None else {"buffered": 0, "flushed": 0, "dropped": 0}
+    return (
+        gauge_lines("usage_records_buffered", "Usage records waiting to be flushed.", stats["buffered"])
+        + gauge_lines("usage_records_flushed_total", "Usage records written.", stats["flushed"], kind="counter")
+        + gauge_lines(
+            "usage_records_dropped_total", "Usage records dropped (buffer full).", stats["dropped"], kind="counter"
+        )
+    )
+
+
+REGISTRY.add_collector(_usage_collector)
+
+
+def _response_cache_collector() -> list[str]:
+    cache: Optional[response_cache.ResponseCache] = response_cache._cache
+    if cache is None:
+        return []
+    stats = cache.stats()
+    lines = [
+        "# HELP response_cache_hits_total Inference responses served from cache, by tier.",
+        "# TYPE response_cache_hits_total counter",
+    ]
+    lines += [f'response_cache_hits_total{{tier="{tier}"}} {count}' for tier, count in stats["hits"].items()]
+    return (
+        lines
+        + gauge_lines(
+            "response_cache_misses_total", "Cacheable requests not found in cache.", stats["misses"], kind="counter"
+        )
+        + gauge_lines("response_cache_hit_ratio", "Share of cacheable requests served from cache.", stats["hit_ratio"])
+        + gauge_lines(
+            "response_cache_bytes_saved_total", "Bytes served from cache.", stats["bytes_saved"], kind="counter"
+        )
+        + gauge_lines("response_cache_memory_bytes", "Bytes held in the memory tier.", stats["memory_bytes"])
+        + gauge_lines("response_cache_disk_bytes", "Bytes held in the disk tier.", stats["disk_bytes"])
+    )
+
+
+REGISTRY.add_collector(_response_cache_collector)
+
+
+def _access_log_collector() -> list[str]:
+    log: Optional[access_log.AccessLog] = access_log._log
+    if log is None:
+        return []
+    stats = log.stats()
+    return (
+        gauge_lines("access_log_records_queued", "Access / audit records waiting to be written.", stats["queued"])
+        + gauge_lines(
+            "access_log_records_written_total", "Access / audit records written.", stats["written"], kind="counter"
+        )
+        + gauge_lines(
+            "access_log_records_dropped_total",
+            "Access / audit records dropped (queue full or write failed).",
+            stats["dropped"],
+            kind="counter",
+        )
+        + gauge_lines(
+            "access_log_requests_sampled_out_total",
+            "Requests not logged because of ACCESS_LOG_SAMPLE_RULES.",
+            stats["sampled_out"],
+            kind="counter",
+        )
+    )
+
+
+REGISTRY.add_collector(_access_log_collector)
+
+
+def _upstream_pool_collector() -> list[str]:
+    pool: Optional[upstream_pool.UpstreamPool] = upstream_pool._pool
+    if pool is None:
+        return []
+    series = (
+        ("upstream_target_up", "gauge", "1 if the target passed its last active health check.",
+         lambda t: int(t.healthy)),
+        ("upstream_target_breaker_open", "gauge", "1 while the target's circuit breaker is open or half-open.",
+         lambda t: int(t.breaker.state != t.breaker.CLOSED)),
+        ("upstream_target_outstanding", "gauge", "Requests in flight to the target.", lambda t: t.outstanding),
+        ("upstream_target_ewma_seconds", "gauge", "Peak-EWMA time to response headers.", lambda t: t.ewma),
+        ("upstream_target_failures_total", "counter", "Connect failures and 5xx responses.", lambda t: t.failures),
+    )
+    lines = []
+    for name, kind, documentation, value in series:
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+        for target in pool.targets():
+            labels = _format_labels(("pool", "target"), (target.pool, target.url))
+            lines.append(f"{name}{labels} {_format_value(value(target))}")
+    return lines
+
+
+REGISTRY.add_collector(_upstream_pool_collector)
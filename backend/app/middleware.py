@@ -0,0 +1,207 @@
+"""
+Pure-ASGI middleware.
+
+These wrap the app at the ASGI level instead of using BaseHTTPMiddleware,
+so they add no extra task or response buffering per request.
+"""
+
+import time
+from typing import Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth.token_cache import get_token_cache
+from app.config import Settings, get_settings
+from app.metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS, HTTP_RESPONSE_BYTES, RATE_LIMITED
+from app.rate_limit import RateLimitRule, TokenBuckets, match_rule, parse_rules
+from app.services.access_log import get_access_log, log_subject
+
+
+def route_template(scope: Scope) -> str:
+    """The matched route's path template (bounded cardinality), or "unmatched"."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Record per-route latency, status counts, in-flight requests and bytes sent."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        sent = 0
+        content_length = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, sent, content_length
+            kind = message["type"]
+            if kind == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name.lower() == b"content-length":
+                        content_length = int(value)
+            elif kind == "http.response.body":
+                sent += len(message.get("body", b""))
+            elif kind == "http.response.zerocopysend":
+                sent += message.get("count") or 0
+            elif kind == "http.response.pathsend":
+                sent += content_length  # the server sends the file itself
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            route = route_template(scope)
+            method = scope["method"]
+            HTTP_LATENCY.observe(elapsed, method, route)
+            HTTP_REQUESTS.inc(method, route, str(status))
+            if sent:
+                HTTP_RESPONSE_BYTES.inc(route, amount=sent)
+
+
+class AccessLogMiddleware:
+    """
+    Queue one AccessRecord per request for the background access-log writer.
+
+    Only counters and timestamps are touched while the request runs; the
+    record is built after the response and handed to the queue without I/O.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        received = 0
+        sent = 0
+        content_length = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, sent, content_length
+            kind = message["type"]
+            if kind == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name.lower() == b"content-length":
+                        content_length = int(value)
+            elif kind == "http.response.body":
+                sent += len(message.get("body", b""))
+            elif kind == "http.response.zerocopysend":
+                sent += message.get("count") or 0
+            elif kind == "http.response.pathsend":
+                sent += content_length
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            state = scope.get("state") or {}
+            client = scope.get("client")
+            get_access_log().request(
+                method=scope["method"],
+                route=route_template(scope),
+                path=scope["path"],
+                status=status,
+                latency=time.perf_counter() - start,
+                bytes_in=received,
+                bytes_out=sent,
+                user=log_subject(state.get("user")),
+                client=client[0] if client else None,
+            )
+
+
+class RateLimitMiddleware:
+    """
+    Per-client token buckets for each ``RATE_LIMIT_RULES`` route pattern.
+
+    Clients presenting an already verified bearer token are keyed by its
+    ``oid`` (or ``sub``); everyone else — e.g. the unauthenticated /sso/*
+    routes — by client IP. Behind a reverse proxy, run uvicorn with ``--proxy-headers``
+    so the IP is the real client's. Settings are read per request, so a
+    config reload applies new limits without a restart.
+    """
+
+    def __init__(self, app: ASGIApp, buckets: Optional[TokenBuckets] = None):
+        self.app = app
+        self.buckets = buckets
+        self._spec: Optional[str] = None
+        self._rules: tuple[RateLimitRule, ...] = ()
+
+    def _rules_for(self, settings: Settings) -> tuple[RateLimitRule, ...]:
+        if settings.RATE_LIMIT_RULES != self._spec:
+            self._rules = parse_rules(settings.RATE_LIMIT_RULES)
+            self._spec = settings.RATE_LIMIT_RULES
+        return self._rules
+
+    @staticmethod
+    def client_key(scope: Scope, settings: Settings) -> str:
+        """
+        ``user:<oid|sub>`` for an already verified bearer token, else ``ip:<address>``.
+
+        Only the token cache is consulted: the limiter runs before auth, so a
+        token it has not seen verified yet (a user's first request, or a
+        forged one) is keyed by address rather than decoded on the event loop.
+        """
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    payload = get_token_cache(settings).peek(token.strip(), settings)
+                    subject = payload and (payload.get("oid") or payload.get("sub"))
+                    if subject:
+                        return f"user:{subject}"
+                break
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        settings = get_settings()
+        rule = match_rule(self._rules_for(settings), scope["path"]) if settings.RATE_LIMIT_ENABLED else None
+        if rule is None or rule.limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.buckets is None:
+            self.buckets = TokenBuckets(settings.RATE_LIMIT_SWEEP_SECONDS)
+        decision = self.buckets.take((rule.pattern, self.client_key(scope, settings)), rule.limit)
+        headers = decision.headers(rule.limit)
+
+        if not decision.allowed:
+            RATE_LIMITED.inc(rule.pattern)
+            response = JSONResponse({"detail": "Rate limit exceeded"}, status_code=429)
+            response.raw_headers.extend(headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
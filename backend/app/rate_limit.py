@@ -0,0 +1,139 @@
+"""
+Token-bucket rate limiting primitives.
+
+Limits are configured per route pattern in ``RATE_LIMIT_RULES``:
+
+    "/health=off;/sso/*=300/60;/cli/*=60/60;/v1/models=120/60;*=600/60"
+
+Each rule is ``<pattern>=<requests>/<seconds>`` (or ``off``); the first
+pattern matching the request path wins. ``*`` matches anything and
+``{param}`` one path segment, so ``/cli/{platform}`` and ``/cli/*`` both work.
+
+A bucket holds ``requests`` tokens and refills at ``requests / seconds`` per
+second. Buckets are stored in GCRA form — a single "theoretical arrival
+time" float per key instead of a (tokens, timestamp) pair — which makes a
+check one dict lookup and a few float operations. A key whose time has
+passed is indistinguishable from a full bucket, so the periodic sweep simply
+drops those keys.
+
+Buckets are per worker: with N workers a client can get up to N times the
+configured rate.
+"""
+
+from dataclasses import dataclass
+import math
+import re
+import time
+from typing import Hashable, Optional
+
+
+@dataclass(frozen=True)
+class Limit:
+    requests: int
+    period: float
+
+    @property
+    def interval(self) -> float:
+        """Seconds for one token to refill."""
+        return self.period / self.requests
+
+    @property
+    def policy(self) -> str:
+        """``RateLimit-Policy`` header value."""
+        return f"{self.requests};w={self.period:g}"
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    pattern: str
+    regex: re.Pattern
+    limit: Optional[Limit]  # None → not limited
+
+
+def pattern_regex(pattern: str) -> re.Pattern:
+    """Compile a route pattern: ``*`` matches anything, ``{param}`` one path segment."""
+    escaped = re.escape(pattern)
+    escaped = re.sub(r"\\\{[^}]*\\\}", "[^/]+", escaped)
+    return re.compile(escaped.replace(r"\*", ".*") + "$")
+
+
+def parse_rules(spec: str) -> tuple[RateLimitRule, ...]:
+    """Parse a ``RATE_LIMIT_RULES`` string; raises ValueError if malformed."""
+    rules = []
+    for item in filter(None, (part.strip() for part in spec.split(";"))):
+        pattern, sep, value = item.partition("=")
+        pattern, value = pattern.strip(), value.strip()
+        if not sep or not pattern:
+            raise ValueError(f"Invalid rate limit rule {item!r} (expected <pattern>=<requests>/<seconds>)")
+        limit = None
+        if value.lower() != "off":
+            requests, slash, period = value.partition("/")
+            try:
+                limit = Limit(int(requests), float(period))
+            except ValueError:
+                raise ValueError(f"Invalid rate limit {value!r} in rule {item!r}") from None
+            if not slash or limit.requests <= 0 or limit.period <= 0:
+                raise ValueError(f"Invalid rate limit {value!r} in rule {item!r}")
+        rules.append(RateLimitRule(pattern, pattern_regex(pattern), limit))
+    return tuple(rules)
+
+
+def match_rule(rules: tuple[RateLimitRule, ...], path: str) -> Optional[RateLimitRule]:
+    for rule in rules:
+        if rule.regex.match(path):
+            return rule
+    return None
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    remaining: int
+    reset: float  # seconds until the bucket is full again
+    retry_after: float  # seconds until the next request would be allowed
+
+    def headers(self, limit: Limit) -> list[tuple[bytes, bytes]]:
+        headers = [
+            (b"ratelimit-limit", str(limit.requests).encode()),
+            (b"ratelimit-remaining", str(self.remaining).encode()),
+            (b"ratelimit-reset", str(math.ceil(self.reset)).encode()),
+            (b"ratelimit-policy", limit.policy.encode()),
+        ]
+        if not self.allowed:
+            headers.append((b"retry-after", str(max(1, math.ceil(self.retry_after))).encode()))
+        return headers
+
+
+class TokenBuckets:
+    """Token buckets keyed by any hashable, one float each, swept periodically."""
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = sweep_interval
+        self._tat: dict[Hashable, float] = {}
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def take(self, key: Hashable, limit: Limit, now: Optional[float] = None) -> Decision:
+        """Consume one token from ``key``'s bucket if available."""
+        now = time.monotonic() if now is None else now
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        interval = limit.interval
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + interval
+        if new_tat - now > limit.period + 1e-9:
+            return Decision(False, 0, tat - now, new_tat - now - limit.period)
+        self._tat[key] = new_tat
+        remaining = int((limit.period - (new_tat - now)) / interval + 1e-9)
+        return Decision(True, remaining, new_tat - now, 0.0)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop full buckets; returns how many were removed."""
+        now = time.monotonic() if now is None else now
+        before = len(self._tat)
+        self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+        self._next_sweep = now + self.sweep_interval
+        return before - len(self._tat)
+
+    def __len__(self) -> int:
+        return len(self._tat)
@@ -0,0 +1,142 @@
+"""
+Custom response classes and conditional-request helpers.
+
+PreEncodedJSON holds a JSON payload that was serialized once, together with a
+strong ETag, so hot read-mostly endpoints can answer with the cached bytes
+(or a ``304``) without re-validating or re-encoding anything.
+
+BinaryFileResponse extends Starlette's FileResponse (which already streams in
+fixed-size chunks and handles ``Range`` / ``206``) with:
+
+* a caller-supplied strong ETag, also honoured for ``If-Range``;
+* zero-copy transmission when the ASGI server advertises the
+  ``http.response.pathsend`` or ``http.response.zerocopysend`` extensions,
+  falling back to chunked reads otherwise.
+
+FileSliceResponse sends one byte range of a file as a complete ``200``
+response (a download chunk), the same way.
+"""
+
+from dataclasses import dataclass
+import hashlib
+import os
+import typing
+
+import anyio
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+
+def etag_matches(if_none_match: str, etags: typing.Collection[str]) -> bool:
+    """RFC 9110 weak comparison of an If-None-Match header against ``etags``."""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") in etags for tag in candidates)
+
+
+@dataclass(frozen=True)
+class PreEncodedJSON:
+    """A JSON document encoded once, with a strong content-derived ETag."""
+
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> "PreEncodedJSON":
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+    def response(self, if_none_match: typing.Optional[str] = None) -> Response:
+        """The cached body, or an empty ``304`` if the client already has it."""
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if if_none_match and etag_matches(if_none_match, (self.etag,)):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+class BinaryFileResponse(FileResponse):
+    """Stream a file from disk without ever buffering it whole in memory."""
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: str, *, etag: str, stat_result: os.stat_result, **kwargs: typing.Any):
+        self.etag = etag
+        super().__init__(path, stat_result=stat_result, **kwargs)
+        self.headers["etag"] = etag
+
+    def _should_use_range(self, http_if_range: str, stat_result: os.stat_result) -> bool:  # type: ignore[override]
+        return http_if_range == self.etag or http_if_range == self.headers["last-modified"]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self._extensions = scope.get("extensions") or {}
+        await super().__call__(scope, receive, send)
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        if send_header_only:
+            return await super()._handle_simple(send, send_header_only)
+
+        if "http.response.pathsend" in self._extensions:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        elif "http.response.zerocopysend" in self._extensions:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await self._zerocopy(send, 0, self.stat_result.st_size)
+        else:
+            await super()._handle_simple(send, send_header_only)
+
+    async def _handle_single_range(
+        self, send: Send, start: int, end: int, file_size: int, send_header_only: bool
+    ) -> None:
+        if send_header_only or "http.response.zerocopysend" not in self._extensions:
+            return await super()._handle_single_range(send, start, end, file_size, send_header_only)
+
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        await self._zerocopy(send, start, end - start)
+
+    async def _zerocopy(self, send: Send, offset: int, count: int) -> None:
+        """Hand the file descriptor to the server, which uses sendfile(2)."""
+        with open(self.path, "rb") as file:
+            await send(
+                {
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": offset,
+                    "count": count,
+                    "more_body": False,
+                }
+            )
+
+
+class FileSliceResponse(BinaryFileResponse):
+    """``length`` bytes of a file starting at ``offset``; Range headers are ignored."""
+
+    def __init__(self, path: str, *, offset: int, length: int, etag: str, stat_result: os.stat_result, **kwargs):
+        self.offset = offset
+        self.length = length
+        headers = {**(kwargs.pop("headers", None) or {}), "content-length": str(length)}
+        super().__init__(path, etag=etag, stat_result=stat_result, headers=headers, **kwargs)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self._extensions = scope.get("extensions") or {}
+        await self._handle_simple(send, send_header_only=scope["method"].upper() == "HEAD")
+        if self.background is not None:
+            await self.background()
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in self._extensions:
+            await self._zerocopy(send, self.offset, self.length)
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.offset)
+                remaining = self.length
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    remaining = remaining - len(chunk) if chunk else 0
+                    await send({"type": "http.response.body", "body": chunk, "more_body": bool(remaining)})
+                if self.length == 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -0,0 +1,67 @@
+"""
+Admin routes.
+
+POST /admin/revocations  {"kind": "jti" | "sub" | "oid", "value": "...", "expires_at": <unix>?}
+    → Revoke one token (jti) or every session a user started so far (sub / oid).
+
+GET /admin/revocations
+    → Number of active revocations per kind.
+
+GET /admin/usage?since=<unix>
+    → Token usage per user and model from the accounting store.
+
+GET /admin/upstreams
+    → Health, breaker state, in-flight requests and latency per inference upstream (this worker).
+
+Requires a bearer token whose groups / roles include one of ``ADMIN_GROUPS``.
+"""
+
+import asyncio
+
+from fastapi import APIRouter, Depends, Query, status
+
+from app.auth.bearer import require_admin
+from app.auth.revocation import get_revocation_list
+from app.config import Settings, get_settings
+from app.schemas.admin import Revocation, RevocationRequest, RevocationStats, UpstreamStatus, UsageSummary
+from app.services.access_log import audit
+from app.services.upstream_pool import get_upstream_pool
+from app.services.usage import get_usage_ledger
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.post("/revocations", response_model=Revocation, status_code=status.HTTP_201_CREATED)
+async def revoke(body: RevocationRequest, admin: dict = Depends(require_admin)):
+    """Revoke tokens; takes effect on this worker at once and on others within one sync interval."""
+    revocations = get_revocation_list()
+    revocation = await asyncio.to_thread(revocations.revoke, body.kind, body.value, body.expires_at)
+    audit("revoke", admin, kind=body.kind, value=body.value)
+    return revocation
+
+
+@router.get("/revocations", response_model=RevocationStats)
+async def revocation_stats(_admin: dict = Depends(require_admin)):
+    """Active revocation counts."""
+    revocations = get_revocation_list()
+    return RevocationStats(total=len(revocations), entries=revocations.stats())
+
+
+@router.get("/usage", response_model=UsageSummary)
+async def usage_summary(
+    since: float = Query(0.0, ge=0, description="Only count requests after this unix time"),
+    _admin: dict = Depends(require_admin),
+):
+    """Token usage per user and model; records reach the store within one flush interval."""
+    ledger = get_usage_ledger()
+    totals = await asyncio.to_thread(ledger.store.summary, since)
+    return UsageSummary(since=since, totals=totals, pipeline=ledger.stats())
+
+
+@router.get("/upstreams", response_model=list[UpstreamStatus])
+async def upstream_status(
+    _admin: dict = Depends(require_admin),
+    settings: Settings = Depends(get_settings),
+):
+    """What this worker's upstream pool knows about each target."""
+    return get_upstream_pool(settings).stats()
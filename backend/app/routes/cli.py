@@ -1,21 +1,74 @@
 """
-CLI binary download route.
+CLI binary download routes.
 
+GET /cli/manifest    →  versions, sizes and SHA-256 digests per platform
 GET /cli/{platform}  →  binary download
+GET /cli/{platform}?from=<sha256|version>  →  patch from that build, if one exists
+GET /cli/{platform}/chunks          →  chunk offsets and SHA-256 digests
+GET /cli/{platform}/chunks/{index}  →  one chunk, for parallel / resumable downloads
 
 Supported platforms: win, mac-intel, mac-m-series, linux.
+Downloads support Range requests (resumable), If-None-Match and
+Accept-Encoding against precompressed zstd / gzip variants.
 Requires a valid bearer token.
 """
 
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request
 
 from app.auth.bearer import require_auth
-from app.services.cli_service import get_cli_binary
+from app.config import Settings, get_settings
+from app.schemas.cli import CLIChunkManifest, CLIManifest
+from app.services.cli_service import get_cli_binary, get_cli_chunk, get_cli_chunk_manifest, get_cli_manifest
 
 router = APIRouter(prefix="/cli", tags=["CLI Download"])
 
 
+@router.get("/manifest", response_model=CLIManifest)
+async def cli_manifest(
+    _user: dict = Depends(require_auth),
+    settings: Settings = Depends(get_settings),
+):
+    """Describe the latest binary for each platform so clients can skip unchanged downloads."""
+    return get_cli_manifest(settings)
+
+
 @router.get("/{platform}")
-async def download_cli(platform: str, _user: dict = Depends(require_auth)):
+async def download_cli(
+    platform: str,
+    request: Request,
+    from_: Optional[str] = Query(None, alias="from", description="SHA-256 or version of the client's current build"),
+    _user: dict = Depends(require_auth),
+    settings: Settings = Depends(get_settings),
+):
     """Download the Claude CLI binary for the specified platform."""
-    return get_cli_binary(platform)
+    return get_cli_binary(
+        platform,
+        settings,
+        if_none_match=request.headers.get("if-none-match"),
+        accept_encoding=request.headers.get("accept-encoding"),
+        patch_from=from_,
+    )
+
+
+@router.get("/{platform}/chunks", response_model=CLIChunkManifest)
+async def cli_chunk_manifest(
+    platform: str,
+    _user: dict = Depends(require_auth),
+    settings: Settings = Depends(get_settings),
+):
+    """List the binary's fixed-size chunks, each with its own SHA-256."""
+    return get_cli_chunk_manifest(platform, settings)
+
+
+@router.get("/{platform}/chunks/{index}")
+async def download_cli_chunk(
+    platform: str,
+    index: int,
+    request: Request,
+    _user: dict = Depends(require_auth),
+    settings: Settings = Depends(get_settings),
+):
+    """Download one chunk of the binary."""
+    return get_cli_chunk(platform, index, settings, if_none_match=request.headers.get("if-none-match"))
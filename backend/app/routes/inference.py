@@ -0,0 +1,97 @@
+"""
+Inference proxy routes (Anthropic- and OpenAI-compatible).
+
+POST /v1/messages          →  upstream /v1/messages
+POST /v1/chat/completions  →  upstream /v1/chat/completions
+
+Requires a valid bearer token, and the requested model must be visible to
+the caller in the model catalog. The catalog entry's ``upstream`` names
+the pool of endpoints the request is balanced over (``default`` if
+unset). Responses, SSE or JSON, are streamed back as the upstream
+produces them; token usage is recorded per user and model.
+
+Deterministic requests (``temperature: 0``) for models with a
+``response_cache_ttl`` are answered from the response cache when possible
+(``X-Cache: HIT``). ``Cache-Control: no-cache`` skips the lookup and
+``no-store`` bypasses the cache entirely.
+"""
+
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from app.auth.bearer import require_auth
+from app.config import Settings, get_settings
+from app.services.inference_proxy import ResponseTap, forward
+from app.services.model_service import get_usable_model
+from app.services.response_cache import CACHE_HEADER, cache_key, get_response_cache, is_deterministic
+from app.services.upstream_pool import DEFAULT_POOL
+from app.services.usage import get_usage_ledger
+
+router = APIRouter(prefix="/v1", tags=["Inference"])
+
+
+async def _proxy(api: str, request: Request, user: dict, settings: Settings):
+    body = await request.body()
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Request body must be a JSON object")
+    model = payload.get("model")
+    if not isinstance(model, str) or not model:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'model' is required")
+    catalog_entry = get_usable_model(user, model)
+    if catalog_entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Model '{model}' not found")
+
+    upstream = catalog_entry.upstream or DEFAULT_POOL
+    taps: list[ResponseTap] = []
+    if settings.USAGE_ACCOUNTING_ENABLED:
+        taps.append(get_usage_ledger(settings).meter(user, model, api, stream=payload.get("stream") is True))
+
+    cache_control = request.headers.get("cache-control", "").lower()
+    if not (
+        settings.RESPONSE_CACHE_ENABLED
+        and catalog_entry.response_cache_ttl > 0
+        and is_deterministic(payload)
+        and "no-store" not in cache_control
+    ):
+        return await forward(api, body, request.headers, settings, taps, upstream)
+
+    cache = get_response_cache(settings)
+    key = cache_key(api, payload, request.headers)
+    if "no-cache" not in cache_control:
+        cached = await cache.get(key)
+        if cached is not None:
+            for tap in taps:
+                tap.response_started(200, cached.content_type)
+                tap.feed(cached.body)
+                tap.finish("cached")
+            return cached.response()
+
+    taps.append(cache.filler(key, catalog_entry.response_cache_ttl))
+    response = await forward(api, body, request.headers, settings, taps, upstream)
+    response.headers[CACHE_HEADER] = "MISS"
+    return response
+
+
+@router.post("/messages")
+async def create_message(
+    request: Request,
+    user: dict = Depends(require_auth),
+    settings: Settings = Depends(get_settings),
+):
+    """Anthropic Messages API, relayed to the upstream (streaming or not)."""
+    return await _proxy("messages", request, user, settings)
+
+
+@router.post("/chat/completions")
+async def create_chat_completion(
+    request: Request,
+    user: dict = Depends(require_auth),
+    settings: Settings = Depends(get_settings),
+):
+    """OpenAI Chat Completions API, relayed to the upstream (streaming or not)."""
+    return await _proxy("chat_completions", request, user, settings)
@@ -0,0 +1,20 @@
+"""
+Metrics route (Prometheus text exposition format).
+
+GET /metrics  →  text/plain; version=0.0.4
+
+No authentication — restrict access at the network / ingress level.
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.metrics import REGISTRY
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-worker request, auth, download, upstream and token-cache metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -3,19 +3,22 @@ AI model listing route (OpenAI-compatible).
 
 GET /v1/models  →  { "object": "list", "data": [...] }
 
-Requires a valid bearer token.
+Requires a valid bearer token. Served from pre-encoded bytes with an ETag;
+If-None-Match returns 304.
 """
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 
 from app.auth.bearer import require_auth
 from app.schemas.models import ModelListResponse
-from app.services.model_service import list_models
+from app.services.model_service import get_models_payload
 
 router = APIRouter(prefix="/v1", tags=["Models"])
 
 
 @router.get("/models", response_model=ModelListResponse)
-async def get_models(_user: dict = Depends(require_auth)):
+async def get_models(request: Request, user: dict = Depends(require_auth)):
     """Return the list of AI models available through the enterprise proxy."""
-    return list_models()
+    # Returning a Response bypasses response_model re-validation; the schema
+    # is kept for the OpenAPI docs only.
+    return get_models_payload(user).response(request.headers.get("if-none-match"))
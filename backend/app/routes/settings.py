@@ -1,20 +1,61 @@
 """
 Enterprise Claude settings route.
 
-GET /api/claude-settings  →  { "env": {...}, "permissions": {...}, ... }
+GET /api/claude-settings           →  { "env": {...}, "permissions": {...}, ... }
+GET /api/claude-settings?since=N   →  RFC 7386 merge patch from version N, or 304
 
-Requires a valid bearer token.
+Requires a valid bearer token. Served from pre-encoded bytes with an ETag;
+If-None-Match returns 304. Every answer carries the current settings version
+in ``X-Settings-Version``. A client that stored the document and its version
+asks with ``?since=`` next time. It then receives ``304`` if its settings did
+not change, or an ``application/merge-patch+json`` body with just the
+changes. If version N is no longer held, or a patch would not be smaller,
+the full document is sent instead.
 """
 
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import Response
 
 from app.auth.bearer import require_auth
-from app.services.settings_service import get_enterprise_settings
+from app.metrics import SETTINGS_RESPONSES
+from app.schemas.settings import ClaudeSettings
+from app.services.settings_service import get_settings_delta
 
 router = APIRouter(prefix="/api", tags=["Settings"])
 
+VERSION_HEADER = "X-Settings-Version"
+
+# The body is either the full document or, with ``?since=``, a merge patch (a partial object, nulls
+# for removed keys), so the two shapes are documented instead of validated through a response_model.
+_RESPONSES = {
+    200: {
+        "model": ClaudeSettings,
+        "description": "The full settings document, or a merge patch against the version in ``since``",
+        "content": {"application/merge-patch+json": {"schema": {"type": "object"}}},
+    },
+    304: {"description": "The caller's settings are unchanged"},
+}
+
 
-@router.get("/claude-settings")
-async def get_settings(_user: dict = Depends(require_auth)):
-    """Return the enterprise-managed Claude Code settings."""
-    return get_enterprise_settings()
+@router.get("/claude-settings", responses=_RESPONSES)
+async def get_settings(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Settings version the client already holds"),
+    user: dict = Depends(require_auth),
+):
+    """Return the enterprise-managed Claude Code settings resolved for the caller."""
+    delta = get_settings_delta(user, since)
+    headers = {"ETag": delta.document.etag, "Cache-Control": "private, no-cache"}
+    if delta.unchanged:
+        SETTINGS_RESPONSES.inc("unchanged")
+        response = Response(status_code=304, headers=headers)
+    elif delta.patch is not None:
+        SETTINGS_RESPONSES.inc("patch")
+        response = Response(content=delta.patch.body, media_type="application/merge-patch+json", headers=headers)
+    else:
+        SETTINGS_RESPONSES.inc("full")
+        response = delta.document.response(request.headers.get("if-none-match"))
+    response.headers[VERSION_HEADER] = str(delta.version)
+    return response
@@ -1,24 +1,59 @@
 """
-SSO routes: login redirect and OAuth2 callback.
+SSO routes: login redirect, OAuth2 callback and token refresh.
 
 GET /sso/login?redirect=<cli_callback_url>
     → Redirects to Entra ID (or mock login page).
 
 GET /sso/callback?code=<auth_code>&state=<cli_redirect>
-    → Exchanges code for token, redirects CLI with ?token=<jwt>.
+    → Exchanges code for token, redirects CLI with ?token=<jwt>&refresh_token=<opaque>.
+
+POST /sso/refresh  {"refresh_token": "..."}
+    → New access token + rotated refresh token, without a browser round-trip.
 """
 
-from urllib.parse import urlencode
+import asyncio
+import time
+from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import RedirectResponse, HTMLResponse
 
-from app.auth.entra import exchange_code_for_token, get_authorization_url
+from app.auth.entra import exchange_code_for_token, get_authorization_url, sign_session_token, verify_token
+from app.auth.refresh_tokens import (
+    RefreshTokenError,
+    RefreshTokenReuseError,
+    get_refresh_store,
+    session_claims,
+)
+from app.auth.revocation import get_revocation_list
 from app.config import Settings, get_settings
+from app.metrics import TOKEN_REFRESHES
+from app.services.access_log import audit
+from app.schemas.auth import RefreshRequest, TokenResponse
 
 router = APIRouter(prefix="/sso", tags=["SSO Authentication"])
 
 
+async def _start_session(token_data: dict, settings: Settings) -> Optional[str]:
+    """Open a refresh-token family for the identity that just signed in."""
+    if not settings.session_tokens_enabled:
+        return None
+    identity_token = token_data.get("id_token") or token_data.get("access_token", "")
+    payload = await verify_token(identity_token, settings)
+    if payload is None:
+        return None
+    claims = session_claims(payload)
+    claims.setdefault("auth_time", payload.get("iat") or int(time.time()))  # for sub/oid revocation
+    return await asyncio.to_thread(get_refresh_store(settings).issue, claims)
+
+
+def _cli_callback_url(cli_redirect: str, access_token: str, refresh_token: Optional[str]) -> str:
+    callback_url = f"{cli_redirect}?token={access_token}"
+    if refresh_token:
+        callback_url += f"&refresh_token={refresh_token}"
+    return callback_url
+
+
 @router.get("/login")
 async def sso_login(
     redirect: str = Query(..., description="CLI callback URL (e.g. http://127.0.0.1:8080/callback)"),
@@ -37,8 +72,8 @@ async def sso_login(
             redirect_uri=redirect,
             settings=settings,
         )
-        callback_url = f"{redirect}?token={token_data['access_token']}"
-        return RedirectResponse(url=callback_url)
+        refresh_token = await _start_session(token_data, settings)
+        return RedirectResponse(url=_cli_callback_url(redirect, token_data["access_token"], refresh_token))
 
     # Production: redirect to Entra ID with state = CLI redirect URI
     auth_url = get_authorization_url(
@@ -59,7 +94,8 @@ async def sso_callback(
     OAuth2 callback endpoint — Entra ID redirects here after user login.
 
     Exchanges the authorization code for a JWT, then redirects the browser
-    back to the CLI's local callback server with ?token=<jwt>.
+    back to the CLI's local callback server with ?token=<jwt> and, when
+    refresh tokens are enabled, &refresh_token=<opaque>.
     """
     if not code:
         return HTMLResponse(
@@ -83,5 +119,41 @@ async def sso_callback(
 
     # Redirect back to the CLI's local HTTP server with the token
     cli_redirect = state or "http://127.0.0.1:8080/callback"
-    callback_url = f"{cli_redirect}?token={access_token}"
-    return RedirectResponse(url=callback_url)
+    refresh_token = await _start_session(token_data, settings)
+    return RedirectResponse(url=_cli_callback_url(cli_redirect, access_token, refresh_token))
+
+
+@router.post("/refresh", response_model=TokenResponse)
+async def sso_refresh(
+    body: RefreshRequest,
+    settings: Settings = Depends(get_settings),
+):
+    """
+    Exchange a refresh token for a new access token.
+
+    The access token is signed locally (no call to Entra ID) and the refresh
+    token is rotated: the old one stops working, and presenting it again
+    revokes the whole session.
+    """
+    if not settings.session_tokens_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Token refresh is disabled")
+
+    store = get_refresh_store(settings)
+    try:
+        claims, refresh_token = await asyncio.to_thread(store.rotate, body.refresh_token)
+        if get_revocation_list(settings).is_revoked(claims):
+            await asyncio.to_thread(store.revoke, refresh_token)
+            raise RefreshTokenError("Session has been revoked")
+    except RefreshTokenError as exc:
+        outcome = "reused" if isinstance(exc, RefreshTokenReuseError) else "rejected"
+        TOKEN_REFRESHES.inc(outcome)
+        audit("token_refresh", None, outcome=outcome)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(exc),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    TOKEN_REFRESHES.inc("issued")
+    audit("token_refresh", claims, outcome="issued")
+    return TokenResponse(**sign_session_token(claims, settings), refresh_token=refresh_token)
@@ -0,0 +1,50 @@
+"""
+Change subscription routes for the CLI.
+
+GET /api/updates/stream
+    → Server-sent events: a "versions" event now and on every change.
+
+GET /api/updates?models=<v>&settings=<v>&timeout=<s>
+    → Long-poll: returns as soon as any version is newer than given,
+      or after ``timeout`` seconds with "changed": false.
+
+Versions: {"models": <catalog version>, "settings": <settings version>}.
+Requires a valid bearer token.
+"""
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from app.auth.bearer import require_auth
+from app.config import Settings, get_settings
+from app.services.broadcaster import get_broadcaster, sse_stream
+
+router = APIRouter(prefix="/api", tags=["Updates"])
+
+
+@router.get("/updates/stream")
+async def stream_updates(
+    _user: dict = Depends(require_auth),
+    settings: Settings = Depends(get_settings),
+):
+    """Push version bumps of the model catalog and settings as SSE."""
+    return StreamingResponse(
+        sse_stream(get_broadcaster(), settings.UPDATES_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/updates")
+async def poll_updates(
+    models: int = Query(0, description="Catalog version the client already has"),
+    settings_version: int = Query(0, alias="settings", description="Settings version the client already has"),
+    timeout: float = Query(30.0, ge=0, description="Seconds to wait for a change"),
+    _user: dict = Depends(require_auth),
+    settings: Settings = Depends(get_settings),
+):
+    """Long-poll until the catalog or settings version moves past the client's."""
+    broadcaster = get_broadcaster()
+    since = {"models": models, "settings": settings_version}
+    changed = await broadcaster.wait(since, min(timeout, settings.UPDATES_LONG_POLL_MAX_SECONDS))
+    return {"changed": changed, "versions": broadcaster.versions}
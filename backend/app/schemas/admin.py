@@ -0,0 +1,52 @@
+"""Pydantic schemas for the admin API."""
+
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+
+class RevocationRequest(BaseModel):
+    kind: Literal["jti", "sub", "oid"]
+    value: str
+    expires_at: Optional[float] = None  # unix time; defaults per kind
+
+
+class Revocation(BaseModel):
+    kind: str
+    value: str
+    revoked_at: float
+    expires: float
+
+
+class RevocationStats(BaseModel):
+    total: int
+    entries: dict[str, int]  # per kind
+
+
+class UsageTotals(BaseModel):
+    user: str
+    model: str
+    requests: int
+    input_tokens: int
+    output_tokens: int
+    errors: int  # upstream error statuses, failed or cancelled relays
+    cached: int = 0  # served from the response cache (tokens counted, not spent upstream)
+    avg_latency_ms: float
+
+
+class UsageSummary(BaseModel):
+    since: float
+    totals: list[UsageTotals]
+    pipeline: dict[str, int]  # ledger counters: buffered, recorded, flushed, dropped
+
+
+class UpstreamStatus(BaseModel):
+    pool: str
+    url: str
+    healthy: bool  # last active health check
+    breaker: str  # closed | open | half_open
+    breaker_opened: int
+    outstanding: int
+    ewma_ms: float
+    requests: int
+    failures: int
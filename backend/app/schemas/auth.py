@@ -1,5 +1,7 @@
 """Pydantic schemas for authentication / SSO responses."""
 
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -7,6 +9,11 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
     expires_in: int
+    refresh_token: Optional[str] = None  # rotated on every /sso/refresh
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 class SSOLoginParams(BaseModel):
@@ -0,0 +1,49 @@
+"""Pydantic schemas for the CLI binary manifest."""
+
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class CLIEncoding(BaseModel):
+    size: int
+
+
+class CLIPatch(BaseModel):
+    size: int
+
+
+class CLIArtifact(BaseModel):
+    platform: str
+    filename: str
+    version: Optional[str] = None
+    size: int
+    sha256: str
+    url: str
+    chunks_url: str
+    encodings: dict[str, CLIEncoding] = {}
+    patches: dict[str, CLIPatch] = {}  # keyed by the SHA-256 of the build patched from
+
+
+class CLIChunk(BaseModel):
+    index: int
+    offset: int
+    size: int
+    sha256: str
+    url: str
+
+
+class CLIChunkManifest(BaseModel):
+    """Response of GET /cli/{platform}/chunks — fixed-size chunks of the latest binary."""
+    platform: str
+    filename: str
+    version: Optional[str] = None
+    size: int
+    sha256: str
+    chunk_size: int
+    chunks: list[CLIChunk]
+
+
+class CLIManifest(BaseModel):
+    """Response of GET /cli/manifest — one entry per indexed platform."""
+    artifacts: dict[str, CLIArtifact]
@@ -13,3 +13,10 @@ class ModelInfo(BaseModel):
 class ModelListResponse(BaseModel):
     object: str = "list"
     data: list[ModelInfo]
+
+
+class CatalogModel(ModelInfo):
+    """A catalog entry: the public ModelInfo plus proxy-side policy fields."""
+    groups: list[str] = []  # empty → visible to everyone
+    response_cache_ttl: float = 0  # seconds to cache deterministic responses; 0 → never cached
+    upstream: str = ""  # UPSTREAM_POOLS pool serving this model; empty → "default" (UPSTREAM_BASE_URL)
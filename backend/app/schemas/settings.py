@@ -4,12 +4,16 @@ from pydantic import BaseModel
 
 
 class EnvSettings(BaseModel):
+    model_config = {"extra": "allow"}  # policies may set further env vars
+
     ANTHROPIC_BASE_URL: str = ""
     ANTHROPIC_MODEL: str = ""
 
 
 class ClaudeSettings(BaseModel):
     """Top-level settings object sent to the CLI via GET /api/claude-settings."""
+    model_config = {"extra": "allow"}  # pass through other Claude Code settings keys
+
     env: EnvSettings = EnvSettings()
     permissions: dict = {}
     allowedTools: list[str] = []
@@ -0,0 +1,228 @@
+"""
+Structured (JSON lines) access and audit log.
+
+Every HTTP request becomes an AccessRecord, built by AccessLogMiddleware
+from values it already has at hand: method, route template, path, status,
+latency, request / response body bytes, client address and the caller's
+``sub`` (left on the request state by require_auth). Security-relevant
+actions, such as rejected tokens, revocations and refresh-token rotation,
+become AuditRecords through ``audit()``.
+
+Recording appends to a bounded in-memory queue on the event loop; there is
+no I/O and no JSON encoding on the request path. A BatchWriter
+(app.services.batch_writer) encodes and writes each batch in a worker
+thread with a single ``write`` to ``ACCESS_LOG_PATH`` (``-`` means stdout).
+When the writer falls behind and the queue is full, new records are dropped
+and counted (``access_log_records_dropped_total`` on /metrics) instead of
+slowing requests down.
+
+Heartbeat-heavy routes are sampled with ``ACCESS_LOG_SAMPLE_RULES``. For
+example, ``/v1/models=0.01`` keeps one successful /v1/models request in a
+hundred, and ``/health=0`` drops them all. Each record carries its
+``sample_rate`` so counts can be scaled back up. Error responses (status
+>= 400) and audit records are never sampled out.
+"""
+
+from dataclasses import dataclass, field, fields
+import json
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Optional, TextIO, Union
+
+from app.config import Settings, get_settings
+from app.rate_limit import pattern_regex
+from app.services.batch_writer import BatchWriter
+
+
+@dataclass(frozen=True, slots=True)
+class AccessRecord:
+    ts: float
+    method: str
+    route: str  # matched route template, or "unmatched"
+    path: str
+    status: int
+    latency_ms: float
+    bytes_in: int
+    bytes_out: int
+    user: Optional[str]  # token ``sub``; None before / without authentication
+    client: Optional[str]
+    sample_rate: float = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class AuditRecord:
+    ts: float
+    action: str
+    outcome: str
+    user: Optional[str]
+    detail: dict[str, Any] = field(default_factory=dict)
+
+
+LogRecord = Union[AccessRecord, AuditRecord]
+
+_FIELDS = {
+    AccessRecord: ("access", tuple(f.name for f in fields(AccessRecord))),
+    AuditRecord: ("audit", tuple(f.name for f in fields(AuditRecord))),
+}
+
+
+def encode_record(record: LogRecord) -> str:
+    """One JSON line (without the newline) for ``record``."""
+    kind, names = _FIELDS[type(record)]
+    document = {"type": kind}
+    for name in names:
+        document[name] = getattr(record, name)
+    return json.dumps(document, separators=(",", ":"), default=str)
+
+
+# ── Sampling ─────────────────────────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class SampleRule:
+    pattern: str
+    regex: re.Pattern
+    rate: float  # share of successful requests kept, 0..1
+
+
+def parse_sample_rules(spec: str) -> tuple[SampleRule, ...]:
+    """Parse ``ACCESS_LOG_SAMPLE_RULES`` (``<pattern>=<rate>;...``); raises ValueError if malformed."""
+    rules = []
+    for item in filter(None, (part.strip() for part in spec.split(";"))):
+        pattern, sep, value = item.partition("=")
+        pattern = pattern.strip()
+        try:
+            rate = float(value)
+        except ValueError:
+            rate = -1.0
+        if not sep or not pattern or not 0.0 <= rate <= 1.0:
+            raise ValueError(f"Invalid access log sample rule {item!r} (expected <pattern>=<rate between 0 and 1>)")
+        rules.append(SampleRule(pattern, pattern_regex(pattern), rate))
+    return tuple(rules)
+
+
+# ── Sink ─────────────────────────────────────────────────────────────────────
+
+
+class JSONLinesSink:
+    """Appends encoded batches to a file, or to stdout for ``-``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: Optional[TextIO] = None
+        self._lock = threading.Lock()
+
+    def write(self, records: list[LogRecord]) -> None:
+        data = "".join(encode_record(record) + "\n" for record in records)
+        with self._lock:
+            if self.path == "-":
+                sys.stdout.write(data)
+                sys.stdout.flush()
+                return
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(data)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# ── Pipeline ─────────────────────────────────────────────────────────────────
+
+
+class AccessLog(BatchWriter[LogRecord]):
+    """Bounded queue of log records, written by a background task in batches."""
+
+    write_errors = (OSError, ValueError)
+
+    def __init__(
+        self,
+        sink: JSONLinesSink,
+        capacity: int,
+        batch_size: int,
+        flush_interval: float,
+        sample_rules: tuple[SampleRule, ...] = (),
+    ):
+        super().__init__(sink, capacity, batch_size, flush_interval)
+        self.sample_rules = sample_rules
+        self.sampled_out = 0
+
+    def sample_rate(self, path: str) -> float:
+        for rule in self.sample_rules:
+            if rule.regex.match(path):
+                return rule.rate
+        return 1.0
+
+    def request(
+        self,
+        method: str,
+        route: str,
+        path: str,
+        status: int,
+        latency: float,
+        bytes_in: int,
+        bytes_out: int,
+        user: Optional[str],
+        client: Optional[str],
+    ) -> None:
+        """Record one finished HTTP request, subject to sampling."""
+        rate = self.sample_rate(path) if status < 400 else 1.0
+        if rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return
+        self.record(
+            AccessRecord(
+                ts=time.time(),
+                method=method,
+                route=route,
+                path=path,
+                status=status,
+                latency_ms=round(latency * 1000, 3),
+                bytes_in=bytes_in,
+                bytes_out=bytes_out,
+                user=user,
+                client=client,
+                sample_rate=rate,
+            )
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {**super().stats(), "sampled_out": self.sampled_out}
+
+
+_log: Optional[AccessLog] = None
+
+
+def get_access_log(settings: Optional[Settings] = None) -> AccessLog:
+    """Process-wide access log writing to ``ACCESS_LOG_PATH``."""
+    global _log
+    if _log is None:
+        settings = settings or get_settings()
+        _log = AccessLog(
+            JSONLinesSink(settings.ACCESS_LOG_PATH),
+            capacity=settings.ACCESS_LOG_QUEUE_SIZE,
+            batch_size=settings.ACCESS_LOG_BATCH_SIZE,
+            flush_interval=settings.ACCESS_LOG_FLUSH_SECONDS,
+            sample_rules=parse_sample_rules(settings.ACCESS_LOG_SAMPLE_RULES),
+        )
+    return _log
+
+
+def audit(action: str, user: Optional[dict], outcome: str = "ok", **detail: Any) -> None:
+    """Record a security-relevant action; a no-op unless the access log is in use."""
+    if _log is not None:
+        record = AuditRecord(ts=time.time(), action=action, outcome=outcome, user=log_subject(user), detail=detail)
+        _log.record(record)
+
+
+def log_subject(user: Optional[dict]) -> Optional[str]:
+    """The identity log records name: the token's ``sub`` (else ``oid``)."""
+    subject = user and (user.get("sub") or user.get("oid"))
+    return str(subject) if subject else None
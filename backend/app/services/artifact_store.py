@@ -0,0 +1,476 @@
+"""
+Content-addressed CLI artifact index.
+
+Each binary in ``CLI_BINARIES_DIR`` is hashed (SHA-256) once — at startup or
+when the file changes — and gzip / zstd precompressed variants are written
+under ``CLI_BINARIES_DIR/.artifacts/<sha256>.<ext>``. Because variants are
+named by content digest, a rebuilt binary can never be served with a stale
+compressed copy, and restarts reuse the variants already on disk.
+
+Hashing and compression run on a single background worker thread, never on
+the request path. Until a platform has been indexed, lookups return a
+stat-only entry so downloads keep working uncompressed.
+
+The same hashing pass also digests the binary in fixed ``CLI_CHUNK_SIZE``
+chunks, so clients can download chunks in parallel, verify each against
+its own SHA-256 and retry only the ones that fail.
+
+Delta updates: each platform's last ``CLI_DELTA_HISTORY`` builds are
+remembered (``.artifacts/deltas/history.json``), and their zstd copies are
+kept on disk as patch sources (``.artifacts/deltas/<sha256>.zst``, a hard
+link to the zstd variant where possible). After a new build is indexed,
+the worker writes one binary patch per retained build, named
+``.artifacts/deltas/<from-sha256>-<to-sha256>.zstpatch``. A patch is a zstd frame
+compressed against the previous build as a raw-content dictionary, so it
+stores only what changed. It is the same format as ``zstd --patch-from``,
+and a client applies it with
+
+    zstd -d --long=31 --patch-from=<current binary> <patch> -o <new binary>
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from email.utils import formatdate
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Optional
+
+from app.config import Settings
+
+try:
+    import zstandard
+except ImportError:  # optional — gzip-only without it
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+VALID_PLATFORMS = frozenset({"win", "mac-intel", "mac-m-series", "linux"})
+
+ARTIFACTS_SUBDIR = ".artifacts"
+DELTAS_SUBDIR = "deltas"  # under ARTIFACTS_SUBDIR: release history, patch sources and patches
+
+_HASH_CHUNK = 1024 * 1024
+_MIN_DOWNLOAD_CHUNK = 64 * 1024
+
+
+@dataclass(frozen=True)
+class Variant:
+    """A precompressed representation of a binary."""
+
+    encoding: str
+    path: str
+    stat_result: os.stat_result
+
+    @property
+    def size(self) -> int:
+        return self.stat_result.st_size
+
+
+@dataclass(frozen=True)
+class CLIBinary:
+    """A binary on disk plus the validators computed for it."""
+
+    platform: str
+    path: str
+    filename: str
+    stat_result: os.stat_result
+    etag: str
+    last_modified: str
+    sha256: Optional[str] = None
+    version: Optional[str] = None
+    variants: dict[str, Variant] = field(default_factory=dict)
+    oversized: tuple[str, ...] = ()  # variant files no smaller than the binary: kept, never served
+    patches: dict[str, "Patch"] = field(default_factory=dict)  # by source sha256
+    chunk_size: int = 0
+    chunks: tuple[str, ...] = ()  # sha256 of each chunk_size slice, the last one shorter
+
+    def chunk_range(self, index: int) -> tuple[int, int]:
+        """Offset and length of chunk ``index``."""
+        offset = index * self.chunk_size
+        return offset, min(self.chunk_size, self.stat_result.st_size - offset)
+
+    def matches(self, other: os.stat_result) -> bool:
+        return _same_file(self.stat_result, other)
+
+
+@dataclass(frozen=True)
+class Patch:
+    """A binary patch from an earlier build of the same platform."""
+
+    source_sha256: str
+    path: str
+    stat_result: os.stat_result
+
+    @property
+    def size(self) -> int:
+        return self.stat_result.st_size
+
+
+def _same_file(a: os.stat_result, b: os.stat_result) -> bool:
+    return a.st_mtime_ns == b.st_mtime_ns and a.st_size == b.st_size
+
+
+def binary_filename(platform: str) -> str:
+    return f"claude-{platform}" + (".exe" if platform == "win" else "")
+
+
+def _sha256_file(path: str, chunk_size: int) -> tuple[str, tuple[str, ...]]:
+    """Digest of the whole file, and of each ``chunk_size`` slice of it, in one read."""
+    digest = hashlib.sha256()
+    chunks = []
+    with open(path, "rb") as file:
+        while True:
+            chunk_digest = hashlib.sha256()
+            remaining = chunk_size
+            while remaining and (block := file.read(min(_HASH_CHUNK, remaining))):
+                digest.update(block)
+                chunk_digest.update(block)
+                remaining -= len(block)
+            if remaining == chunk_size:
+                break
+            chunks.append(chunk_digest.hexdigest())
+    return digest.hexdigest(), tuple(chunks)
+
+
+def _read_version(path: str) -> Optional[str]:
+    """Optional ``<binary>.version`` sidecar holding the release version."""
+    try:
+        with open(f"{path}.version", encoding="utf-8") as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _compress(source: str, target: str, encoding: str, settings: Settings) -> None:
+    """Write ``target`` atomically so readers never see a partial variant."""
+    tmp = f"{target}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(source, "rb") as src, open(tmp, "wb") as dst:
+        if encoding == "zstd":
+            compressor = zstandard.ZstdCompressor(level=settings.CLI_ZSTD_LEVEL, threads=-1)
+            compressor.copy_stream(src, dst)
+        else:
+            with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=settings.CLI_GZIP_LEVEL, mtime=0) as gz:
+                shutil.copyfileobj(src, gz, _HASH_CHUNK)
+    os.replace(tmp, target)
+
+
+def _read_zst(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return zstandard.ZstdDecompressor().stream_reader(file).read()
+
+
+def _make_patch(base: str, source: str, target: str, settings: Settings) -> None:
+    """
+    Write a ``--patch-from`` style patch turning the contents of ``base`` into
+    those of ``source`` (both .zst copies, named by digest, so neither can
+    change underneath).
+    """
+    reference = _read_zst(base)
+    data = _read_zst(source)
+    # Matches may reach back across the whole reference, so the window must cover both.
+    window_log = max(zstandard.WINDOWLOG_MIN, min(zstandard.WINDOWLOG_MAX, (len(reference) + len(data)).bit_length()))
+    params = zstandard.ZstdCompressionParameters.from_level(
+        settings.CLI_ZSTD_LEVEL, source_size=len(data), window_log=window_log, enable_ldm=True
+    )
+    dictionary = zstandard.ZstdCompressionDict(reference, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+    patch = zstandard.ZstdCompressor(dict_data=dictionary, compression_params=params).compress(data)
+
+    tmp = f"{target}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "wb") as file:
+        file.write(patch)
+    os.replace(tmp, target)
+
+
+def _remove_unlisted(directory: str, live: set[str]) -> None:
+    """Delete files in ``directory`` not named in ``live`` (in-progress writes excepted)."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name not in live and ".tmp-" not in name:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+_EXTENSIONS = {"zstd": "zst", "gzip": "gz"}
+
+HISTORY_FILE = "history.json"
+
+
+class ArtifactIndex:
+    """Per-platform index of hashed, precompressed binaries."""
+
+    def __init__(self, settings: Settings):
+        self.root = settings.CLI_BINARIES_DIR
+        self.settings = settings
+        self.encodings = [
+            enc.strip()
+            for enc in settings.CLI_PRECOMPRESS_ENCODINGS.split(",")
+            if enc.strip() in _EXTENSIONS and (enc.strip() != "zstd" or zstandard is not None)
+        ]
+        self.deltas = settings.CLI_DELTA_ENABLED and settings.CLI_DELTA_HISTORY > 0 and zstandard is not None
+        self._entries: dict[str, CLIBinary] = {}
+        self._history: Optional[dict[str, list[dict]]] = None  # loaded by the worker thread
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifact-index")
+
+    @property
+    def artifacts_dir(self) -> str:
+        return os.path.join(self.root, ARTIFACTS_SUBDIR)
+
+    @property
+    def deltas_dir(self) -> str:
+        return os.path.join(self.artifacts_dir, DELTAS_SUBDIR)
+
+    def _base_path(self, sha256: str) -> str:
+        return os.path.join(self.deltas_dir, f"{sha256}.zst")
+
+    def _patch_path(self, source_sha256: str, sha256: str) -> str:
+        return os.path.join(self.deltas_dir, f"{source_sha256}-{sha256}.zstpatch")
+
+    # ── Lookup (request path: one stat, no hashing) ──
+
+    def get(self, platform: str) -> Optional[CLIBinary]:
+        """
+        Return the entry for ``platform``. If the file is new or changed, a
+        stat-only entry is returned and indexing is scheduled in the background.
+        """
+        filename = binary_filename(platform)
+        path = os.path.join(self.root, filename)
+        try:
+            stat_result = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(platform, None)
+            return None
+
+        entry = self._entries.get(platform)
+        if entry is not None and entry.matches(stat_result):
+            return entry
+
+        self.schedule(platform)
+        return CLIBinary(
+            platform=platform,
+            path=path,
+            filename=filename,
+            stat_result=stat_result,
+            etag=f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"',
+            last_modified=formatdate(stat_result.st_mtime, usegmt=True),
+        )
+
+    def patch_for(self, entry: CLIBinary, current: str) -> Optional[Patch]:
+        """The patch to ``entry`` from the client's build, given as sha256 or version."""
+        patch = entry.patches.get(current.lower())
+        if patch is not None or not entry.patches:
+            return patch
+        for release in (self._history or {}).get(entry.platform, ()):
+            if release.get("version") == current:
+                return entry.patches.get(release["sha256"])
+        return None
+
+    # ── Indexing (background thread) ──
+
+    def schedule(self, platform: str) -> Future:
+        """Queue (re)indexing of ``platform`` unless it is already queued."""
+        with self._lock:
+            pending = self._pending.get(platform)
+            if pending is not None and not pending.done():
+                return pending
+            future = self._executor.submit(self._build_logged, platform)
+            self._pending[platform] = future
+            return future
+
+    def refresh_all(self) -> list[Future]:
+        """Queue indexing for every platform that has a binary on disk."""
+        return [
+            self.schedule(platform)
+            for platform in sorted(VALID_PLATFORMS)
+            if os.path.exists(os.path.join(self.root, binary_filename(platform)))
+        ]
+
+    def _build_logged(self, platform: str) -> Optional[CLIBinary]:
+        try:
+            return self.build(platform)
+        except OSError:
+            logger.exception("Indexing CLI binary for %s failed", platform)
+            return None
+
+    def build(self, platform: str) -> Optional[CLIBinary]:
+        """Hash ``platform``'s binary and make sure its variants exist."""
+        filename = binary_filename(platform)
+        path = os.path.join(self.root, filename)
+        try:
+            before = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        chunk_size = max(self.settings.CLI_CHUNK_SIZE, _MIN_DOWNLOAD_CHUNK)
+        sha256, chunks = _sha256_file(path, chunk_size)
+        os.makedirs(self.artifacts_dir, exist_ok=True)
+
+        written: list[str] = []
+        variants: dict[str, Variant] = {}
+        oversized: list[str] = []
+        for encoding in self.encodings:
+            target = os.path.join(self.artifacts_dir, f"{sha256}.{_EXTENSIONS[encoding]}")
+            if not os.path.exists(target):
+                _compress(path, target, encoding, self.settings)
+                written.append(target)
+            variant = Variant(encoding=encoding, path=target, stat_result=os.stat(target))
+            if variant.size < before.st_size:  # incompressible payloads are served as-is
+                variants[encoding] = variant
+            else:
+                oversized.append(target)  # the marker that spares recompressing it on every reindex
+        if self.deltas and not os.path.exists(self._base_path(sha256)):
+            os.makedirs(self.deltas_dir, exist_ok=True)
+            zstd_variant = os.path.join(self.artifacts_dir, f"{sha256}.zst")
+            try:
+                os.link(zstd_variant, self._base_path(sha256))  # future patch source
+            except OSError:
+                _compress(path, self._base_path(sha256), "zstd", self.settings)
+            written.append(self._base_path(sha256))
+
+        if not _same_file(before, os.stat(path)):
+            # Replaced while hashing — the next lookup re-schedules it. What
+            # was just written may not match the digest it is named after.
+            for target in written:
+                os.remove(target)
+            return None
+
+        entry = CLIBinary(
+            platform=platform,
+            path=path,
+            filename=filename,
+            stat_result=before,
+            etag=f'"{sha256}"',
+            last_modified=formatdate(before.st_mtime, usegmt=True),
+            sha256=sha256,
+            version=_read_version(path),
+            variants=variants,
+            oversized=tuple(oversized),
+            chunk_size=chunk_size,
+            chunks=chunks,
+        )
+        with self._lock:
+            self._entries[platform] = entry
+        if self.deltas:
+            entry = self._build_patches(entry)
+        self._collect_garbage()
+        return entry
+
+    # ── Release history and patches (background thread) ──
+
+    def _load_history(self) -> dict[str, list[dict]]:
+        if self._history is None:
+            try:
+                with open(os.path.join(self.deltas_dir, HISTORY_FILE), encoding="utf-8") as file:
+                    self._history = json.load(file)
+            except (OSError, ValueError):
+                self._history = {}
+        return self._history
+
+    def _record_release(self, entry: CLIBinary) -> list[dict]:
+        """Make ``entry`` the newest build of its platform; return the earlier builds kept."""
+        history = self._load_history()
+        earlier = [r for r in history.get(entry.platform, []) if r["sha256"] != entry.sha256]
+        earlier = earlier[-self.settings.CLI_DELTA_HISTORY:]
+        history[entry.platform] = [*earlier, {"sha256": entry.sha256, "version": entry.version}]
+
+        path = os.path.join(self.deltas_dir, HISTORY_FILE)
+        tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(history, file)
+        os.replace(tmp, path)
+        return earlier
+
+    def _build_patches(self, entry: CLIBinary) -> CLIBinary:
+        """
+        Write patches to ``entry`` from its platform's earlier builds. Runs
+        after ``entry`` is already served; patches no smaller than the full
+        download are kept on disk but not offered.
+        """
+        full_size = min([entry.stat_result.st_size, *(v.size for v in entry.variants.values())])
+        patches: dict[str, Patch] = {}
+        for release in self._record_release(entry):
+            source = release["sha256"]
+            target = self._patch_path(source, entry.sha256)
+            if not os.path.exists(target):
+                if not os.path.exists(self._base_path(source)):
+                    continue
+                try:
+                    _make_patch(self._base_path(source), self._base_path(entry.sha256), target, self.settings)
+                except (zstandard.ZstdError, MemoryError):
+                    logger.exception("Patch %s → %s for %s failed", source[:12], entry.sha256[:12], entry.platform)
+                    continue
+            patch = Patch(source_sha256=source, path=target, stat_result=os.stat(target))
+            if patch.size < full_size:
+                patches[source] = patch
+
+        if not patches:
+            return entry
+        entry = replace(entry, patches=patches)
+        with self._lock:
+            current = self._entries.get(entry.platform)
+            if current is not None and current.sha256 == entry.sha256:
+                self._entries[entry.platform] = entry
+        return entry
+
+    def _collect_garbage(self) -> None:
+        """
+        Delete variants that no indexed binary refers to any more. Skipped
+        until every binary on disk is indexed, so a partially built index
+        never removes variants that are about to be reused.
+        """
+        for platform in VALID_PLATFORMS:
+            try:
+                current = os.stat(os.path.join(self.root, binary_filename(platform)))
+            except FileNotFoundError:
+                continue
+            entry = self._entries.get(platform)
+            if entry is None or not entry.matches(current):
+                return
+
+        live = {os.path.basename(v.path) for e in self._entries.values() for v in e.variants.values()}
+        live.update(os.path.basename(path) for e in self._entries.values() for path in e.oversized)
+        _remove_unlisted(self.artifacts_dir, live | {DELTAS_SUBDIR})
+        if self.deltas:
+            live = {HISTORY_FILE}
+            for releases in self._load_history().values():
+                live.update(os.path.basename(self._base_path(r["sha256"])) for r in releases)
+                live.update(
+                    os.path.basename(self._patch_path(r["sha256"], releases[-1]["sha256"])) for r in releases[:-1]
+                )
+            _remove_unlisted(self.deltas_dir, live)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_index: Optional[ArtifactIndex] = None
+
+
+def get_artifact_index(settings: Settings) -> ArtifactIndex:
+    """Process-wide artifact index for the configured binaries directory."""
+    global _index
+    if _index is None or _index.root != settings.CLI_BINARIES_DIR:
+        if _index is not None:
+            _index.close()
+        _index = ArtifactIndex(settings)
+    return _index
+
+
+def close_artifact_index() -> None:
+    """Stop the indexing worker; called from the app lifespan on shutdown."""
+    global _index
+    if _index is not None:
+        _index.close()
+    _index = None
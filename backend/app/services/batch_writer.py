@@ -0,0 +1,130 @@
+"""
+Background batch writer shared by the usage ledger and the access log.
+
+Recording appends to a bounded in-memory queue on the event loop; there is
+no I/O on the request path. A background task wakes up once a batch is
+ready, or every ``flush_interval`` seconds, takes records off the queue in
+batches and hands each batch to the sink in a worker thread.
+
+Subclasses choose what happens under pressure: ``keep_newest`` makes the
+queue a ring buffer that drops its oldest records when full (otherwise new
+records are refused), and ``_write_failed`` decides whether a batch the
+sink rejected is dropped or put back for the next attempt.
+"""
+
+import asyncio
+from collections import deque
+import logging
+from typing import Generic, Optional, Protocol, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BatchSink(Protocol[T]):
+    """Where batches go; both methods block and run in worker threads."""
+
+    def write(self, records: list[T]) -> None:
+        """Persist one batch."""
+
+    def close(self) -> None:
+        """Release the underlying file or connection."""
+
+
+class BatchWriter(Generic[T]):
+    """Bounded queue of records, written to a sink by a background task in batches."""
+
+    keep_newest = False  # when full: drop the oldest record (True) or the new one (False)
+    write_errors: tuple[type[BaseException], ...] = (OSError,)  # sink failures that do not stop the writer
+
+    def __init__(self, sink: BatchSink[T], capacity: int, batch_size: int, flush_interval: float):
+        self.sink = sink
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: deque[T] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+
+    def record(self, record: T) -> None:
+        """Queue ``record``; O(1), never blocks. Called on the event loop."""
+        if len(self._queue) >= self.capacity:
+            self.dropped += 1
+            if not self.keep_newest or not self._queue:
+                return
+            self._queue.popleft()
+        self._queue.append(record)
+        self.recorded += 1
+        if self._wakeup is not None and len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _take(self) -> list[T]:
+        queue = self._queue
+        return [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+
+    def _write_failed(self, batch: list[T]) -> bool:
+        """Handle a batch the sink rejected; returns whether to go on with the next one."""
+        # By default the batch is lost: a sink that cannot keep up must not back up into requests.
+        logger.exception("%s write failed; dropping %d records", type(self).__name__, len(batch))
+        self.dropped += len(batch)
+        return True
+
+    async def flush(self) -> int:
+        """Write everything queued so far; returns how many records were written."""
+        written = 0
+        while self._queue:
+            batch = self._take()
+            try:
+                await asyncio.to_thread(self.sink.write, batch)
+            except self.write_errors:
+                if self._write_failed(batch):
+                    continue
+                break
+            written += len(batch)
+            self.written += len(batch)
+        return written
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Not a sink failure (e.g. a record that cannot be encoded): that batch
+                # is lost, but the writer must keep running or the queue only fills up.
+                logger.exception("%s flush failed unexpectedly", type(self).__name__)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task, write out what is left and close the sink."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+        await asyncio.to_thread(self.sink.close)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": len(self._queue),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,123 @@
+"""
+In-process version broadcaster for change subscriptions.
+
+Publishers (the model catalog, the enterprise settings) announce a new
+version per topic; subscribers — SSE streams and long-poll requests — wait
+for the next change. Fan-out is O(1) per publish: every waiter parks on the
+same asyncio.Event, which is set and replaced on each change, so thousands of
+idle connections cost one coroutine each and no threads.
+
+Publishing is thread-safe: calls from worker threads (e.g. the catalog file
+watcher) are marshalled onto the event loop the broadcaster is bound to.
+"""
+
+import asyncio
+from contextlib import aclosing
+import json
+from typing import AsyncIterator, Optional
+
+
+class VersionBroadcaster:
+    """Per-topic version counters with change notification."""
+
+    def __init__(self):
+        self._versions: dict[str, int] = {}
+        self._event = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscribers = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Attach to the app's event loop so threads can publish safely."""
+        self._loop = loop
+
+    @property
+    def versions(self) -> dict[str, int]:
+        return dict(self._versions)
+
+    # ── Publishing ──
+
+    def _publish(self, topic: str, version: int) -> None:
+        if self._versions.get(topic) == version:
+            return
+        self._versions[topic] = version
+        event, self._event = self._event, asyncio.Event()
+        event.set()  # wakes every waiter at once
+
+    def publish(self, topic: str, version: int) -> None:
+        """Announce ``version`` for ``topic``; callable from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._publish(topic, version)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._publish(topic, version)
+        else:
+            loop.call_soon_threadsafe(self._publish, topic, version)
+
+    # ── Subscribing ──
+
+    def changed_since(self, since: dict[str, int]) -> bool:
+        return any(version > since.get(topic, 0) for topic, version in self._versions.items())
+
+    async def wait(self, since: dict[str, int], timeout: float) -> bool:
+        """
+        Wait until any topic moves past ``since`` or ``timeout`` elapses.
+        Returns True if something changed.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self.changed_since(since):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def subscribe(self, heartbeat: float) -> AsyncIterator[Optional[dict[str, int]]]:
+        """
+        Yield the current versions immediately and after every change, or
+        None after ``heartbeat`` seconds without one.
+        """
+        self.subscribers += 1
+        try:
+            seen: Optional[dict[str, int]] = None
+            while True:
+                if self._versions != seen:
+                    seen = dict(self._versions)
+                    yield seen
+                    continue
+                try:
+                    await asyncio.wait_for(self._event.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.subscribers -= 1
+
+
+async def sse_stream(broadcaster: VersionBroadcaster, heartbeat: float) -> AsyncIterator[bytes]:
+    """Encode a subscription as server-sent events (comments as keep-alives)."""
+    yield f"retry: {int(heartbeat * 1000)}\n\n".encode()
+    async with aclosing(broadcaster.subscribe(heartbeat)) as subscription:
+        async for versions in subscription:
+            if versions is None:
+                yield b": keepalive\n\n"
+            else:
+                yield b"event: versions\ndata: " + json.dumps(versions).encode() + b"\n\n"
+
+
+_broadcaster: Optional[VersionBroadcaster] = None
+
+
+def get_broadcaster() -> VersionBroadcaster:
+    """Process-wide broadcaster."""
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = VersionBroadcaster()
+    return _broadcaster
@@ -1,35 +1,269 @@
 """
-Mock CLI binary download service.
+CLI binary download service.
 
-In production this would serve real platform-specific binaries.
-In mock mode it returns a tiny placeholder binary.
+Serves the real platform-specific binaries from ``CLI_BINARIES_DIR``
+(``claude-<platform>`` / ``claude-win.exe``). Files are streamed from disk —
+never loaded into memory — with ``Range`` / ``206`` support for resumable
+downloads. Once a binary has been indexed by the artifact store, its ETag is
+its SHA-256 digest and ``Accept-Encoding`` is negotiated against the
+precompressed zstd / gzip variants; nothing is compressed per request.
+
+Clients that already have an earlier build pass it as ``?from=<sha256 or
+version>`` and, when the artifact store made a patch from that build, get
+the patch instead of the whole binary (``X-Patch-Format: zstd-patch-from``):
+
+    zstd -d --long=31 --patch-from=<current binary> <patch> -o <new binary>
+
+The result's digest is in ``X-Checksum-SHA256``. Unknown or too-old builds
+get the full download.
+
+``/cli/{platform}/chunks`` lists the binary as fixed-size chunks with a
+SHA-256 each; ``/cli/{platform}/chunks/{index}`` serves one chunk straight
+from the file (``sendfile`` when the server supports it), so clients can
+fetch over several connections and retry just the chunks that fail.
+
+In mock mode, platforms without a file on disk fall back to a tiny
+placeholder binary.
 """
 
+from typing import Optional
+
 from fastapi import HTTPException, status
 from fastapi.responses import Response
 
-_VALID_PLATFORMS = {"win", "mac-intel", "mac-m-series", "linux"}
+from app.config import Settings, get_settings
+from app.responses import BinaryFileResponse, FileSliceResponse, etag_matches
+from app.schemas.cli import CLIArtifact, CLIChunk, CLIChunkManifest, CLIEncoding, CLIManifest, CLIPatch
+from app.services.artifact_store import VALID_PLATFORMS, CLIBinary, binary_filename, get_artifact_index
+
+_VALID_PLATFORMS = VALID_PLATFORMS
 
 # A tiny ELF / Mach-O stub is overkill for testing — we serve plain bytes.
 _MOCK_BINARY = b"MOCK_CLI_BINARY_PLACEHOLDER_v1.0.0"
 
+# Server preference when the client accepts several encodings equally.
+_ENCODING_PREFERENCE = ("zstd", "gzip")
+
+
+def _negotiate_encoding(accept_encoding: Optional[str], available: set[str]) -> Optional[str]:
+    """Pick the best precompressed variant the client accepts, or None for identity."""
+    if not accept_encoding or not available:
+        return None
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in _ENCODING_PREFERENCE:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if encoding in available and q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _variant_etag(binary: CLIBinary, encoding: str) -> str:
+    return f'"{binary.sha256}.{encoding}"'
+
+
+def _matched_etag(if_none_match: str, binary: CLIBinary) -> Optional[str]:
+    """The ETag of whichever representation of ``binary`` the client already holds, if any."""
+    for etag in (binary.etag, *(_variant_etag(binary, encoding) for encoding in binary.variants)):
+        if etag_matches(if_none_match, {etag}):
+            return etag
+    return None
+
+
+def _indexed_binary(platform: str, settings: Settings) -> CLIBinary:
+    """The platform's binary once it has been hashed; 404 / 503 otherwise."""
+    if platform not in _VALID_PLATFORMS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown platform '{platform}'. Supported: {', '.join(sorted(_VALID_PLATFORMS))}",
+        )
+    binary = get_artifact_index(settings).get(platform)
+    if binary is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No CLI binary available for platform '{platform}'",
+        )
+    if binary.sha256 is None:
+        # New or replaced file; the background indexer is hashing it now.
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"CLI binary for '{platform}' is being indexed",
+            headers={"Retry-After": "1"},
+        )
+    return binary
+
+
+# ── Public API ───────────────────────────────────────────────────────────────
 
-def get_cli_binary(platform: str) -> Response:
+
+def get_cli_binary(
+    platform: str,
+    settings: Optional[Settings] = None,
+    if_none_match: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+    patch_from: Optional[str] = None,
+) -> Response:
     """
     Return a binary download response for the given platform.
 
-    Raises HTTP 404 for unsupported platforms.
+    Raises HTTP 404 for unsupported platforms or when no binary is available.
     """
+    settings = settings or get_settings()
+
     if platform not in _VALID_PLATFORMS:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Unknown platform '{platform}'. Supported: {', '.join(sorted(_VALID_PLATFORMS))}",
         )
 
-    filename = f"claude-{platform}" + (".exe" if platform == "win" else "")
+    binary = get_artifact_index(settings).get(platform)
+
+    if binary is None:
+        if not settings.MOCK_MODE:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No CLI binary available for platform '{platform}'",
+            )
+        return Response(
+            content=_MOCK_BINARY,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{binary_filename(platform)}"'},
+        )
+
+    headers = {"Vary": "Accept-Encoding"}
+    if binary.sha256:
+        headers["X-Checksum-SHA256"] = binary.sha256
+
+    # Any representation of the same digest means the client is up to date.
+    matched = _matched_etag(if_none_match, binary) if if_none_match else None
+    if matched is not None:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": matched, "Last-Modified": binary.last_modified, **headers},
+        )
+
+    if patch_from and binary.sha256:
+        if patch_from.lower() == binary.sha256 or patch_from == binary.version:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": binary.etag, "Last-Modified": binary.last_modified, **headers},
+            )
+        patch = get_artifact_index(settings).patch_for(binary, patch_from)
+        if patch is not None:
+            return BinaryFileResponse(
+                patch.path,
+                etag=f'"{patch.source_sha256}-{binary.sha256}.zstpatch"',
+                stat_result=patch.stat_result,
+                media_type="application/octet-stream",
+                filename=f"{binary.filename}.zstpatch",
+                headers={**headers, "X-Patch-From": patch.source_sha256, "X-Patch-Format": "zstd-patch-from"},
+            )
+
+    encoding = _negotiate_encoding(accept_encoding, set(binary.variants))
+    if encoding is None:
+        return BinaryFileResponse(
+            binary.path,
+            etag=binary.etag,
+            stat_result=binary.stat_result,
+            media_type="application/octet-stream",
+            filename=binary.filename,
+            headers=headers,
+        )
+
+    variant = binary.variants[encoding]
+    return BinaryFileResponse(
+        variant.path,
+        etag=_variant_etag(binary, encoding),
+        stat_result=variant.stat_result,
+        media_type="application/octet-stream",
+        filename=binary.filename,
+        headers={**headers, "Content-Encoding": encoding},
+    )
+
+
+def get_cli_manifest(settings: Optional[Settings] = None) -> CLIManifest:
+    """Versions, sizes and SHA-256 digests of every indexed binary."""
+    settings = settings or get_settings()
+    index = get_artifact_index(settings)
+
+    artifacts = {}
+    for platform in sorted(_VALID_PLATFORMS):
+        binary = index.get(platform)  # also schedules indexing of new / changed files
+        if binary is None or binary.sha256 is None:
+            continue  # missing, or still being hashed
+        artifacts[platform] = CLIArtifact(
+            platform=platform,
+            filename=binary.filename,
+            version=binary.version,
+            size=binary.stat_result.st_size,
+            sha256=binary.sha256,
+            url=f"/cli/{platform}",
+            chunks_url=f"/cli/{platform}/chunks",
+            encodings={enc: CLIEncoding(size=v.size) for enc, v in binary.variants.items()},
+            patches={source: CLIPatch(size=p.size) for source, p in binary.patches.items()},
+        )
+    return CLIManifest(artifacts=artifacts)
+
+
+def get_cli_chunk_manifest(platform: str, settings: Optional[Settings] = None) -> CLIChunkManifest:
+    """Offsets, sizes and SHA-256 digests of the latest binary's chunks."""
+    settings = settings or get_settings()
+    binary = _indexed_binary(platform, settings)
+    chunks = []
+    for index, sha256 in enumerate(binary.chunks):
+        offset, size = binary.chunk_range(index)
+        chunks.append(
+            CLIChunk(index=index, offset=offset, size=size, sha256=sha256, url=f"/cli/{platform}/chunks/{index}")
+        )
+    return CLIChunkManifest(
+        platform=platform,
+        filename=binary.filename,
+        version=binary.version,
+        size=binary.stat_result.st_size,
+        sha256=binary.sha256,
+        chunk_size=binary.chunk_size,
+        chunks=chunks,
+    )
+
+
+def get_cli_chunk(
+    platform: str,
+    index: int,
+    settings: Optional[Settings] = None,
+    if_none_match: Optional[str] = None,
+) -> Response:
+    """One chunk of the latest binary, read straight from the file."""
+    settings = settings or get_settings()
+    binary = _indexed_binary(platform, settings)
+    if not 0 <= index < len(binary.chunks):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Chunk {index} out of range (0-{len(binary.chunks) - 1})",
+        )
+
+    sha256 = binary.chunks[index]
+    etag = f'"{sha256}"'
+    headers = {"X-Checksum-SHA256": sha256, "X-Binary-SHA256": binary.sha256}
+    if if_none_match and etag_matches(if_none_match, (etag,)):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, **headers})
 
-    return Response(
-        content=_MOCK_BINARY,
+    offset, size = binary.chunk_range(index)
+    return FileSliceResponse(
+        binary.path,
+        offset=offset,
+        length=size,
+        etag=etag,
+        stat_result=binary.stat_result,
         media_type="application/octet-stream",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        headers=headers,
     )
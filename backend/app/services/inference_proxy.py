@@ -0,0 +1,314 @@
+"""
+Streaming inference proxy.
+
+POST /v1/messages and /v1/chat/completions are forwarded to a target in
+the model's upstream pool (``UPSTREAM_BASE_URL`` / ``UPSTREAM_POOLS``,
+chosen by latency and load, see app.services.upstream_pool). The proxy's
+upstream credential replaces the caller's bearer token. The upstream
+response, whether SSE or plain JSON, is relayed chunk by chunk as it
+arrives and is never buffered whole:
+
+* Backpressure: the next chunk is read from the upstream socket only after
+  the ASGI server has accepted the previous one, and the server's ``send``
+  waits while the client's socket buffer is full. A slow client therefore
+  slows the upstream read through TCP flow control instead of growing
+  memory.
+* Cancellation: Starlette cancels the response stream when the client
+  disconnects. Closing the upstream response then drops the connection
+  (HTTP/1.1) or resets the stream (HTTP/2), so the upstream stops
+  generating tokens that nobody will read.
+
+Failover: when a target cannot be connected to, or declines the request
+before doing any work (429 / 502 / 503 / 504 / 529), the request is sent
+to the next target of the pool, up to ``UPSTREAM_MAX_ATTEMPTS`` targets.
+Such a request was never processed upstream, so repeating it is safe.
+Errors after the request was accepted (timeouts, 500) are not retried,
+because the upstream may already be generating.
+
+Upstream calls use their own pooled AsyncClient, separate from the
+identity-provider client and sized and timed out for long streaming
+responses. The pool size also caps concurrent upstream streams per worker.
+A request that cannot get a connection within
+``UPSTREAM_POOL_TIMEOUT_SECONDS`` is answered with 503. Like the
+identity-provider client, it is built off the event loop during startup,
+and httpx is only imported at that point.
+"""
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Mapping, Optional, Protocol, Sequence
+
+import anyio
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.config import Settings, get_settings
+from app.http_client import http2_available
+from app.metrics import PROXY_RESPONSES, UPSTREAM_LATENCY
+from app.services.single_flight import SingleFlight
+from app.services.upstream_pool import DEFAULT_POOL, Target, UpstreamPool, get_upstream_pool
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+API_PATHS = {
+    "messages": "/v1/messages",
+    "chat_completions": "/v1/chat/completions",
+}
+
+# Caller headers that carry API semantics rather than proxy credentials. Accept-Encoding is
+# not one of them: usage metering and the response cache read the upstream body as plain bytes.
+_FORWARDED_REQUEST_HEADERS = ("accept", "anthropic-version", "anthropic-beta")
+
+# The upstream declined the request without processing it: try another target.
+_FAILOVER_STATUSES = frozenset({429, 502, 503, 504, 529})
+
+# Hop-by-hop or proxy-specific; the response is re-framed by the ASGI server.
+_DROPPED_RESPONSE_HEADERS = frozenset(
+    {"connection", "keep-alive", "transfer-encoding", "content-length", "te", "trailer", "upgrade", "set-cookie"}
+)
+
+
+class ResponseTap(Protocol):
+    """Observes a relayed response (usage metering, cache fill) without delaying it."""
+
+    def response_started(self, status: int, content_type: str) -> None: ...
+
+    def feed(self, chunk: bytes) -> None: ...
+
+    def finish(self, outcome: str) -> None: ...
+
+
+_client: Optional["httpx.AsyncClient"] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_builds: SingleFlight["httpx.AsyncClient"] = SingleFlight()
+
+
+def build_upstream_client(settings: Optional[Settings] = None) -> "httpx.AsyncClient":
+    """Create the pooled AsyncClient used for upstream inference calls."""
+    import httpx
+
+    settings = settings or get_settings()
+    return httpx.AsyncClient(
+        http2=settings.UPSTREAM_HTTP2_ENABLED and http2_available(),
+        limits=httpx.Limits(
+            max_connections=settings.UPSTREAM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            settings.UPSTREAM_READ_TIMEOUT_SECONDS,
+            connect=settings.UPSTREAM_CONNECT_TIMEOUT_SECONDS,
+            pool=settings.UPSTREAM_POOL_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+# ─── Lifespan ────────────────────────────────────────────────────────────────
+
+
+async def start_upstream_client(settings: Optional[Settings] = None) -> "httpx.AsyncClient":
+    """Create the shared upstream client in a worker thread; called from the app lifespan."""
+    global _client, _client_loop
+    loop = _client_loop = asyncio.get_running_loop()
+    if _client is None:
+        client = await _builds.do("client", lambda: asyncio.to_thread(build_upstream_client, settings))
+        if _client is None and _client_loop is loop:  # not closed meanwhile
+            _client = client
+        return client
+    return _client
+
+
+async def close_upstream_client() -> None:
+    """Close the shared upstream client and its pooled connections."""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def get_upstream_client() -> Optional["httpx.AsyncClient"]:
+    """Return the shared client if it belongs to the running event loop."""
+    return _client if asyncio.get_running_loop() is _client_loop else None
+
+
+# ─── Relay ───────────────────────────────────────────────────────────────────
+
+
+def upstream_headers(api: str, incoming: Mapping[str, str], settings: Settings) -> dict[str, str]:
+    """Headers for the upstream request: API headers from the caller plus the proxy's credential."""
+    headers = {name: incoming[name] for name in _FORWARDED_REQUEST_HEADERS if name in incoming}
+    headers["accept-encoding"] = "identity"
+    headers["content-type"] = "application/json"
+    if settings.UPSTREAM_API_KEY:
+        if api == "messages":
+            headers["x-api-key"] = settings.UPSTREAM_API_KEY
+        else:
+            headers["authorization"] = f"Bearer {settings.UPSTREAM_API_KEY}"
+    return headers
+
+
+def _response_headers(response: "httpx.Response") -> dict[str, str]:
+    headers = {
+        name: value for name, value in response.headers.items() if name.lower() not in _DROPPED_RESPONSE_HEADERS
+    }
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        headers["cache-control"] = "no-cache"
+        headers["x-accel-buffering"] = "no"
+    return headers
+
+
+class _TargetTap:
+    """Feeds a relayed response's outcome back to the target that produced it."""
+
+    def __init__(self, pool: UpstreamPool, target: Target, started: float):
+        self.pool = pool
+        self.target = target
+        self.started = started
+        self.probe = target.begin()
+
+    def response_started(self, status: int, content_type: str) -> None:
+        self.target.observe(time.perf_counter() - self.started, status < 500, self.pool.decay, self.probe)
+
+    def feed(self, chunk: bytes) -> None:
+        pass
+
+    def finish(self, outcome: str) -> None:
+        if outcome == "failed":  # broke off mid-stream
+            self.target.breaker.record(False, time.monotonic(), self.probe)
+        self.target.release(self.probe)
+
+
+async def _relay(
+    api: str,
+    response: "httpx.Response",
+    owned_client: Optional["httpx.AsyncClient"],
+    taps: Sequence[ResponseTap],
+) -> AsyncIterator[bytes]:
+    """Yield upstream bytes as they arrive; always release the upstream connection."""
+    import httpx
+
+    outcome = "cancelled"
+    try:
+        async for chunk in response.aiter_raw():
+            for tap in taps:
+                tap.feed(chunk)
+            yield chunk
+        outcome = "completed"
+    except httpx.HTTPError:
+        outcome = "failed"
+        raise  # abort the client connection rather than end a truncated body cleanly
+    finally:
+        PROXY_RESPONSES.inc(api, outcome)
+        for tap in taps:
+            tap.finish(outcome)
+        # The stream may be closing because its task was cancelled (client
+        # gone); shield the cleanup so the connection is actually released.
+        with anyio.CancelScope(shield=True):
+            await response.aclose()
+            if owned_client is not None:
+                await owned_client.aclose()
+
+
+async def forward(
+    api: str,
+    body: bytes,
+    incoming_headers: Mapping[str, str],
+    settings: Optional[Settings] = None,
+    taps: Sequence[ResponseTap] = (),
+    upstream: str = DEFAULT_POOL,
+) -> StreamingResponse:
+    """
+    Send ``body`` to the ``api`` endpoint of a target in the ``upstream``
+    pool and stream its response back, failing over to other targets while
+    the request has not been processed. Connection failures become 502 /
+    503 / 504 before any byte is sent. Each of ``taps`` sees the status,
+    every relayed chunk and the outcome.
+    """
+    settings = settings or get_settings()
+    pool = get_upstream_pool(settings)
+    if not pool.pools.get(upstream):
+        detail = "Inference upstream is not configured"
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail if upstream == DEFAULT_POOL else f"{detail} (pool '{upstream}')",
+        )
+
+    import httpx
+
+    # Outside the app lifespan (scripts, tests on another loop) use a
+    # short-lived client, closed together with the stream.
+    client = get_upstream_client()
+    if client is None and _client_loop is asyncio.get_running_loop():
+        client = await start_upstream_client(settings)  # still being built by the lifespan
+    owned_client = None
+    if client is None:
+        client = owned_client = build_upstream_client(settings)
+
+    headers = upstream_headers(api, incoming_headers, settings)
+    tried: list[Target] = []
+    while True:
+        target = pool.choose(upstream, exclude=tried)
+        if target is None:  # the pool was reconfigured while failing over
+            if owned_client is not None:
+                await owned_client.aclose()
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="No upstream target left")
+        tried.append(target)
+        can_fail_over = len(tried) < settings.UPSTREAM_MAX_ATTEMPTS and len(tried) < len(pool.pools[upstream])
+
+        request = client.build_request("POST", target.url + API_PATHS[api], content=body, headers=headers)
+        started = time.perf_counter()
+        target_tap = _TargetTap(pool, target, started)
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.HTTPError as exc:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - started, api, "error")
+            local = isinstance(exc, httpx.PoolTimeout)  # no connection to spare here; not the target's fault
+            if not local:
+                target.observe(time.perf_counter() - started, False, pool.decay, target_tap.probe)
+            target.release(target_tap.probe)
+            if can_fail_over and isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout)):
+                logger.warning("Upstream %s unreachable (%r); failing over", target.url, exc)
+                continue
+            if owned_client is not None:
+                await owned_client.aclose()
+            if local:
+                code, detail = status.HTTP_503_SERVICE_UNAVAILABLE, "Upstream connection pool exhausted"
+            elif isinstance(exc, httpx.TimeoutException):
+                code, detail = status.HTTP_504_GATEWAY_TIMEOUT, "Upstream timed out"
+            else:
+                code, detail = status.HTTP_502_BAD_GATEWAY, "Upstream unavailable"
+            logger.warning("Upstream %s request failed: %r", api, exc)
+            for tap in taps:
+                tap.response_started(code, "")
+                tap.finish("failed")
+            raise HTTPException(status_code=code, detail=detail) from exc
+        except BaseException:
+            target.release(target_tap.probe)  # cancelled before the response headers arrived
+            if owned_client is not None:
+                with anyio.CancelScope(shield=True):
+                    await owned_client.aclose()
+            raise
+
+        # Time to response headers: for streams, roughly time to first token.
+        UPSTREAM_LATENCY.observe(time.perf_counter() - started, api, str(response.status_code))
+        if response.status_code in _FAILOVER_STATUSES and can_fail_over:
+            target_tap.response_started(response.status_code, "")
+            target_tap.finish("completed")
+            await response.aclose()
+            logger.warning("Upstream %s answered %d; failing over", target.url, response.status_code)
+            continue
+        break
+
+    taps = [target_tap, *taps]
+    for tap in taps:
+        tap.response_started(response.status_code, response.headers.get("content-type", ""))
+    return StreamingResponse(
+        _relay(api, response, owned_client, taps),
+        status_code=response.status_code,
+        headers=_response_headers(response),
+    )
@@ -1,10 +1,37 @@
 """
-Mock AI model catalog service.
+AI model catalog service.
 
-Returns a fixed list of models available through the enterprise proxy.
+The catalog comes from a pluggable source — the built-in mock list, or a JSON
+file at ``MODEL_CATALOG_PATH`` that is hot-reloaded without restarting
+workers. Each load produces an immutable CatalogSnapshot (indexed by model
+id, with its own catalog version) that replaces the previous one in a single
+reference assignment, so readers never take a lock. Versions are allocated
+through the shared state backend, so every worker reports the same version
+for the same catalog content.
+
+Models may be restricted to groups; the visible list for a caller is derived
+from the groups claim in their JWT. Serialized /v1/models payloads are
+memoized per snapshot and per relevant group-set, so a request costs a set
+intersection and a dict lookup regardless of catalog size.
 """
 
-from app.schemas.models import ModelInfo, ModelListResponse
+import asyncio
+from dataclasses import dataclass, field
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Iterable, Optional, Protocol
+
+from pydantic import ValidationError
+
+from app.config import Settings, get_settings
+from app.responses import PreEncodedJSON
+from app.schemas.models import CatalogModel, ModelInfo, ModelListResponse
+from app.services.single_flight import SingleFlight
+from app.shared_state import get_state_sync
+
+logger = logging.getLogger(__name__)
 
 # ── Mock data ────────────────────────────────────────────────────────────────
 
@@ -16,7 +43,258 @@ _MOCK_MODELS: list[ModelInfo] = [
     ModelInfo(id="claude-3-5-haiku-20241022", created=1713830400, owned_by="anthropic"),
 ]
 
+_MAX_MEMOIZED_GROUP_SETS = 1024
+
+
+# ── Sources ──────────────────────────────────────────────────────────────────
+
+
+class CatalogSource(Protocol):
+    """Where catalog entries come from."""
+
+    def fingerprint(self) -> Any:
+        """Cheap change marker; a different value means ``load`` must be called."""
+
+    def load(self) -> list[dict]:
+        """Return the raw catalog entries."""
+
+
+class StaticCatalogSource:
+    """The built-in mock catalog (never changes)."""
+
+    def __init__(self, models: Iterable[ModelInfo] = _MOCK_MODELS):
+        self._entries = [model.model_dump() for model in models]
+
+    def fingerprint(self) -> Any:
+        return "static"
+
+    def load(self) -> list[dict]:
+        return self._entries
+
+
+class FileCatalogSource:
+    """
+    JSON file holding either a list of models or ``{"data": [...]}``.
+    Changes are detected through the file's mtime and size.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fingerprint(self) -> Any:
+        try:
+            stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat_result.st_mtime_ns, stat_result.st_size)
+
+    def load(self) -> list[dict]:
+        with open(self.path, encoding="utf-8") as file:
+            document = json.load(file)
+        return document["data"] if isinstance(document, dict) else document
+
+
+# ── Snapshot ─────────────────────────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """An immutable view of the catalog at one version."""
+
+    version: int
+    models: tuple[CatalogModel, ...]
+    by_id: dict[str, CatalogModel]
+    entries: tuple[tuple[frozenset[str], ModelInfo], ...]  # catalog order; no groups means public
+    groups: frozenset[str]
+    _payloads: dict[frozenset[str], PreEncodedJSON] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def build(cls, version: int, models: Iterable[CatalogModel]) -> "CatalogSnapshot":
+        models = tuple(models)
+        entries = tuple(
+            (frozenset(model.groups), ModelInfo(**model.model_dump(include=set(ModelInfo.model_fields))))
+            for model in models
+        )
+        return cls(
+            version=version,
+            models=models,
+            by_id={model.id: model for model in models},
+            entries=entries,
+            groups=frozenset(g for model in models for g in model.groups),
+        )
+
+    def get(self, model_id: str) -> Optional[CatalogModel]:
+        return self.by_id.get(model_id)
+
+    def usable(self, model_id: str, user_groups: frozenset[str]) -> Optional[CatalogModel]:
+        """The entry for ``model_id`` if a caller in ``user_groups`` may use it."""
+        model = self.by_id.get(model_id)
+        if model is None or (model.groups and user_groups.isdisjoint(model.groups)):
+            return None
+        return model
+
+    def visible(self, user_groups: frozenset[str]) -> list[ModelInfo]:
+        """Models a caller in ``user_groups`` may see, in catalog order."""
+        return [info for groups, info in self.entries if not groups or groups & user_groups]
+
+    def payload_for(self, user_groups: Iterable[str] = ()) -> PreEncodedJSON:
+        """Pre-encoded /v1/models body for the caller's groups (memoized)."""
+        key = self.groups.intersection(user_groups) if self.groups else frozenset()
+        payload = self._payloads.get(key)
+        if payload is None:
+            body = ModelListResponse(data=self.visible(key)).model_dump_json().encode()
+            payload = PreEncodedJSON.from_bytes(body)
+            if len(self._payloads) >= _MAX_MEMOIZED_GROUP_SETS:
+                self._payloads.clear()
+            self._payloads[key] = payload
+        return payload
+
+
+# ── Catalog ──────────────────────────────────────────────────────────────────
+
+
+class ModelCatalog:
+    """Holds the current snapshot and swaps in new ones when the source changes."""
+
+    def __init__(
+        self,
+        source: CatalogSource,
+        reload_interval: float = 5.0,
+        next_version: Optional[Callable[[Any], int]] = None,
+    ):
+        self.source = source
+        self.reload_interval = reload_interval
+        # fingerprint → version (None: a forced reload); shared across workers
+        self._next_version = next_version
+        self._listeners: list[Callable[[CatalogSnapshot], None]] = []
+        self._fingerprint = source.fingerprint()
+        version = next_version(self._fingerprint) if next_version else 1
+        self._snapshot = CatalogSnapshot.build(version, self._parse(source.load()))
+        self._watcher: Optional[asyncio.Task] = None
+        self._reload_lock = threading.Lock()
+        self._reloads: SingleFlight[bool] = SingleFlight()
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @staticmethod
+    def _parse(entries: list[dict]) -> list[CatalogModel]:
+        return [CatalogModel.model_validate(entry) for entry in entries]
+
+    def on_change(self, listener: Callable[[CatalogSnapshot], None]) -> Callable[[], None]:
+        """Register a callback invoked with each new snapshot; returns a function that unregisters it."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def reload(self, force: bool = False, version: Optional[int] = None) -> bool:
+        """
+        Reload from the source if its fingerprint changed (always if ``force``
+        or an explicit ``version`` is given). Invalid content is logged and
+        the current snapshot kept. Returns True if a new version was published.
+        """
+        with self._reload_lock:
+            fingerprint = self.source.fingerprint()
+            if not force and version is None and fingerprint == self._fingerprint:
+                return False
+            try:
+                models = self._parse(self.source.load())
+            except (OSError, ValueError, KeyError, TypeError, ValidationError):
+                logger.exception("Model catalog reload failed; keeping version %d", self.version)
+                return False
+
+            if version is None:
+                if self._next_version is None:
+                    version = self._snapshot.version + 1
+                else:
+                    version = self._next_version(None if fingerprint == self._fingerprint else fingerprint)
+            self._fingerprint = fingerprint
+            self._snapshot = CatalogSnapshot.build(version, models)
+        for listener in self._listeners:
+            listener(self._snapshot)
+        return True
+
+    async def refresh(self, force: bool = False, version: Optional[int] = None) -> bool:
+        """``reload`` off the event loop; concurrent identical requests share one load."""
+        return await self._reloads.do((force, version), lambda: asyncio.to_thread(self.reload, force, version))
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.refresh()
+
+    def start(self) -> None:
+        """Start polling the source for changes (no-op for static sources)."""
+        if self._watcher is None and self.reload_interval > 0 and not isinstance(self.source, StaticCatalogSource):
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+
+_catalog: Optional[ModelCatalog] = None
+
+
+def get_model_catalog(settings: Optional[Settings] = None) -> ModelCatalog:
+    """Process-wide catalog built from ``MODEL_CATALOG_PATH`` (or the mock list)."""
+    global _catalog
+    if _catalog is None:
+        settings = settings or get_settings()
+        source: CatalogSource
+        if settings.MODEL_CATALOG_PATH:
+            source = FileCatalogSource(settings.MODEL_CATALOG_PATH)
+        else:
+            source = StaticCatalogSource()
+        sync = get_state_sync(settings)
+
+        def next_version(fingerprint: Any) -> int:
+            return sync.bump("models") if fingerprint is None else sync.claim("models", fingerprint)
+
+        _catalog = ModelCatalog(
+            source,
+            reload_interval=settings.MODEL_CATALOG_RELOAD_SECONDS,
+            next_version=next_version,
+        )
+    return _catalog
+
+
+def user_groups(user: Optional[dict], settings: Optional[Settings] = None) -> frozenset[str]:
+    """Group memberships carried in the caller's JWT."""
+    if not user:
+        return frozenset()
+    settings = settings or get_settings()
+    groups = user.get(settings.MODEL_GROUPS_CLAIM)
+    if isinstance(groups, str):
+        return frozenset((groups,))
+    if not isinstance(groups, (list, tuple)):
+        return frozenset()  # missing, or a shape no identity provider emits
+    return frozenset(group for group in groups if isinstance(group, str))
+
+
+# ── Public API ───────────────────────────────────────────────────────────────
+
+
+def list_models(user: Optional[dict] = None) -> ModelListResponse:
+    """Return the AI models visible to ``user`` (all public models if None)."""
+    snapshot = get_model_catalog().snapshot
+    return ModelListResponse(data=snapshot.visible(user_groups(user)))
+
+
+def get_models_payload(user: Optional[dict] = None) -> PreEncodedJSON:
+    """The /v1/models response body for ``user``, pre-encoded with a strong ETag."""
+    return get_model_catalog().snapshot.payload_for(user_groups(user))
+
 
-def list_models() -> ModelListResponse:
-    """Return the full list of available AI models."""
-    return ModelListResponse(data=_MOCK_MODELS)
+def get_usable_model(user: Optional[dict], model_id: str) -> Optional[CatalogModel]:
+    """The catalog entry for ``model_id`` if it is visible to ``user``."""
+    return get_model_catalog().snapshot.usable(model_id, user_groups(user))
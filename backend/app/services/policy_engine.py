@@ -0,0 +1,249 @@
+"""
+Layered settings policy engine.
+
+A policy is a base Claude settings document plus an ordered list of rules.
+Each rule matches on caller claims — ``groups``, ``tenant`` (``tid``) and
+``email_domain`` — and contributes a partial settings document that is
+layered on top of the base:
+
+    {
+      "base": {"env": {...}, "permissions": {...}, "allowedTools": [...]},
+      "rules": [
+        {"name": "contractors",
+         "match": {"email_domain": ["vendor.example"]},
+         "settings": {"permissions": {"deny": ["WebFetch(*)"]}}},
+        ...
+      ]
+    }
+
+Within a rule, every listed dimension must match (AND); within a dimension,
+any listed value matches (OR); an absent dimension matches everyone.
+Layering deep-merges dicts, unions lists (keeping order) and lets later
+rules override scalars. merge_patch() computes the RFC 7386 patch between
+two rendered documents, for clients syncing deltas.
+
+compile_policy() turns the rules into per-dimension bitmask indexes once per
+reload. Rendering is memoized twice: by the caller's *relevant* claims
+(only values some rule mentions) and by the resulting rule mask, so the
+per-request cost is a couple of set intersections and a dict lookup.
+"""
+
+from dataclasses import dataclass, field
+import json
+from typing import Any, Iterable, Optional
+
+from app.responses import PreEncodedJSON
+from app.schemas.settings import ClaudeSettings
+
+DIMENSIONS = ("groups", "tenant", "email_domain")
+
+_MAX_MEMOIZED = 4096
+
+
+def deep_merge(base: Any, overlay: Any) -> Any:
+    """Merge ``overlay`` onto ``base`` without mutating either."""
+    if isinstance(base, dict) and isinstance(overlay, dict):
+        merged = dict(base)
+        for key, value in overlay.items():
+            merged[key] = deep_merge(base[key], value) if key in base else value
+        return merged
+    if isinstance(base, list) and isinstance(overlay, list):
+        return base + [item for item in overlay if item not in base]
+    return overlay
+
+
+def merge_patch(source: Any, target: Any) -> Any:
+    """
+    RFC 7386 merge patch that turns ``source`` into ``target``: changed
+    object members recursively, removed members as ``null``, and any other
+    changed value (including lists) whole.
+    """
+    if not (isinstance(source, dict) and isinstance(target, dict)):
+        return target
+    patch = {key: None for key in source if key not in target}
+    for key, value in target.items():
+        if key not in source:
+            patch[key] = value
+        elif source[key] != value:
+            patch[key] = merge_patch(source[key], value)
+    return patch
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """Apply an RFC 7386 merge patch without mutating ``target``."""
+    if not isinstance(patch, dict):
+        return patch
+    merged = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = apply_merge_patch(merged.get(key), value)
+    return merged
+
+
+@dataclass(frozen=True)
+class PolicyRule:
+    name: str
+    match: dict[str, frozenset[str]]
+    settings: dict
+
+
+@dataclass(frozen=True)
+class Claims:
+    """The claim values the policy engine matches on."""
+
+    groups: frozenset[str] = frozenset()
+    tenant: Optional[str] = None
+    email_domain: Optional[str] = None
+
+    @classmethod
+    def from_payload(cls, payload: Optional[dict], groups_claim: str = "groups") -> "Claims":
+        if not payload:
+            return cls()
+        # Malformed claims are ignored rather than failing the request, as in model_service.user_groups.
+        groups = payload.get(groups_claim)
+        if isinstance(groups, str):
+            groups = (groups,)
+        elif not isinstance(groups, (list, tuple)):
+            groups = ()
+        email = payload.get("email") or payload.get("preferred_username") or payload.get("upn")
+        domain = email.rpartition("@")[2].lower() if isinstance(email, str) and "@" in email else None
+        tenant = payload.get("tid")
+        return cls(
+            groups=frozenset(group for group in groups if isinstance(group, str)),
+            tenant=tenant if isinstance(tenant, str) else None,
+            email_domain=domain,
+        )
+
+    def values(self, dimension: str) -> Iterable[str]:
+        if dimension == "groups":
+            return self.groups
+        value = getattr(self, dimension)
+        return () if value is None else (value,)
+
+
+@dataclass(frozen=True)
+class CompiledPolicy:
+    """Rules compiled into bitmask indexes, with memoized rendering."""
+
+    base: dict
+    rules: tuple[PolicyRule, ...]
+    index: dict[str, dict[str, int]]
+    wildcard: dict[str, int]
+    known: dict[str, frozenset[str]]
+    _by_claims: dict[tuple, PreEncodedJSON] = field(default_factory=dict, repr=False)
+    _by_mask: dict[int, PreEncodedJSON] = field(default_factory=dict, repr=False)
+
+    def _relevant(self, claims: Claims) -> tuple:
+        """Reduce claims to the values some rule mentions (the memo key)."""
+        return tuple(
+            frozenset(self.known[d].intersection(claims.values(d))) for d in DIMENSIONS
+        )
+
+    def mask_for(self, claims: Claims) -> int:
+        """Bitmask of rules matching ``claims``."""
+        mask = (1 << len(self.rules)) - 1
+        for dimension in DIMENSIONS:
+            dim_mask = self.wildcard[dimension]
+            postings = self.index[dimension]
+            for value in claims.values(dimension):
+                dim_mask |= postings.get(value, 0)
+            mask &= dim_mask
+            if not mask:
+                break
+        return mask
+
+    def render(self, claims: Claims) -> dict:
+        """The settings document for ``claims`` (not memoized)."""
+        document = self.base
+        mask = self.mask_for(claims)
+        for position, rule in enumerate(self.rules):
+            if mask >> position & 1:
+                document = deep_merge(document, rule.settings)
+        return ClaudeSettings.model_validate(document).model_dump(mode="json")
+
+    def served_claims(self) -> list[Claims]:
+        """Every caller shape rendered so far, reduced to the claim values the rules match on."""
+        return [
+            Claims(groups=groups, tenant=next(iter(tenant), None), email_domain=next(iter(domain), None))
+            for groups, tenant, domain in list(self._by_claims)
+        ]
+
+    def payload_for(self, claims: Claims) -> PreEncodedJSON:
+        """Pre-encoded settings for ``claims``; a dict lookup once warm."""
+        key = self._relevant(claims)
+        payload = self._by_claims.get(key)
+        if payload is not None:
+            return payload
+
+        mask = self.mask_for(claims)
+        payload = self._by_mask.get(mask)
+        if payload is None:
+            body = json.dumps(self.render(claims), separators=(",", ":")).encode()
+            payload = PreEncodedJSON.from_bytes(body)
+            self._by_mask[mask] = payload
+        if len(self._by_claims) >= _MAX_MEMOIZED:
+            self._by_claims.clear()
+        self._by_claims[key] = payload
+        return payload
+
+
+def compile_policy(document: dict) -> CompiledPolicy:
+    """
+    Validate a policy document and build its matcher. Raises ValueError
+    (pydantic's ValidationError included) if the document is malformed or
+    any rule, applied to the base, yields invalid settings.
+    """
+    if not isinstance(document, dict):
+        raise ValueError("Policy must be a JSON object")
+    base = document.get("base", {})
+    ClaudeSettings.model_validate(base)
+    raw_rules = document.get("rules", [])
+    if not isinstance(raw_rules, list):
+        raise ValueError("Policy 'rules' must be a list")
+
+    rules: list[PolicyRule] = []
+    for position, raw in enumerate(raw_rules):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Rule {position}: must be an object")
+        match = raw.get("match", {})
+        if not isinstance(match, dict):
+            raise ValueError(f"Rule {position}: 'match' must be an object")
+        unknown = set(match) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Rule {position}: unknown match dimension(s) {sorted(unknown)}")
+        normalized: dict[str, frozenset[str]] = {}
+        for dimension, values in match.items():
+            if isinstance(values, str):
+                values = [values]
+            if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+                raise ValueError(f"Rule {position}: match '{dimension}' must be a string or a list of strings")
+            if dimension == "email_domain":
+                values = [value.lower() for value in values]
+            normalized[dimension] = frozenset(values)
+        settings = raw.get("settings", {})
+        if not isinstance(settings, dict):
+            raise ValueError(f"Rule {position}: 'settings' must be an object")
+        ClaudeSettings.model_validate(deep_merge(base, settings))
+        rules.append(PolicyRule(name=raw.get("name", f"rule-{position}"), match=normalized, settings=settings))
+
+    index: dict[str, dict[str, int]] = {d: {} for d in DIMENSIONS}
+    wildcard = {d: 0 for d in DIMENSIONS}
+    for position, rule in enumerate(rules):
+        bit = 1 << position
+        for dimension in DIMENSIONS:
+            values = rule.match.get(dimension)
+            if values is None:
+                wildcard[dimension] |= bit
+                continue
+            for value in values:
+                index[dimension][value] = index[dimension].get(value, 0) | bit
+
+    return CompiledPolicy(
+        base=base,
+        rules=tuple(rules),
+        index=index,
+        wildcard=wildcard,
+        known={d: frozenset(index[d]) for d in DIMENSIONS},
+    )
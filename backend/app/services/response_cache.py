@@ -0,0 +1,395 @@
+"""
+Response cache for deterministic inference requests.
+
+A request is cacheable when two conditions hold. First, its model has a
+``response_cache_ttl`` in the model catalog. Second, the request is
+deterministic: ``temperature`` is 0 and at most one choice is requested.
+
+The cache key is a SHA-256 over the API, the API-version headers and the
+canonicalized body. Canonicalization sorts the keys, drops whitespace and
+normalizes integral floats. It also leaves out the per-caller fields
+``metadata`` and ``user``. As a result, identical requests from any client
+share one entry. The model is part of the body, and so of the key.
+
+Only complete 200 responses are stored, byte for byte, and a cached stream
+is replayed as the same SSE events.
+
+Entries live in two tiers:
+
+* memory: an LRU bounded by ``RESPONSE_CACHE_MEMORY_BYTES``. A hit is a dict
+  lookup on the event loop.
+* disk: optional, under ``RESPONSE_CACHE_DISK_DIR``. Entries evicted from
+  memory spill there; each spill is written in a worker thread. The tier has
+  its own LRU, bounded by ``RESPONSE_CACHE_DISK_BYTES``. A disk hit is read
+  in a worker thread and promoted back to memory. Only ``*.entry`` files
+  (and their ``*.entry-tmp`` partial writes) belong to the tier; anything
+  else in the directory is left alone.
+
+Every entry carries its expiry, and an expired entry is a miss in either
+tier. Hits, misses and the bytes served from cache are exported on
+/metrics.
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from typing import Any, AsyncIterator, Mapping, Optional
+
+from fastapi.responses import Response, StreamingResponse
+
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_HEADER = "x-cache"
+
+# Per-caller fields that do not change the completion.
+_VOLATILE_FIELDS = frozenset({"metadata", "user"})
+# Request headers that select the response format.
+_KEYED_HEADERS = ("anthropic-version", "anthropic-beta")
+
+_HEADER = struct.Struct(">ddH")  # expires, stored, content-type length
+
+# Disk tier file names: "<key>.entry", written via "<key>.<pid>.<thread>.entry-tmp".
+_ENTRY_SUFFIX = ".entry"
+_TMP_SUFFIX = ".entry-tmp"
+
+
+# ── Keys ─────────────────────────────────────────────────────────────────────
+
+
+def is_deterministic(payload: dict) -> bool:
+    """Greedy decoding of a single choice: the same request gives the same answer."""
+    return payload.get("temperature") == 0 and payload.get("n", 1) == 1
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def cache_key(api: str, payload: dict, headers: Mapping[str, str]) -> str:
+    """Hash of the canonical request, independent of formatting and key order."""
+    body = {key: value for key, value in payload.items() if key not in _VOLATILE_FIELDS}
+    digest = hashlib.sha256(api.encode())
+    for name in _KEYED_HEADERS:
+        digest.update(b"\0" + headers.get(name, "").encode())
+    digest.update(b"\0")
+    digest.update(json.dumps(_normalize(body), sort_keys=True, separators=(",", ":")).encode())
+    return digest.hexdigest()
+
+
+# ── Entries ──────────────────────────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    content_type: str
+    body: bytes
+    expires: float
+    stored: float
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    def encode(self) -> bytes:
+        content_type = self.content_type.encode()
+        return _HEADER.pack(self.expires, self.stored, len(content_type)) + content_type + self.body
+
+    @classmethod
+    def decode(cls, data: bytes) -> "CachedResponse":
+        expires, stored, length = _HEADER.unpack_from(data)
+        start = _HEADER.size + length
+        return cls(data[_HEADER.size:start].decode(), data[start:], expires, stored)
+
+    async def _events(self) -> AsyncIterator[bytes]:
+        body, start = self.body, 0
+        while start < len(body):
+            end = body.find(b"\n\n", start)
+            end = len(body) if end < 0 else end + 2
+            yield body[start:end]
+            start = end
+
+    def response(self) -> Response:
+        """Replay the stored response; SSE bodies are sent event by event."""
+        headers = {CACHE_HEADER: "HIT", "age": str(max(0, int(time.time() - self.stored)))}
+        if self.content_type.startswith("text/event-stream"):
+            headers.update({"cache-control": "no-cache", "x-accel-buffering": "no"})
+            return StreamingResponse(self._events(), media_type=self.content_type, headers=headers)
+        return Response(content=self.body, media_type=self.content_type, headers=headers)
+
+
+class _MemoryTier:
+    """Byte-bounded LRU of entries."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.size = 0
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, now: float) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= now:
+            self.discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> list[tuple[str, CachedResponse]]:
+        """Insert ``entry``; returns the least recently used entries it displaced."""
+        self.discard(key)
+        self._entries[key] = entry
+        self.size += entry.size
+        evicted = []
+        while self.size > self.capacity and self._entries:
+            old_key, old = self._entries.popitem(last=False)
+            self.size -= old.size
+            evicted.append((old_key, old))
+        return evicted
+
+    def discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+
+class _DiskTier:
+    """Byte-bounded LRU of entry files; methods run in worker threads."""
+
+    def __init__(self, directory: str, capacity: int):
+        self.directory = directory
+        self.capacity = capacity
+        self.size = 0
+        self._index: OrderedDict[str, int] = OrderedDict()  # key → file size
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _ENTRY_SUFFIX)
+
+    def load(self) -> None:
+        """Index entries left by an earlier run, least recently used first; other files are ignored."""
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(_TMP_SUFFIX):
+                    if entry.stat().st_mtime < time.time() - 60:  # abandoned, not in progress
+                        os.unlink(entry.path)
+                elif entry.name.endswith(_ENTRY_SUFFIX):
+                    stat_result = entry.stat()
+                    key = entry.name[: -len(_ENTRY_SUFFIX)]
+                    found.append((stat_result.st_mtime, key, stat_result.st_size))
+        with self._lock:
+            for _, key, size in sorted(found):
+                self._index[key] = size
+                self.size += size
+        self._evict()
+
+    def read(self, key: str, now: float) -> Optional[CachedResponse]:
+        with self._lock:
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as file:
+                entry = CachedResponse.decode(file.read())
+        except (OSError, struct.error, UnicodeDecodeError):
+            self.delete(key)
+            return None
+        if entry.expires <= now:
+            self.delete(key)
+            return None
+        os.utime(self._path(key))  # recency survives restarts
+        return entry
+
+    def write(self, key: str, entry: CachedResponse) -> None:
+        data = entry.encode()
+        tmp = os.path.join(self.directory, f"{key}.{os.getpid()}.{threading.get_ident()}{_TMP_SUFFIX}")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, "wb") as file:
+                file.write(data)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            logger.exception("Response cache spill to %s failed", self.directory)
+            return
+        with self._lock:
+            self.size += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            size = self._index.pop(key, None)
+            if size is None:
+                return
+            self.size -= size
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        while True:
+            with self._lock:
+                if self.size <= self.capacity or not self._index:
+                    return
+                key = next(iter(self._index))
+            self.delete(key)
+
+
+# ── Cache ────────────────────────────────────────────────────────────────────
+
+
+class ResponseCache:
+    """Memory tier spilling to an optional disk tier, with hit statistics."""
+
+    def __init__(self, memory_bytes: int, disk_dir: str = "", disk_bytes: int = 0, max_entry_bytes: int = 1 << 20):
+        self.memory = _MemoryTier(memory_bytes)
+        self.disk = _DiskTier(disk_dir, disk_bytes) if disk_dir else None
+        self.max_entry_bytes = max_entry_bytes
+        self._spills: set[asyncio.Future] = set()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self.stores = 0
+        self.bytes_saved = 0
+
+    def load(self) -> None:
+        """Index the disk tier; blocking, run once at startup."""
+        if self.disk is not None:
+            self.disk.load()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        now = time.time()
+        entry = self.memory.get(key, now)
+        tier = "memory"
+        if entry is None and self.disk is not None and key in self.disk:
+            entry = await asyncio.to_thread(self.disk.read, key, now)
+            tier = "disk"
+            if entry is not None:
+                self._spill(self.memory.put(key, entry))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits[tier] += 1
+        self.bytes_saved += entry.size
+        return entry
+
+    def put(self, key: str, content_type: str, body: bytes, ttl: float) -> None:
+        """Store a complete response; disk spills happen off the event loop."""
+        if ttl <= 0 or len(body) > self.max_entry_bytes:
+            return
+        now = time.time()
+        self.stores += 1
+        self._spill(self.memory.put(key, CachedResponse(content_type, body, now + ttl, now)))
+
+    def _spill(self, evicted: list[tuple[str, CachedResponse]]) -> None:
+        """Write evicted entries to disk, replacing any older copy of the same key."""
+        if self.disk is None:
+            return
+        now = time.time()
+        try:
+            loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        for key, entry in evicted:
+            if entry.expires <= now:
+                continue
+            if loop is None:
+                self.disk.write(key, entry)
+                continue
+            future = loop.run_in_executor(None, self.disk.write, key, entry)
+            self._spills.add(future)
+            future.add_done_callback(self._spills.discard)
+
+    def filler(self, key: str, ttl: float) -> "CacheFill":
+        return CacheFill(self, key, ttl)
+
+    def stats(self) -> dict[str, Any]:
+        hits = sum(self.hits.values())
+        lookups = hits + self.misses
+        return {
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "stores": self.stores,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size,
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "disk_bytes": self.disk.size if self.disk is not None else 0,
+        }
+
+
+class CacheFill:
+    """Response tap that stores the relayed response once it completes."""
+
+    def __init__(self, cache: ResponseCache, key: str, ttl: float):
+        self.cache = cache
+        self.key = key
+        self.ttl = ttl
+        self.content_type = ""
+        self._parts: list[bytes] = []
+        self._size = 0
+        self._storable = False
+
+    def response_started(self, status: int, content_type: str) -> None:
+        self._storable = status == 200
+        self.content_type = content_type
+
+    def feed(self, chunk: bytes) -> None:
+        if not self._storable:
+            return
+        self._size += len(chunk)
+        if self._size > self.cache.max_entry_bytes:
+            self._storable, self._parts = False, []
+        else:
+            self._parts.append(chunk)
+
+    def finish(self, outcome: str) -> None:
+        if self._storable and outcome == "completed":
+            self.cache.put(self.key, self.content_type, b"".join(self._parts), self.ttl)
+        self._parts = []
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache(settings: Optional[Settings] = None) -> ResponseCache:
+    """Process-wide response cache sized from Settings."""
+    global _cache
+    if _cache is None:
+        settings = settings or get_settings()
+        _cache = ResponseCache(
+            memory_bytes=settings.RESPONSE_CACHE_MEMORY_BYTES,
+            disk_dir=settings.RESPONSE_CACHE_DISK_DIR,
+            disk_bytes=settings.RESPONSE_CACHE_DISK_BYTES,
+            max_entry_bytes=settings.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+        )
+    return _cache
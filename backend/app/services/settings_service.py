@@ -1,42 +1,273 @@
 """
-Mock enterprise settings service.
+Enterprise settings service.
 
 Returns the Claude Code settings that the Go CLI merges into
 ~/.claude/settings.json via fetchAndMergeSettings().
+
+Settings are resolved per caller from a layered policy (see
+app.services.policy_engine) loaded from ``SETTINGS_POLICY_PATH``; without a
+policy file every caller gets the built-in default document. The policy is
+compiled once per reload and rendered documents are memoized per distinct
+claim-set as pre-encoded bytes. Every reload moves to a new settings version,
+allocated through the shared state backend so all workers agree on it, that
+change subscribers are notified of.
+
+The last ``SETTINGS_HISTORY_SIZE`` revisions are kept so that a client that
+already holds version N can ask for just the change (``?since=N``): an
+RFC 7386 merge patch between its document at N and its current one. Patches
+are computed once per pair of rendered documents, not per request. A reload
+precomputes them, before publishing the new version, for every caller shape
+the previous revision served.
 """
 
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Optional
+
+from app.config import Settings, get_settings
+from app.responses import PreEncodedJSON
+from app.services.policy_engine import Claims, CompiledPolicy, apply_merge_patch, compile_policy, merge_patch
+from app.services.single_flight import SingleFlight
+from app.shared_state import get_state_sync
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_SETTINGS: dict = {
+    "env": {
+        "ANTHROPIC_BASE_URL": "https://ai-proxy.domain.local/v1",
+        "ANTHROPIC_MODEL": "claude-sonnet-4-20250514",
+    },
+    "permissions": {
+        "allow": [
+            "Bash(*)",
+            "Read(*)",
+            "Write(*)",
+            "Edit(*)",
+            "WebSearch(*)",
+            "WebFetch(*)",
+        ],
+        "deny": [],
+    },
+    "allowedTools": [
+        "computer",
+        "bash",
+        "edit",
+        "write",
+        "read",
+        "web_search",
+        "web_fetch",
+    ],
+}
+
+
+# ── Policy loading ───────────────────────────────────────────────────────────
+
+
+def _policy_fingerprint(settings: Settings) -> Any:
+    if not settings.SETTINGS_POLICY_PATH:
+        return None
+    try:
+        stat_result = os.stat(settings.SETTINGS_POLICY_PATH)
+    except FileNotFoundError:
+        return None
+    return (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def _load_policy(settings: Settings) -> CompiledPolicy:
+    """Compile the policy file, or the default document if none is configured."""
+    if not settings.SETTINGS_POLICY_PATH:
+        return compile_policy({"base": _DEFAULT_SETTINGS})
+    with open(settings.SETTINGS_POLICY_PATH, encoding="utf-8") as file:
+        document = json.load(file)
+    document.setdefault("base", _DEFAULT_SETTINGS)
+    return compile_policy(document)
+
+
+_policy: Optional[CompiledPolicy] = None
+_policy_fp: Any = None
+_settings_version = 0
+_reload_lock = threading.Lock()
+_reloads: SingleFlight[int] = SingleFlight()
+
+
+def _get_policy() -> CompiledPolicy:
+    """
+    The current policy. The first call claims the shared settings version,
+    which is blocking backend I/O. The app lifespan makes that call in a
+    worker thread, so requests never do; the lazy path serves scripts.
+    """
+    global _policy, _policy_fp, _settings_version
+    if _policy is None:
+        settings = get_settings()
+        _policy_fp = _policy_fingerprint(settings)
+        try:
+            _policy = _load_policy(settings)
+        except (OSError, ValueError) as exc:
+            # As after a failed reload, keep serving; the watcher picks up a fixed file.
+            logger.error("Settings policy is invalid (%s); using the built-in defaults", exc)
+            _policy = compile_policy({"base": _DEFAULT_SETTINGS})
+        _settings_version = get_state_sync(settings).claim("settings", _policy_fp)
+        _remember(_settings_version, _policy, settings)
+    return _policy
+
+
+def _claims(user: Optional[dict]) -> Claims:
+    return Claims.from_payload(user, get_settings().MODEL_GROUPS_CLAIM)
+
+
+# ── Revision history and deltas ──────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class SettingsDelta:
+    """A caller's settings at ``version``, relative to the version they already hold."""
+
+    version: int
+    document: PreEncodedJSON  # the full document at ``version``
+    patch: Optional[PreEncodedJSON] = None  # RFC 7386 merge patch from the requested version
+    unchanged: bool = False
+
+
+_history: "OrderedDict[int, CompiledPolicy]" = OrderedDict()
+_patches: dict[tuple[str, str], Optional[PreEncodedJSON]] = {}
+
+_MAX_PATCHES = 4096
+_NOT_COMPUTED: Any = object()
+
+
+def _remember(version: int, policy: CompiledPolicy, settings: Settings) -> None:
+    _history[version] = policy
+    _history.move_to_end(version)
+    while len(_history) > max(1, settings.SETTINGS_HISTORY_SIZE):
+        _history.popitem(last=False)
+
+
+def _encode_patch(old: PreEncodedJSON, new: PreEncodedJSON) -> Optional[PreEncodedJSON]:
+    """
+    Merge patch turning ``old`` into ``new``; None when the full document is
+    no larger, or when the change cannot be expressed (new ``null`` values).
+    """
+    source, target = json.loads(old.body), json.loads(new.body)
+    patch = merge_patch(source, target)
+    if apply_merge_patch(source, patch) != target:
+        return None
+    body = json.dumps(patch, separators=(",", ":")).encode()
+    return PreEncodedJSON.from_bytes(body) if len(body) < len(new.body) else None
+
+
+def _patch_between(old: PreEncodedJSON, new: PreEncodedJSON) -> Optional[PreEncodedJSON]:
+    key = (old.etag, new.etag)
+    patch = _patches.get(key, _NOT_COMPUTED)  # a reload thread may clear() the dict at any point
+    if patch is _NOT_COMPUTED:
+        if len(_patches) >= _MAX_PATCHES:
+            _patches.clear()
+        patch = _patches[key] = _encode_patch(old, new)
+    return patch
+
+
+def _precompute_patches(previous: CompiledPolicy, policy: CompiledPolicy) -> None:
+    """Render ``policy`` for every caller ``previous`` served and diff each pair."""
+    for claims in previous.served_claims():
+        old, new = previous.payload_for(claims), policy.payload_for(claims)
+        if old.etag != new.etag:
+            _patch_between(old, new)
+
+
+# ── Public API ───────────────────────────────────────────────────────────────
 
-def get_enterprise_settings() -> dict:
+
+def get_enterprise_settings(user: Optional[dict] = None) -> dict:
     """
-    Return the enterprise-managed Claude Code settings.
+    Return the enterprise-managed Claude Code settings for ``user``.
 
     The Go CLI deep-merges this JSON into its local settings file.
     Keys at the top level are merged; the "env" key is deep-merged
     so that existing env vars (like ANTHROPIC_API_KEY) are preserved.
     """
-    return {
-        "env": {
-            "ANTHROPIC_BASE_URL": "https://ai-proxy.domain.local/v1",
-            "ANTHROPIC_MODEL": "claude-sonnet-4-20250514",
-        },
-        "permissions": {
-            "allow": [
-                "Bash(*)",
-                "Read(*)",
-                "Write(*)",
-                "Edit(*)",
-                "WebSearch(*)",
-                "WebFetch(*)",
-            ],
-            "deny": [],
-        },
-        "allowedTools": [
-            "computer",
-            "bash",
-            "edit",
-            "write",
-            "read",
-            "web_search",
-            "web_fetch",
-        ],
-    }
+    return _get_policy().render(_claims(user))
+
+
+def get_settings_delta(user: Optional[dict] = None, since: Optional[int] = None) -> SettingsDelta:
+    """
+    The settings for ``user`` relative to version ``since``: unchanged, a
+    merge patch, or the full document (no ``since``, a version this worker
+    no longer or not yet holds, or a patch that would not be smaller).
+    """
+    policy = _get_policy()
+    version = _settings_version
+    claims = _claims(user)
+    document = policy.payload_for(claims)
+    if since is None:
+        return SettingsDelta(version, document)
+
+    previous = policy if since == version else _history.get(since)
+    if previous is None:
+        return SettingsDelta(version, document)
+    old = previous.payload_for(claims)
+    if old.etag == document.etag:
+        return SettingsDelta(version, document, unchanged=True)
+    return SettingsDelta(version, document, patch=_patch_between(old, document))
+
+
+_listeners: list[Callable[[int], None]] = []
+
+
+def get_settings_version() -> int:
+    """Current version of the enterprise settings document."""
+    _get_policy()
+    return _settings_version
+
+
+def on_settings_change(listener: Callable[[int], None]) -> Callable[[], None]:
+    """Register a callback invoked with the new version after each reload; returns a function that unregisters it."""
+    _listeners.append(listener)
+    return lambda: _listeners.remove(listener)
+
+
+def reload_enterprise_settings(settings: Optional[Settings] = None, version: Optional[int] = None) -> int:
+    """
+    Recompile the policy, move to ``version`` (a new shared version if not
+    given, which other workers then follow) and notify listeners.
+    An invalid policy file is logged and the current policy kept.
+    """
+    global _policy, _policy_fp, _settings_version
+    settings = settings or get_settings()
+    with _reload_lock:
+        fingerprint = _policy_fingerprint(settings)
+        try:
+            policy = _load_policy(settings)
+        except (OSError, ValueError) as exc:
+            logger.error("Settings policy reload failed (%s); keeping version %d", exc, _settings_version)
+            return _settings_version
+
+        if _policy is not None:
+            _precompute_patches(_policy, policy)
+        _policy, _policy_fp = policy, fingerprint
+        _settings_version = version if version is not None else get_state_sync(settings).bump("settings")
+        _remember(_settings_version, policy, settings)
+    for listener in _listeners:
+        listener(_settings_version)
+    return _settings_version
+
+
+async def refresh_enterprise_settings(settings: Optional[Settings] = None, version: Optional[int] = None) -> int:
+    """
+    reload_enterprise_settings() off the event loop. Concurrent requests for
+    the same version share one policy load and compilation.
+    """
+    return await _reloads.do(version, lambda: asyncio.to_thread(reload_enterprise_settings, settings, version))
+
+
+async def watch_settings_policy(settings: Settings) -> None:
+    """Poll ``SETTINGS_POLICY_PATH`` and reload when it changes."""
+    while True:
+        await asyncio.sleep(settings.SETTINGS_POLICY_RELOAD_SECONDS)
+        fingerprint = _policy_fingerprint(settings)
+        if fingerprint != _policy_fp:
+            version = await asyncio.to_thread(get_state_sync(settings).claim, "settings", fingerprint)
+            await refresh_enterprise_settings(settings, version)
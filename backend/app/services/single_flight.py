@@ -0,0 +1,54 @@
+"""
+Async single-flight: coalesce concurrent identical calls.
+
+    flight = SingleFlight()
+    keys = await flight.do("jwks", fetch_jwks)
+
+While a call for a key is in flight, further callers for the same key await
+that call instead of starting their own; they all receive its result, or
+all see its exception. Nothing is cached: the key is released as soon as
+the call finishes — successfully or not — so a failure is never served to
+later callers, and the next call starts fresh.
+
+The call runs as its own task, so one caller being cancelled (e.g. a client
+disconnecting) does not cancel the work the other callers are waiting on.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Per-key deduplication of concurrent async calls."""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0  # calls actually started
+        self.shared = 0  # callers that joined an in-flight call
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an unawaited failure is not logged as lost
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn()`` for ``key`` unless a call for it is already in flight."""
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.calls += 1
+            task.add_done_callback(lambda done, key=key: self._release(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        task = self._inflight.get(key)
+        return task is not None and not task.done()
+
+    def stats(self) -> dict[str, Any]:
+        return {"in_flight": len(self._inflight), "calls": self.calls, "shared": self.shared}
@@ -0,0 +1,337 @@
+"""
+Inference upstream pool: health checks, balancing and circuit breakers.
+
+Upstreams are grouped into named pools. ``UPSTREAM_BASE_URL`` (one URL or
+several, comma-separated) is the ``default`` pool, and ``UPSTREAM_POOLS``
+adds more:
+
+    UPSTREAM_POOLS="us=https://us-1.example,https://us-2.example;eu=https://eu-1.example"
+
+A catalog entry picks its pool with ``"upstream": "<pool>"``; without one,
+the model uses ``default``.
+
+For each request the proxy picks one target from the model's pool:
+
+* Balancing. ``UPSTREAM_BALANCER=ewma`` (the default) scores targets by
+  peak-EWMA latency to response headers times (in-flight requests + 1).
+  A latency spike raises the average at once, and quiet periods decay it
+  back over ``UPSTREAM_EWMA_DECAY_SECONDS``. ``least_outstanding`` picks
+  the target with the fewest in-flight requests. With more than two
+  candidates, two are sampled at random and the better one wins (power of
+  two choices), so workers do not all pile onto the same "best" target.
+* Passive health. Every response feeds a per-target circuit breaker.
+  Connection failures and 5xx responses count as errors. Once at least
+  ``UPSTREAM_BREAKER_MIN_REQUESTS`` requests in a
+  ``UPSTREAM_BREAKER_WINDOW_SECONDS`` window have an error share of
+  ``UPSTREAM_BREAKER_ERROR_RATIO``, the breaker opens. The target then gets
+  no traffic for ``UPSTREAM_BREAKER_OPEN_SECONDS``, after which a single
+  probe request decides between closing and re-opening.
+* Active health. A background task sends ``GET <target><UPSTREAM_HEALTH_PATH>``
+  to every target each ``UPSTREAM_HEALTH_INTERVAL_SECONDS``. A target that
+  cannot be reached or answers 5xx is skipped until a check succeeds.
+
+If every target in a pool is unhealthy or open, all of them are tried
+anyway, because failing fast would only turn a partial outage into a full
+one. Failover (trying the next target) is the proxy's job, see
+``inference_proxy.forward``. State is per worker.
+"""
+
+import asyncio
+from dataclasses import dataclass
+import logging
+import math
+import random
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable, Optional
+
+from app.config import Settings, get_settings
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL = "default"
+
+BALANCERS = ("ewma", "least_outstanding")
+
+_UNMEASURED_LATENCY = 0.001  # seconds; new targets are tried early, then scored on real numbers
+
+
+def parse_pools(base_url: str, spec: str) -> dict[str, list[str]]:
+    """Pool name → target URLs from ``UPSTREAM_BASE_URL`` and ``UPSTREAM_POOLS``; raises ValueError."""
+
+    def urls(value: str) -> list[str]:
+        return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+    pools = {DEFAULT_POOL: urls(base_url)} if urls(base_url) else {}
+    for item in filter(None, (part.strip() for part in spec.split(";"))):
+        name, sep, value = item.partition("=")
+        if not sep or not name.strip() or not urls(value):
+            raise ValueError(f"Invalid upstream pool {item!r} (expected <pool>=<url>[,<url>...])")
+        pools[name.strip()] = urls(value)
+    return pools
+
+
+# ── Circuit breaker ──────────────────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class BreakerPolicy:
+    window: float
+    min_requests: int
+    error_ratio: float
+    open_seconds: float
+
+
+class CircuitBreaker:
+    """Closed → open on an error spike → half-open (one probe) → closed or open again."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, policy: BreakerPolicy):
+        self.policy = policy
+        self.state = self.CLOSED
+        self.opened = 0  # times this breaker has opened
+        self._window_start = 0.0
+        self._requests = 0
+        self._errors = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allows(self, now: float) -> bool:
+        """Whether a request may be sent now (a half-open breaker admits one probe at a time)."""
+        if self.state == self.OPEN and now - self._opened_at >= self.policy.open_seconds:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            return not self._probing
+        return self.state == self.CLOSED
+
+    def attempt(self) -> bool:
+        """A request is being sent; returns whether it is the half-open probe."""
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self, probe: bool) -> None:
+        """An attempt is over. A probe that ended without an outcome (pool timeout, cancelled) frees the slot."""
+        if probe:
+            self._probing = False
+
+    def record(self, ok: bool, now: float, probe: bool = False) -> None:
+        if self.state == self.HALF_OPEN:
+            if not probe:
+                return  # sent before the breaker opened; only the probe decides
+            if ok:
+                self.state = self.CLOSED
+                self._window_start, self._requests, self._errors = now, 0, 0
+            else:
+                self._open(now)
+            return
+        if self.state == self.OPEN:
+            return  # a request sent before the breaker opened
+        if now - self._window_start >= self.policy.window:
+            self._window_start, self._requests, self._errors = now, 0, 0
+        self._requests += 1
+        self._errors += not ok
+        if self._requests >= self.policy.min_requests and self._errors >= self.policy.error_ratio * self._requests:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self.opened += 1
+        self._opened_at = now
+        self._probing = False
+
+
+# ── Targets ──────────────────────────────────────────────────────────────────
+
+
+class Target:
+    """One upstream base URL and what the pool knows about it."""
+
+    def __init__(self, pool: str, url: str, policy: BreakerPolicy):
+        self.pool = pool
+        self.url = url
+        self.breaker = CircuitBreaker(policy)
+        self.healthy = True  # last active health check
+        self.outstanding = 0
+        self.ewma = 0.0  # seconds to response headers
+        self._observed_at = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.breaker.allows(now)
+
+    def begin(self) -> bool:
+        """Count a request being sent; returns whether it is the breaker's half-open probe."""
+        self.outstanding += 1
+        self.requests += 1
+        return self.breaker.attempt()
+
+    def observe(self, latency: float, ok: bool, decay: float, probe: bool = False) -> None:
+        """Record the time to response headers (or to failure) of one request."""
+        now = time.monotonic()
+        if not self._observed_at or latency > self.ewma:
+            self.ewma = latency  # peak-sensitive: slowdowns count at once
+        else:
+            weight = math.exp(-(now - self._observed_at) / decay) if decay > 0 else 0.0
+            self.ewma = self.ewma * weight + latency * (1 - weight)
+        self._observed_at = now
+        self.failures += not ok
+        self.breaker.record(ok, now, probe)
+
+    def release(self, probe: bool = False) -> None:
+        """The request's response has been relayed (or abandoned)."""
+        self.outstanding = max(0, self.outstanding - 1)
+        self.breaker.release(probe)
+
+    def stats(self) -> dict:
+        return {
+            "pool": self.pool,
+            "url": self.url,
+            "healthy": self.healthy,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.opened,
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma * 1000, 3),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+# ── Pool ─────────────────────────────────────────────────────────────────────
+
+
+class UpstreamPool:
+    """Named pools of targets, re-read from settings whenever they change."""
+
+    def __init__(self, settings: Settings):
+        self.pools: dict[str, list[Target]] = {}
+        self.balancer = "ewma"
+        self.decay = 10.0
+        self._spec: Optional[tuple] = None
+        self._task: Optional[asyncio.Task] = None
+        self.configure(settings)
+
+    def configure(self, settings: Settings) -> None:
+        """Apply the upstream settings; targets that stay keep their state."""
+        spec = (
+            settings.UPSTREAM_BASE_URL,
+            settings.UPSTREAM_POOLS,
+            settings.UPSTREAM_BALANCER,
+            settings.UPSTREAM_EWMA_DECAY_SECONDS,
+            settings.UPSTREAM_BREAKER_WINDOW_SECONDS,
+            settings.UPSTREAM_BREAKER_MIN_REQUESTS,
+            settings.UPSTREAM_BREAKER_ERROR_RATIO,
+            settings.UPSTREAM_BREAKER_OPEN_SECONDS,
+        )
+        if spec == self._spec:
+            return
+        if settings.UPSTREAM_BALANCER not in BALANCERS:
+            raise ValueError(f"UPSTREAM_BALANCER must be one of {', '.join(BALANCERS)}")
+        policy = BreakerPolicy(*spec[4:])
+        existing = {(target.pool, target.url): target for target in self.targets()}
+        pools = {}
+        for name, urls in parse_pools(settings.UPSTREAM_BASE_URL, settings.UPSTREAM_POOLS).items():
+            pools[name] = []
+            for url in urls:
+                target = existing.get((name, url)) or Target(name, url, policy)
+                target.breaker.policy = policy
+                pools[name].append(target)
+        self.pools = pools
+        self.balancer = settings.UPSTREAM_BALANCER
+        self.decay = settings.UPSTREAM_EWMA_DECAY_SECONDS
+        self._spec = spec
+
+    def targets(self) -> Iterable[Target]:
+        return (target for targets in self.pools.values() for target in targets)
+
+    def _cost(self, target: Target) -> tuple:
+        latency = target.ewma or _UNMEASURED_LATENCY
+        if self.balancer == "least_outstanding":
+            return (target.outstanding, latency)
+        return (latency * (target.outstanding + 1), target.outstanding)
+
+    def choose(self, pool: str, exclude: Iterable[Target] = ()) -> Optional[Target]:
+        """The target for the next request to ``pool``, skipping ``exclude``; None if none is left."""
+        excluded = set(map(id, exclude))
+        candidates = [target for target in self.pools.get(pool, ()) if id(target) not in excluded]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        available = [target for target in candidates if target.available(now)] or candidates
+        if len(available) > 2:
+            available = random.sample(available, 2)
+        return min(available, key=self._cost)
+
+    # ── Active health checks ──
+
+    async def check(self, client: "httpx.AsyncClient", settings: Settings) -> None:
+        """Probe every target once."""
+        import httpx
+
+        key = settings.UPSTREAM_API_KEY
+        headers = {"x-api-key": key, "authorization": f"Bearer {key}"} if key else {}
+
+        async def probe(target: Target) -> None:
+            try:
+                response = await client.get(
+                    target.url + settings.UPSTREAM_HEALTH_PATH,
+                    headers=headers,
+                    timeout=settings.UPSTREAM_CONNECT_TIMEOUT_SECONDS,
+                )
+                healthy = response.status_code < 500  # 401 / 404 still prove the target is up
+            except httpx.HTTPError:
+                healthy = False
+            if healthy != target.healthy:
+                logger.warning("Upstream %s (%s) is now %s", target.url, target.pool, "up" if healthy else "down")
+            target.healthy = healthy
+
+        await asyncio.gather(*(probe(target) for target in list(self.targets())))
+
+    async def _run(self, client_factory: Callable[[], Awaitable["httpx.AsyncClient"]]) -> None:
+        while True:
+            settings = get_settings()
+            await asyncio.sleep(settings.UPSTREAM_HEALTH_INTERVAL_SECONDS)
+            if not settings.UPSTREAM_HEALTH_PATH:
+                continue
+            try:
+                self.configure(settings)
+                await self.check(await client_factory(), settings)
+            except Exception:
+                logger.exception("Upstream health check failed")
+
+    def start(self, client_factory: Callable[[], Awaitable["httpx.AsyncClient"]]) -> None:
+        """Run active health checks in the background, with clients from ``client_factory``."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(client_factory))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> list[dict]:
+        return [target.stats() for target in self.targets()]
+
+
+_pool: Optional[UpstreamPool] = None
+
+
+def get_upstream_pool(settings: Optional[Settings] = None) -> UpstreamPool:
+    """Process-wide upstream pool, kept in step with the current settings."""
+    global _pool
+    settings = settings or get_settings()
+    if _pool is None:
+        _pool = UpstreamPool(settings)
+    else:
+        _pool.configure(settings)
+    return _pool
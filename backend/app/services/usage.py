@@ -0,0 +1,275 @@
+"""
+Per-user, per-model usage accounting for proxied inference.
+
+Each relayed request gets a UsageMeter. The meter watches response chunks as
+they pass through and picks out the provider's ``usage`` objects: in SSE
+streams only ``data:`` lines containing ``"usage"`` are JSON-decoded (the
+Anthropic ``message_start`` / ``message_delta`` events, or the final OpenAI
+chunk), so content deltas, which are the bulk of a stream, are never
+parsed. For plain JSON responses only the trailing ``usage`` object is
+decoded.
+
+Finished requests become UsageRecords on an in-memory ring buffer, drained
+by a BatchWriter (app.services.batch_writer) into an append-only SQLite
+table, so accounting never adds latency to the request path. If the store
+falls behind and the buffer fills, the oldest unflushed records are dropped
+and counted; a batch the store rejects is kept for the next attempt.
+
+Workers on one host can share the database; SQLite serializes their writes
+(WAL mode, one short transaction per batch).
+"""
+
+from dataclasses import astuple, dataclass, fields
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from app.config import Settings, get_settings
+from app.services.batch_writer import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+_USAGE_MARKER = b'"usage"'
+_MAX_JSON_BODY = 4 * 1024 * 1024  # larger non-streaming bodies are not scanned
+_MAX_PENDING_LINE = 1024 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class UsageRecord:
+    ts: float
+    user: str
+    model: str
+    api: str
+    status: int
+    outcome: str  # completed | cancelled | failed | cached
+    stream: bool
+    input_tokens: int
+    output_tokens: int
+    ttfb_ms: float  # time to upstream response headers
+    latency_ms: float  # until the last byte was relayed
+
+
+_COLUMNS = tuple(field.name for field in fields(UsageRecord))
+
+
+# ── Metering ─────────────────────────────────────────────────────────────────
+
+
+def usage_subject(user: dict) -> str:
+    """The identity usage is attributed to (Entra object id, else subject)."""
+    return str(user.get("oid") or user.get("sub") or "anonymous")
+
+
+class UsageMeter:
+    """Collects usage for one proxied request from the chunks it relays."""
+
+    def __init__(self, ledger: "UsageLedger", user: dict, model: str, api: str, stream: bool):
+        self.ledger = ledger
+        self.user = usage_subject(user)
+        self.model = model
+        self.api = api
+        self.stream = stream
+        self.started = time.perf_counter()
+        self.ttfb = 0.0
+        self.status = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._sse = False
+        self._pending = b""  # SSE: incomplete last line
+        self._body: list[bytes] = []  # JSON: chunks so far
+        self._body_size = 0
+
+    def response_started(self, status: int, content_type: str) -> None:
+        self.ttfb = time.perf_counter() - self.started
+        self.status = status
+        self._sse = content_type.startswith("text/event-stream")
+
+    def feed(self, chunk: bytes) -> None:
+        """Inspect one relayed chunk; cheap unless it carries a usage object."""
+        if not self._sse:
+            self._body_size += len(chunk)
+            if self._body_size <= _MAX_JSON_BODY:
+                self._body.append(chunk)
+            return
+        data = self._pending + chunk if self._pending else chunk
+        if _USAGE_MARKER not in data:
+            newline = data.rfind(b"\n")
+            self._pending = data[newline + 1:] if newline >= 0 else data
+            if len(self._pending) > _MAX_PENDING_LINE:
+                self._pending = b""
+            return
+        *lines, self._pending = data.split(b"\n")
+        for line in lines:
+            if line.startswith(b"data:") and _USAGE_MARKER in line:
+                try:
+                    self._apply(json.loads(line[5:]))
+                except ValueError:
+                    continue
+
+    def _apply(self, event: Any) -> None:
+        if not isinstance(event, dict):
+            return
+        usage = event.get("usage")
+        if usage is None and isinstance(event.get("message"), dict):
+            usage = event["message"].get("usage")  # Anthropic message_start
+        if not isinstance(usage, dict):
+            return
+        # Anthropic reports input in message_start and cumulative output in
+        # message_delta; OpenAI sends both once, in the last chunk.
+        input_tokens = usage.get("input_tokens", usage.get("prompt_tokens"))
+        output_tokens = usage.get("output_tokens", usage.get("completion_tokens"))
+        if isinstance(input_tokens, int):
+            self.input_tokens = max(self.input_tokens, input_tokens)
+        if isinstance(output_tokens, int):
+            self.output_tokens = max(self.output_tokens, output_tokens)
+
+    def _scan_json_body(self) -> None:
+        if not self._body or self._body_size > _MAX_JSON_BODY:
+            return
+        body = b"".join(self._body)
+        self._body = []
+        position = body.rfind(_USAGE_MARKER)
+        start = body.find(b"{", position) if position > 0 else -1
+        if start < 0 or body[position - 1:position] == b"\\":
+            return
+        try:
+            usage, _ = json.JSONDecoder().raw_decode(body[start:].decode("utf-8", "replace"))
+        except ValueError:
+            return
+        self._apply({"usage": usage})
+
+    def finish(self, outcome: str) -> None:
+        """Turn the request into a UsageRecord on the ledger."""
+        if not self._sse:
+            self._scan_json_body()
+        self.ledger.record(
+            UsageRecord(
+                ts=time.time(),
+                user=self.user,
+                model=self.model,
+                api=self.api,
+                status=self.status,
+                outcome=outcome,
+                stream=self.stream,
+                input_tokens=self.input_tokens,
+                output_tokens=self.output_tokens,
+                ttfb_ms=round(self.ttfb * 1000, 3),
+                latency_ms=round((time.perf_counter() - self.started) * 1000, 3),
+            )
+        )
+
+
+# ── Store ────────────────────────────────────────────────────────────────────
+
+
+class SQLiteUsageStore:
+    """Append-only usage table in a local SQLite database."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                "ts REAL NOT NULL, user TEXT NOT NULL, model TEXT NOT NULL, api TEXT NOT NULL, "
+                "status INTEGER NOT NULL, outcome TEXT NOT NULL, stream INTEGER NOT NULL, "
+                "input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL, "
+                "ttfb_ms REAL NOT NULL, latency_ms REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def write(self, records: list[UsageRecord]) -> None:
+        """Write ``records`` in one transaction."""
+        placeholders = ", ".join("?" * len(_COLUMNS))
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    f"INSERT INTO usage ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                    (astuple(record) for record in records),
+                )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def summary(self, since: float = 0.0) -> list[dict]:
+        """Totals per user and model for records newer than ``since``."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT user, model, COUNT(*), SUM(input_tokens), SUM(output_tokens), "
+                "SUM(status >= 400 OR outcome IN ('cancelled', 'failed')), SUM(outcome = 'cached'), "
+                "AVG(latency_ms) FROM usage WHERE ts >= ? GROUP BY user, model ORDER BY user, model",
+                (since,),
+            ).fetchall()
+        keys = ("user", "model", "requests", "input_tokens", "output_tokens", "errors", "cached", "avg_latency_ms")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# ── Ledger ───────────────────────────────────────────────────────────────────
+
+
+class UsageLedger(BatchWriter[UsageRecord]):
+    """Ring buffer of usage records, flushed to the store in background batches."""
+
+    keep_newest = True
+    write_errors = (OSError, sqlite3.Error)
+
+    def __init__(self, store: SQLiteUsageStore, capacity: int, batch_size: int, flush_interval: float):
+        super().__init__(store, capacity, batch_size, flush_interval)
+        self.store = store
+
+    def meter(self, user: dict, model: str, api: str, stream: bool) -> UsageMeter:
+        return UsageMeter(self, user, model, api, stream)
+
+    def _write_failed(self, batch: list[UsageRecord]) -> bool:
+        logger.exception("Usage flush failed; keeping %d records for the next attempt", len(batch))
+        room = self.capacity - len(self._queue)
+        self.dropped += max(0, len(batch) - room)
+        self._queue.extendleft(reversed(batch[:room]))
+        return False
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "buffered": len(self._queue),
+            "recorded": self.recorded,
+            "flushed": self.written,
+            "dropped": self.dropped,
+        }
+
+
+_ledger: Optional[UsageLedger] = None
+
+
+def get_usage_ledger(settings: Optional[Settings] = None) -> UsageLedger:
+    """Process-wide usage ledger writing to ``USAGE_DB_PATH``."""
+    global _ledger
+    if _ledger is None:
+        settings = settings or get_settings()
+        _ledger = UsageLedger(
+            SQLiteUsageStore(settings.USAGE_DB_PATH),
+            capacity=settings.USAGE_BUFFER_SIZE,
+            batch_size=settings.USAGE_BATCH_SIZE,
+            flush_interval=settings.USAGE_FLUSH_SECONDS,
+        )
+    return _ledger
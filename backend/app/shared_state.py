@@ -0,0 +1,554 @@
+"""
+Shared state for multi-worker deployments.
+
+Every worker keeps its hot caches (verified tokens, catalog snapshots,
+compiled settings) in process memory; what workers share is the small amount
+of state needed to keep those caches consistent — per-topic generation
+counters plus a key/value store for cross-worker data.
+
+Backends (``STATE_BACKEND``):
+
+- ``memory`` — process-local; the default for a single worker.
+- ``file``   — one file per key in a directory on shared local storage
+  (``/dev/shm`` by default), for several workers on one host.
+- ``redis``  — any server speaking the Redis protocol, for several replicas.
+  The client implements the handful of commands used here directly over a
+  socket, so no extra dependency is needed.
+
+StateSync polls the generation counters every ``STATE_SYNC_SECONDS`` and
+runs the local handler for each topic another worker bumped, so a reload on
+one worker (config, catalog, settings policy, signing keys) reaches every
+worker within one sync interval and all of them report the same version.
+"""
+
+import asyncio
+from contextlib import suppress
+import hashlib
+import inspect
+import logging
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, Protocol, Union
+from urllib.parse import unquote, urlsplit
+
+from app.config import Settings, get_settings
+
+try:  # POSIX only; without it the file backend is safe within one process
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+CLAIM_TTL_SECONDS = 86_400
+
+
+class StateBackendError(RuntimeError):
+    """The shared state backend rejected a command or is unreachable."""
+
+
+class StateBackend(Protocol):
+    """Minimal key/value store shared by all workers."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value for ``key``, or None if absent or expired."""
+
+    def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        """``get`` for several keys in one round trip."""
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store ``value``, expiring after ``ttl`` seconds if given."""
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Store ``value`` only if ``key`` is absent; True if it was stored."""
+
+    def delete(self, key: str) -> None:
+        """Remove ``key`` if present."""
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        """Atomically add ``amount`` to an integer value and return it."""
+
+    def close(self) -> None:
+        """Release connections / handles."""
+
+
+# ── Memory ───────────────────────────────────────────────────────────────────
+
+
+class MemoryStateBackend:
+    """Process-local backend (single worker)."""
+
+    def __init__(self):
+        self._values: dict[str, tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires and expires <= time.time():
+            del self._values[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key)
+
+    def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        with self._lock:
+            return [self._live(key) for key in keys]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._values[key] = (time.time() + ttl if ttl else 0.0, value)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._values[key] = (time.time() + ttl if ttl else 0.0, value)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        with self._lock:
+            value = int(self._live(key) or 0) + amount
+            self._values[key] = (0.0, str(value).encode())
+            return value
+
+    def close(self) -> None:
+        pass
+
+
+# ── File ─────────────────────────────────────────────────────────────────────
+
+_HEADER = struct.Struct(">d")  # expiry as a unix timestamp, 0 = never
+
+
+def default_state_dir() -> str:
+    """``/dev/shm`` (RAM-backed) when available, else the temp directory."""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "wrapper-ai-proxy")
+
+
+class FileStateBackend:
+    """
+    One file per key, replaced atomically with os.replace so readers never
+    see a partial value. Increments are serialized with an flock on a
+    sidecar lock file; ``add`` relies on os.link failing if the key exists.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest()[:40])
+
+    @staticmethod
+    def _encode(value: bytes, ttl: Optional[float]) -> bytes:
+        return _HEADER.pack(time.time() + ttl if ttl else 0.0) + value
+
+    def _write_tmp(self, data: bytes) -> str:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        return tmp
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < _HEADER.size:
+            return None
+        (expires,) = _HEADER.unpack_from(data)
+        if expires and expires <= time.time():
+            with suppress(FileNotFoundError):
+                os.unlink(path)
+            return None
+        return data[_HEADER.size :]
+
+    def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return [self.get(key) for key in keys]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        os.replace(self._write_tmp(self._encode(value, ttl)), self._path(key))
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        path = self._path(key)
+        tmp = self._write_tmp(self._encode(value, ttl))
+        try:
+            for _ in range(2):
+                try:
+                    os.link(tmp, path)
+                    return True
+                except FileExistsError:
+                    if self.get(key) is not None:  # also unlinks an expired entry
+                        return False
+            return False
+        finally:
+            os.unlink(tmp)
+
+    def delete(self, key: str) -> None:
+        with suppress(FileNotFoundError):
+            os.unlink(self._path(key))
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        path = self._path(key)
+        with self._lock, open(path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                value = int(self.get(key) or 0) + amount
+                self.set(key, str(value).encode())
+                return value
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        pass
+
+
+# ── Redis protocol ───────────────────────────────────────────────────────────
+
+
+class RedisStateBackend:
+    """
+    Blocking RESP2 client for ``redis://[user:password@]host[:port][/db]``.
+    One connection per worker, guarded by a lock; a dropped connection is
+    re-established once per command.
+    """
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            raise ValueError(f"Unsupported state backend URL scheme: {parts.scheme!r}")
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.username = unquote(parts.username) if parts.username else None
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader: Any = None
+        self._lock = threading.Lock()
+
+    # ── Wire protocol ──
+
+    @staticmethod
+    def _encode(args: tuple) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    def _read_reply(self) -> Any:
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("state backend closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise StateBackendError(rest.decode(errors="replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            return None if count < 0 else [self._read_reply() for _ in range(count)]
+        raise StateBackendError(f"Unexpected reply {line!r}")
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+        try:
+            if self.password is not None:
+                auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+                self._roundtrip(auth)
+            if self.db:
+                self._roundtrip(("SELECT", self.db))
+        except BaseException:
+            self._disconnect()
+            raise
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            with suppress(OSError):
+                self._reader.close()
+                self._sock.close()
+        self._sock = self._reader = None
+
+    def _roundtrip(self, args: tuple) -> Any:
+        self._sock.sendall(self._encode(args))  # type: ignore[union-attr]
+        return self._read_reply()
+
+    def command(self, *args: Union[str, bytes, int]) -> Any:
+        """Send one command and return its decoded reply."""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._roundtrip(args)
+                except (OSError, ConnectionError) as exc:
+                    self._disconnect()
+                    if attempt:
+                        raise StateBackendError(f"state backend unavailable: {exc}") from exc
+
+    # ── StateBackend ──
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.command("GET", key)
+
+    def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return self.command("MGET", *keys) if keys else []
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if ttl:
+            self.command("SET", key, value, "PX", max(1, int(ttl * 1000)))
+        else:
+            self.command("SET", key, value)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        args: tuple = ("SET", key, value, "NX")
+        if ttl:
+            args += ("PX", max(1, int(ttl * 1000)))
+        return self.command(*args) is not None
+
+    def delete(self, key: str) -> None:
+        self.command("DEL", key)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        return self.command("INCRBY", key, amount)
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+
+class PrefixedBackend:
+    """Namespace every key so several deployments can share one store."""
+
+    def __init__(self, backend: StateBackend, prefix: str):
+        self.backend = backend
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.backend.get(self.prefix + key)
+
+    def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return self.backend.get_many([self.prefix + key for key in keys])
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.backend.set(self.prefix + key, value, ttl)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return self.backend.add(self.prefix + key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.backend.delete(self.prefix + key)
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        return self.backend.incr(self.prefix + key, amount)
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+def create_state_backend(settings: Settings) -> StateBackend:
+    """Build the backend selected by ``STATE_BACKEND``."""
+    kind = settings.STATE_BACKEND.lower()
+    backend: StateBackend
+    if kind == "memory":
+        return MemoryStateBackend()
+    if kind == "file":
+        backend = FileStateBackend(settings.STATE_FILE_DIR or default_state_dir())
+    elif kind == "redis":
+        backend = RedisStateBackend(settings.STATE_REDIS_URL)
+    else:
+        raise ValueError(f"Unknown STATE_BACKEND {settings.STATE_BACKEND!r} (expected memory, file or redis)")
+    return PrefixedBackend(backend, settings.STATE_KEY_PREFIX)
+
+
+# ── Generations ──────────────────────────────────────────────────────────────
+
+Handler = Callable[[int], Union[None, Awaitable[Any]]]
+
+
+def _fingerprint_digest(fingerprint: Any) -> str:
+    return hashlib.sha256(repr(fingerprint).encode()).hexdigest()[:32]
+
+
+class StateSync:
+    """Per-topic generation counters shared by all workers."""
+
+    def __init__(self, backend: StateBackend, interval: float = 1.0):
+        self.backend = backend
+        self.interval = interval
+        self._handlers: dict[str, Handler] = {}
+        self._watches: dict[str, tuple[Callable[[], Any], Any]] = {}
+        self._seen: dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _mark(self, topic: str, generation: int) -> int:
+        self._seen[topic] = max(self._seen.get(topic, 0), generation)
+        return generation
+
+    def generation(self, topic: str) -> int:
+        return int(self.backend.get(f"gen:{topic}") or 0)
+
+    def bump(self, topic: str) -> int:
+        """Start a new generation of ``topic`` (other workers will follow)."""
+        return self._mark(topic, self.backend.incr(f"gen:{topic}"))
+
+    def claim(self, topic: str, fingerprint: Any) -> int:
+        """
+        The generation for content identified by ``fingerprint``. Workers that
+        load the same content independently (e.g. each polling the same file)
+        all get the number allocated by whichever of them claimed it first.
+        """
+        return self._mark(topic, self._claim(topic, fingerprint))
+
+    def _claim(self, topic: str, fingerprint: Any) -> int:
+        key = f"claim:{topic}:{_fingerprint_digest(fingerprint)}"
+        existing = self.backend.get(key)
+        if existing is None:
+            candidate = self.backend.incr(f"gen:{topic}")
+            if self.backend.add(key, str(candidate).encode(), ttl=CLAIM_TTL_SECONDS):
+                return candidate
+            existing = self.backend.get(key) or str(candidate).encode()
+        return int(existing)
+
+    async def notify(self, topic: str) -> int:
+        """``bump`` without blocking the event loop."""
+        return await asyncio.to_thread(self.bump, topic)
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        """Run ``handler(generation)`` when another worker bumps ``topic``."""
+        self._handlers[topic] = handler
+
+    def watch(self, topic: str, fingerprint: Callable[[], Any]) -> None:
+        """
+        Claim a new generation of ``topic`` whenever ``fingerprint()`` changes,
+        which then runs the topic's handler on every worker (this one included).
+        """
+        self._watches[topic] = (fingerprint, fingerprint())
+
+    async def poll(self) -> list[str]:
+        """Run handlers for topics whose generation moved; returns those topics."""
+        for topic, (fingerprint, last) in list(self._watches.items()):
+            current = fingerprint()
+            if current != last:
+                self._watches[topic] = (fingerprint, current)
+                await asyncio.to_thread(self._claim, topic, current)
+
+        topics = list(self._handlers)
+        if not topics:
+            return []
+        values = await asyncio.to_thread(self.backend.get_many, [f"gen:{topic}" for topic in topics])
+        changed = []
+        for topic, raw in zip(topics, values):
+            generation = int(raw or 0)
+            if generation <= self._seen.get(topic, 0):
+                continue
+            self._seen[topic] = generation
+            changed.append(topic)
+            try:
+                result = self._handlers[topic](generation)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Shared-state handler for %r failed", topic)
+        return changed
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except StateBackendError:
+                logger.warning("Shared-state sync failed; retrying", exc_info=True)
+
+    def start(self) -> None:
+        """Start polling the backend every ``interval`` seconds."""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+_sync: Optional[StateSync] = None
+
+
+def get_state_sync(settings: Optional[Settings] = None) -> StateSync:
+    """Process-wide sync over the configured backend."""
+    global _sync
+    if _sync is None:
+        settings = settings or get_settings()
+        _sync = StateSync(create_state_backend(settings), interval=settings.STATE_SYNC_SECONDS)
+    return _sync
+
+
+def get_state_backend(settings: Optional[Settings] = None) -> StateBackend:
+    """The shared key/value store."""
+    return get_state_sync(settings).backend
+
+
+async def close_state_sync() -> None:
+    """Stop polling and drop backend connections (reopened lazily if used again)."""
+    if _sync is not None:
+        await _sync.stop()
+        _sync.backend.close()
+
+
+# ── Configuration reloads ────────────────────────────────────────────────────
+
+
+def reload_config() -> Settings:
+    """
+    Re-read environment / .env in this worker and have every other worker do
+    the same on its next sync. Subsystems started at boot keep their startup
+    configuration; everything resolved through get_settings() follows.
+    """
+    get_settings.cache_clear()
+    get_state_sync().bump("config")
+    return get_settings()
+
+
+def env_file_fingerprint() -> Any:
+    """mtime/size of the configured .env file (None if there is none)."""
+    env_file = Settings.model_config.get("env_file")
+    if not env_file:
+        return None
+    try:
+        stat_result = os.stat(env_file)
+    except (FileNotFoundError, TypeError):
+        return None
+    return (stat_result.st_mtime_ns, stat_result.st_size)
@@ -0,0 +1,206 @@
+"""
+Startup profiling and pre-warming.
+
+New replicas only take traffic once /health answers, so the lifespan does
+just the work that has to finish before serving. The remaining warm-up runs
+in the background, in worker threads, while /health already answers:
+
+* building the two pooled HTTP clients (identity provider, inference
+  upstream), which imports httpx's transport stack and loads the CA bundle;
+* importing PyJWT and its cryptography backend.
+
+The first SSO callback or authenticated request therefore does not pay for
+these either, unless it arrives first; it then waits for the same build.
+
+Each lifespan step is timed and exported on /metrics as
+``startup_phase_seconds``. With ``STARTUP_PROFILE=true`` the timings are
+also logged. Import times per module can only be measured in a fresh
+interpreter, so run the profiler as a script:
+
+    cd backend
+    python -m app.startup              # slowest imports + lifespan phases
+    python -m app.startup --top 40
+"""
+
+import argparse
+import asyncio
+from contextlib import contextmanager
+from dataclasses import dataclass
+import importlib
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Awaitable, Iterator, Optional
+
+from app.config import Settings
+from app.http_client import start_http_client
+from app.metrics import STARTUP_PHASE_SECONDS
+from app.services.inference_proxy import start_upstream_client
+
+logger = logging.getLogger(__name__)
+
+# Deferred by the modules that use them; imported by prewarm().
+PREWARM_IMPORTS = ("jwt", "jwt.algorithms")
+
+
+class StartupProfile:
+    """Wall-clock duration of each named startup phase."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+        STARTUP_PHASE_SECONDS.set(name, value=seconds)
+
+    def report(self) -> str:
+        width = max((len(name) for name in self.phases), default=0)
+        ranked = sorted(self.phases.items(), key=lambda item: item[1], reverse=True)
+        return "\n".join(f"  {name:<{width}}  {seconds * 1000:9.1f} ms" for name, seconds in ranked)
+
+
+def _import_modules(names: tuple[str, ...]) -> None:
+    for name in names:
+        importlib.import_module(name)
+
+
+async def prewarm(settings: Settings, profile: StartupProfile) -> None:
+    """Build the outbound clients and import deferred libraries in worker threads."""
+
+    async def step(name: str, work: Awaitable[object]) -> None:
+        try:
+            with profile.phase(name):
+                await work
+        except Exception:
+            logger.exception("Startup pre-warm step %s failed; it will be retried on first use", name)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        step("prewarm_http_client", start_http_client(settings)),
+        step("prewarm_upstream_client", start_upstream_client(settings)),
+        step("prewarm_imports", asyncio.to_thread(_import_modules, PREWARM_IMPORTS)),
+    )
+    profile.record("prewarm", time.perf_counter() - started)
+    if settings.STARTUP_PROFILE:
+        logger.info("Startup pre-warm finished:\n%s", profile.report())
+
+
+_profile: Optional[StartupProfile] = None
+_prewarm: Optional[asyncio.Task] = None
+
+
+def new_startup_profile() -> StartupProfile:
+    """Start timing a new lifespan (one per worker process, or per test app)."""
+    global _profile
+    _profile = StartupProfile()
+    return _profile
+
+
+def get_startup_profile() -> StartupProfile:
+    return _profile or new_startup_profile()
+
+
+def start_prewarm(settings: Settings, profile: StartupProfile) -> asyncio.Task:
+    """Run prewarm() in the background; the lifespan awaits it on shutdown."""
+    global _prewarm
+    _prewarm = asyncio.create_task(prewarm(settings, profile))
+    return _prewarm
+
+
+async def wait_for_prewarm() -> None:
+    """Wait for the running lifespan's pre-warm, if any, to finish."""
+    if _prewarm is not None:
+        await asyncio.shield(_prewarm)
+
+
+# ─── Import-time profiling (python -m app.startup) ──────────────────────────
+
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_import_times(output: str) -> list[ImportTime]:
+    """Parse ``python -X importtime`` stderr."""
+    times = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header row
+        times.append(ImportTime(fields[2].strip(), int(fields[0]), int(fields[1])))
+    return times
+
+
+def measure_imports(module: str = "app.main") -> list[ImportTime]:
+    """Import ``module`` in a fresh interpreter and return every import's timing."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_import_times(completed.stderr)
+
+
+def summarize_imports(times: list[ImportTime], top: int) -> str:
+    """Slowest app modules (cumulative) and slowest packages (summed self time)."""
+    packages: dict[str, int] = {}
+    for entry in times:
+        package = entry.module.split(".")[0]
+        packages[package] = packages.get(package, 0) + entry.self_us
+    app_modules = sorted(
+        (entry for entry in times if entry.module.split(".")[0] == "app"),
+        key=lambda entry: entry.cumulative_us,
+        reverse=True,
+    )
+    lines = [f"Total import time: {sum(packages.values()) / 1000:.1f} ms", "", "Packages (self time):"]
+    for package, micros in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f"  {package:<40}{micros / 1000:9.1f} ms")
+    lines += ["", "App modules (cumulative, includes what they import first):"]
+    for entry in app_modules[:top]:
+        lines.append(f"  {entry.module:<40}{entry.cumulative_us / 1000:9.1f} ms")
+    return "\n".join(lines)
+
+
+async def _profile_lifespan() -> StartupProfile:
+    # Run as a script this file is __main__; the lifespan uses app.startup.
+    from app import startup
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        await startup.wait_for_prewarm()
+    return startup.get_startup_profile()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=20, help="rows per table")
+    parser.add_argument("--module", default="app.main", help="module whose import is profiled")
+    args = parser.parse_args(argv)
+
+    print(summarize_imports(measure_imports(args.module), args.top))
+    profile = asyncio.run(_profile_lifespan())
+    print("\nLifespan phases (prewarm_* run in the background):")
+    print(profile.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Offline load test and micro-benchmarks for the proxy backend.
+
+Drives the ASGI app from app.main.create_app in-process (no sockets) with
+MOCK_MODE on, and reports p50 / p99 latency and requests/sec per scenario
+at a configurable concurrency. Results can be saved as JSON and compared
+against a previous run to flag regressions.
+
+    cd backend
+    python -m benchmarks.bench_proxy --requests 2000 --concurrency 50 --output bench.json
+    python -m benchmarks.bench_proxy --compare bench.json --threshold 0.15
+"""
+
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+# Benchmarks always run against mocked identity providers.
+os.environ.setdefault("MOCK_MODE", "true")
+# Keep the limiter on the request path, but with a limit the load never hits.
+os.environ.setdefault("RATE_LIMIT_RULES", "*=1000000/1")
+
+
+@dataclass
+class Result:
+    name: str
+    requests: int
+    concurrency: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p99_ms: float
+    mean_ms: float
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summarize(name: str, latencies: list[float], elapsed: float, concurrency: int, errors: int) -> Result:
+    return Result(
+        name=name,
+        requests=len(latencies),
+        concurrency=concurrency,
+        errors=errors,
+        rps=len(latencies) / elapsed if elapsed else 0.0,
+        p50_ms=_percentile(latencies, 50) * 1000,
+        p99_ms=_percentile(latencies, 99) * 1000,
+        mean_ms=statistics.fmean(latencies) * 1000,
+    )
+
+
+# ── Load scenarios ───────────────────────────────────────────────────────────
+
+
+Scenario = Callable[[httpx.AsyncClient], Awaitable[bool]]
+
+
+def build_scenarios(token: str) -> dict[str, Scenario]:
+    """Each scenario performs one logical operation and reports success."""
+    auth = {"Authorization": f"Bearer {token}"}
+
+    async def health(client: httpx.AsyncClient) -> bool:
+        return (await client.get("/health")).status_code == 200
+
+    async def models(client: httpx.AsyncClient) -> bool:
+        return (await client.get("/v1/models", headers=auth)).status_code == 200
+
+    async def settings(client: httpx.AsyncClient) -> bool:
+        return (await client.get("/api/claude-settings", headers=auth)).status_code == 200
+
+    async def cli_download(client: httpx.AsyncClient) -> bool:
+        async with client.stream("GET", "/cli/linux", headers=auth) as response:
+            async for _ in response.aiter_raw():
+                pass
+            return response.status_code == 200
+
+    async def sso_flow(client: httpx.AsyncClient) -> bool:
+        redirect = "http://127.0.0.1:8080/callback"
+        login = await client.get("/sso/login", params={"redirect": redirect})
+        callback = await client.get("/sso/callback", params={"code": "bench-code", "state": redirect})
+        return login.status_code == 307 and callback.status_code == 307
+
+    refresh_tokens: list[str] = []
+
+    async def sso_refresh(client: httpx.AsyncClient) -> bool:
+        if not refresh_tokens:
+            login = await client.get("/sso/login", params={"redirect": "http://127.0.0.1:8080/callback"})
+            refresh_tokens.append(dict(parse_qsl(urlsplit(login.headers["location"]).query))["refresh_token"])
+        response = await client.post("/sso/refresh", json={"refresh_token": refresh_tokens.pop()})
+        if response.status_code != 200:
+            return False
+        refresh_tokens.append(response.json()["refresh_token"])
+        return True
+
+    return {
+        "health": health,
+        "models": models,
+        "settings": settings,
+        "cli_download": cli_download,
+        "sso_flow": sso_flow,
+        "sso_refresh": sso_refresh,
+    }
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    name: str,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+) -> Result:
+    """Run ``requests`` iterations of ``scenario`` with ``concurrency`` workers."""
+    latencies: list[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                ok = await scenario(client)
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summarize(name, latencies, time.perf_counter() - started, concurrency, errors)
+
+
+# ── Micro-benchmarks ─────────────────────────────────────────────────────────
+
+
+def run_micro(name: str, fn: Callable[[], object], iterations: int) -> Result:
+    """Time ``fn`` synchronously ``iterations`` times."""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return _summarize(name, latencies, time.perf_counter() - started, 1, 0)
+
+
+def micro_benchmarks(iterations: int) -> list[Result]:
+    from app.auth.entra import _decode_token, _mock_token, sign_session_token, validate_token
+    from app.config import get_settings
+
+    settings = get_settings()
+    token = _mock_token(settings)["access_token"]
+    validate_token(token, settings)  # warm the verified-token cache
+
+    return [
+        run_micro("mock_token", lambda: _mock_token(settings), iterations),
+        run_micro("sign_session_token", lambda: sign_session_token({"sub": "bench"}, settings), iterations),
+        run_micro("validate_token_cached", lambda: validate_token(token, settings), iterations),
+        run_micro("validate_token_uncached", lambda: _decode_token(token, settings), iterations),
+    ]
+
+
+# ── Driver ───────────────────────────────────────────────────────────────────
+
+
+async def run_suite(
+    requests: int,
+    concurrency: int,
+    scenarios: Optional[list[str]] = None,
+    micro_iterations: int = 0,
+) -> list[Result]:
+    from app.auth.entra import _mock_token
+    from app.config import get_settings
+    from app.main import create_app
+    from app.services.artifact_store import get_artifact_index
+
+    app = create_app()
+    token = _mock_token(get_settings())["access_token"]
+    available = build_scenarios(token)
+    selected = scenarios or list(available)
+
+    results: list[Result] = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        # Let background hashing / precompression finish before measuring.
+        for future in get_artifact_index(get_settings()).refresh_all():
+            await asyncio.wrap_future(future)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in selected:
+                await available[name](client)  # warm-up
+                results.append(await run_load(client, name, available[name], requests, concurrency))
+
+    if micro_iterations:
+        results.extend(micro_benchmarks(micro_iterations))
+    return results
+
+
+def compare(results: list[Result], baseline_path: str, threshold: float) -> list[str]:
+    """Return a message per scenario whose p99 or throughput regressed by more than ``threshold``."""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {r["name"]: r for r in json.load(file)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get(result.name)
+        if before is None:
+            continue
+        if before["p99_ms"] and result.p99_ms > before["p99_ms"] * (1 + threshold):
+            regressions.append(f"{result.name}: p99 {before['p99_ms']:.3f}ms → {result.p99_ms:.3f}ms")
+        if before["rps"] and result.rps < before["rps"] * (1 - threshold):
+            regressions.append(f"{result.name}: rps {before['rps']:.0f} → {result.rps:.0f}")
+    return regressions
+
+
+def _print_table(results: list[Result]) -> None:
+    print(f"{'scenario':<26}{'reqs':>8}{'conc':>6}{'err':>6}{'rps':>11}{'p50 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(f"{r.name:<26}{r.requests:>8}{r.concurrency:>6}{r.errors:>6}{r.rps:>11.0f}{r.p50_ms:>10.3f}{r.p99_ms:>10.3f}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenario", action="append", help="limit to these scenarios (repeatable)")
+    parser.add_argument("--micro-iterations", type=int, default=5000, help="0 disables micro-benchmarks")
+    parser.add_argument("--binary-size-mb", type=float, default=1.0, help="size of the served CLI binary")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as binaries_dir:
+        with open(os.path.join(binaries_dir, "claude-linux"), "wb") as file:
+            file.write(os.urandom(int(args.binary_size_mb * 1024 * 1024)))
+        os.environ.setdefault("CLI_BINARIES_DIR", binaries_dir)
+
+        results = asyncio.run(run_suite(args.requests, args.concurrency, args.scenario, args.micro_iterations))
+
+    _print_table(results)
+
+    if args.output:
+        document = {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "results": [asdict(r) for r in results],
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(document, file, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
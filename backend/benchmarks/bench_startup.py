@@ -0,0 +1,145 @@
+"""
+Cold-start benchmark: time from process start to first response.
+
+Starts ``uvicorn app.main:app`` in a fresh interpreter per run (MOCK_MODE
+on) and measures from spawn until:
+
+* ``health``  — the first ``GET /health`` returns 200 (what autoscaling
+  waits for before sending traffic), and
+* ``first_authenticated`` — the first ``GET /v1/models`` with a bearer
+  token succeeds right after that (token libraries loaded, catalog ready).
+
+Results use the same JSON format as bench_proxy and can be compared against
+a baseline; only p50 / p99 are meaningful here (rps is reported as 0).
+
+    cd backend
+    python -m benchmarks.bench_startup --runs 10 --output startup.json
+    python -m benchmarks.bench_startup --runs 10 --compare startup.json --threshold 0.2
+"""
+
+import argparse
+from dataclasses import asdict
+import http.client
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from benchmarks.bench_proxy import Result, _print_table, _summarize, compare
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get(port: int, path: str, headers: Optional[dict] = None) -> Optional[int]:
+    """Status of ``GET path``, or None while the server is not accepting connections."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        connection.request("GET", path, headers=headers or {})
+        return connection.getresponse().status
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+def _wait_for(port: int, path: str, process: subprocess.Popen, timeout: float, headers=None) -> None:
+    deadline = time.monotonic() + timeout
+    while _get(port, path, headers) != 200:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{path} did not answer 200 within {timeout}s")
+        time.sleep(0.002)
+
+
+def measure_once(token: str, env: dict, timeout: float) -> tuple[float, float]:
+    """Spawn one server; return seconds to first /health and to first authenticated response."""
+    port = _free_port()
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    try:
+        _wait_for(port, "/health", process, timeout)
+        health = time.perf_counter() - started
+        _wait_for(port, "/v1/models", process, timeout, {"Authorization": f"Bearer {token}"})
+        return health, time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=timeout)
+
+
+def run_suite(runs: int, timeout: float) -> list[Result]:
+    from app.auth.entra import _mock_token
+    from app.config import get_settings
+
+    token = _mock_token(get_settings())["access_token"]
+    health: list[float] = []
+    authenticated: list[float] = []
+    errors = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {
+            **os.environ,
+            "MOCK_MODE": "true",
+            "CLI_BINARIES_DIR": workdir,
+            "USAGE_DB_PATH": os.path.join(workdir, "usage.sqlite3"),
+        }
+        for _ in range(runs):
+            try:
+                first_health, first_authenticated = measure_once(token, env, timeout)
+            except (RuntimeError, TimeoutError) as exc:
+                print(f"run failed: {exc}", file=sys.stderr)
+                errors += 1
+                continue
+            health.append(first_health)
+            authenticated.append(first_authenticated)
+    if not health:
+        raise SystemExit("every run failed")
+    return [
+        _summarize("health", health, 0.0, 1, errors),
+        _summarize("first_authenticated", authenticated, 0.0, 1, errors),
+    ]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="server processes to start")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for each response")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.runs, args.timeout)
+    _print_table(results)
+
+    if args.output:
+        document = {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "results": [asdict(r) for r in results],
+        }
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(document, file, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
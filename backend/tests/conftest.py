@@ -1,21 +1,39 @@
 """
 Shared pytest fixtures and test configuration.
 
-Provides a pre-configured TestClient and a valid mock JWT token
-that can be used across all test modules.
+Provides a pre-configured TestClient, a valid mock JWT token and a local
+fake inference upstream that can be used across all test modules.
 """
 
+import asyncio
+import gzip
+import json
+import os
+import socket
+import tempfile
+import threading
+
 import pytest
 from fastapi.testclient import TestClient
+import uvicorn
+
+# Keep the usage accounting database and the access log out of the working tree.
+os.environ.setdefault("USAGE_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="usage-"), "usage.sqlite3"))
+os.environ.setdefault("ACCESS_LOG_PATH", os.path.join(tempfile.mkdtemp(prefix="access-log-"), "access.log"))
 
 from app.main import app
 from app.auth.entra import _mock_token
 from app.config import get_settings
+from app.services import upstream_pool
 
 
-@pytest.fixture(scope="session")
+@pytest.fixture
 def settings():
-    """Return the application settings (mock mode enabled by default)."""
+    """Return the application settings (mock mode enabled by default).
+
+    Looked up per test: a config reload replaces the cached instance, and
+    attributes patched on a stale one would never reach the routes.
+    """
     return get_settings()
 
 
@@ -27,9 +45,9 @@ def client():
 
 
 @pytest.fixture(scope="session")
-def auth_token(settings) -> str:
+def auth_token() -> str:
     """A valid mock JWT bearer token for authenticated requests."""
-    token_data = _mock_token(settings)
+    token_data = _mock_token(get_settings())
     return token_data["access_token"]
 
 
@@ -37,3 +55,155 @@ def auth_token(settings) -> str:
 def auth_headers(auth_token) -> dict:
     """Authorization headers dict ready to pass to client requests."""
     return {"Authorization": f"Bearer {auth_token}"}
+
+
+class FakeUpstream:
+    """
+    Local stand-in for the inference upstream, served by uvicorn on a
+    background thread. Speaks just enough of the Anthropic Messages and
+    OpenAI Chat Completions wire formats, streaming or not.
+    """
+
+    def __init__(self):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        self.url = "http://127.0.0.1:%d" % sock.getsockname()[1]
+        config = uvicorn.Config(
+            self.app, interface="asgi3", http="h11", ws="none", lifespan="off", log_level="warning"
+        )
+        self.server = uvicorn.Server(config)
+        threading.Thread(target=self.server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+        while not self.server.started:
+            threading.Event().wait(0.01)
+        self.reset()
+
+    def reset(self):
+        self.requests: list[dict] = []
+        self.health_checks = 0
+        self.status = 200
+        self.delay = 0.0  # seconds before the response headers
+        self.endless = False  # stream until the client goes away
+        self.disconnected = threading.Event()
+
+    def close(self):
+        self.server.should_exit = True
+
+    @staticmethod
+    def _sse(event, data: dict) -> bytes:
+        prefix = f"event: {event}\n" if event else ""
+        return f"{prefix}data: {json.dumps(data)}\n\n".encode()
+
+    def _events(self, api: str, model: str):
+        words = ["Hello", " from", " the", " fake", " upstream"]
+        if api == "messages":
+            message = {"id": "msg_fake", "model": model, "usage": {"input_tokens": 12, "output_tokens": 1}}
+            yield self._sse("message_start", {"type": "message_start", "message": message})
+            for word in words:
+                delta = {"type": "text_delta", "text": word}
+                yield self._sse("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": delta})
+            delta = {"stop_reason": "end_turn"}
+            usage = {"output_tokens": len(words)}
+            yield self._sse("message_delta", {"type": "message_delta", "delta": delta, "usage": usage})
+            yield self._sse("message_stop", {"type": "message_stop"})
+        else:
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "model": model}
+            for word in words:
+                yield self._sse(None, {**chunk, "choices": [{"index": 0, "delta": {"content": word}}]})
+            usage = {"prompt_tokens": 12, "completion_tokens": len(words), "total_tokens": 12 + len(words)}
+            yield self._sse(None, {**chunk, "choices": [], "usage": usage})
+            yield b"data: [DONE]\n\n"
+
+    def _message(self, api: str, model: str) -> dict:
+        if api == "messages":
+            content = [{"type": "text", "text": "Hello"}]
+            usage = {"input_tokens": 12, "output_tokens": 1}
+            return {"id": "msg_fake", "type": "message", "model": model, "content": content, "usage": usage}
+        choices = [{"index": 0, "message": {"role": "assistant", "content": "Hello"}}]
+        usage = {"prompt_tokens": 12, "completion_tokens": 1, "total_tokens": 13}
+        return {"id": "chatcmpl-fake", "object": "chat.completion", "model": model, "choices": choices, "usage": usage}
+
+    async def app(self, scope, receive, send):
+        if scope["method"] == "GET":  # health check
+            self.health_checks += 1
+            status = 500 if self.status >= 500 else 200
+            await send({"type": "http.response.start", "status": status, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        payload = json.loads(body)
+        headers_in = {name.decode(): value.decode() for name, value in scope["headers"]}
+        self.requests.append({"path": scope["path"], "headers": headers_in, "body": payload})
+        api = "messages" if scope["path"].endswith("/messages") else "chat_completions"
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+        if self.status != 200 or not payload.get("stream"):
+            if self.status != 200:
+                content = {"error": {"type": "rate_limit_error"}}
+            else:
+                content = self._message(api, payload["model"])
+            data = json.dumps(content).encode()
+            headers = [(b"content-type", b"application/json")]
+            if "gzip" in headers_in.get("accept-encoding", ""):  # like a real server, honour the caller
+                data = gzip.compress(data)
+                headers.append((b"content-encoding", b"gzip"))
+            await send({"type": "http.response.start", "status": self.status, "headers": headers})
+            await send({"type": "http.response.body", "body": data})
+            return
+
+        headers = [(b"content-type", b"text/event-stream")]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        if self.endless:
+            while True:
+                await send({"type": "http.response.body", "body": b": tick\n\n", "more_body": True})
+                try:
+                    message = await asyncio.wait_for(receive(), 0.01)
+                except asyncio.TimeoutError:
+                    continue
+                if message["type"] == "http.disconnect":
+                    self.disconnected.set()
+                    return
+        for event in self._events(api, payload["model"]):
+            await send({"type": "http.response.body", "body": event, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+
+@pytest.fixture(scope="session")
+def _fake_upstream_server():
+    server = FakeUpstream()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def fake_upstream(_fake_upstream_server, settings, monkeypatch) -> FakeUpstream:
+    """The fake upstream, with the proxy pointed at it for the test's duration."""
+    _fake_upstream_server.reset()
+    monkeypatch.setattr(upstream_pool, "_pool", None)  # fresh latency / breaker state
+    monkeypatch.setattr(settings, "UPSTREAM_BASE_URL", _fake_upstream_server.url)
+    monkeypatch.setattr(settings, "UPSTREAM_API_KEY", "upstream-secret")
+    return _fake_upstream_server
+
+
+@pytest.fixture(scope="session")
+def _fake_upstream_servers():
+    servers = [FakeUpstream(), FakeUpstream()]
+    yield servers
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def fake_upstreams(_fake_upstream_servers, settings, monkeypatch) -> list[FakeUpstream]:
+    """Two fake upstreams forming the default pool, e.g. two regions."""
+    for server in _fake_upstream_servers:
+        server.reset()
+    monkeypatch.setattr(upstream_pool, "_pool", None)
+    monkeypatch.setattr(settings, "UPSTREAM_BASE_URL", ",".join(server.url for server in _fake_upstream_servers))
+    monkeypatch.setattr(settings, "UPSTREAM_API_KEY", "upstream-secret")
+    return _fake_upstream_servers
@@ -0,0 +1,156 @@
+"""Tests for the access / audit log: records, sampling, the bounded queue and the writer."""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from app.services import access_log as access_log_service
+from app.services.access_log import (
+    AccessLog,
+    AccessRecord,
+    AuditRecord,
+    JSONLinesSink,
+    encode_record,
+    parse_sample_rules,
+)
+
+
+def _request(log: AccessLog, path="/v1/models", status=200) -> None:
+    log.request("GET", path, path, status, 0.0123, 0, 512, "user-1", "10.0.0.1")
+
+
+def _lines(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestRecords:
+    """Records encode to one flat JSON object per line."""
+
+    def test_access_record(self):
+        record = AccessRecord(1.5, "GET", "/cli/{platform}", "/cli/linux", 200, 1.0, 0, 10, "u", "127.0.0.1")
+        document = json.loads(encode_record(record))
+        assert document["type"] == "access"
+        assert (document["route"], document["user"], document["sample_rate"]) == ("/cli/{platform}", "u", 1.0)
+
+    def test_audit_record(self):
+        document = json.loads(encode_record(AuditRecord(1.5, "revoke", "ok", "admin", {"kind": "sub"})))
+        assert (document["type"], document["action"], document["detail"]) == ("audit", "revoke", {"kind": "sub"})
+
+    @pytest.mark.parametrize("spec", ["/v1/models", "/v1/models=2", "=0.5", "/health=often"])
+    def test_invalid_sample_rules(self, spec):
+        with pytest.raises(ValueError):
+            parse_sample_rules(spec)
+
+
+class TestPipeline:
+    """The request path only appends; batches are written in the background."""
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_json_lines(self, tmp_path):
+        log = AccessLog(JSONLinesSink(str(tmp_path / "access.log")), capacity=100, batch_size=2, flush_interval=60)
+        for _ in range(5):
+            _request(log)
+        assert await log.flush() == 5
+        lines = _lines(tmp_path / "access.log")
+        assert len(lines) == 5 and lines[0]["latency_ms"] == 12.3 and lines[0]["bytes_out"] == 512
+
+    def test_full_queue_drops_new_records(self, tmp_path):
+        log = AccessLog(JSONLinesSink(str(tmp_path / "access.log")), capacity=3, batch_size=10, flush_interval=60)
+        for _ in range(5):
+            _request(log)
+        assert log.stats() == {"queued": 3, "recorded": 3, "sampled_out": 0, "written": 0, "dropped": 2}
+
+    def test_sampling_keeps_errors(self, tmp_path):
+        sink = JSONLinesSink(str(tmp_path / "access.log"))
+        rules = parse_sample_rules("/health=0;/v1/*=0")
+        log = AccessLog(sink, capacity=100, batch_size=10, flush_interval=60, sample_rules=rules)
+        _request(log, "/health")
+        _request(log, "/v1/models")
+        _request(log, "/v1/models", status=503)
+        _request(log, "/cli/linux")
+        assert [record.path for record in log._queue] == ["/v1/models", "/cli/linux"]
+        assert log.stats()["sampled_out"] == 2
+
+    @pytest.mark.asyncio
+    async def test_slow_sink_does_not_block_requests(self, tmp_path):
+        log = AccessLog(JSONLinesSink(str(tmp_path / "access.log")), capacity=4, batch_size=2, flush_interval=60)
+        released = threading.Event()
+        write = log.sink.write
+        log.sink.write = lambda records: (released.wait(5), write(records))
+        log.start()
+        try:
+            for _ in range(2):
+                _request(log)
+            await asyncio.sleep(0.05)  # the writer is now stuck on the first batch
+            for _ in range(10):
+                _request(log)  # returns at once; the overflow is counted
+            assert log.stats()["dropped"] == 6
+        finally:
+            released.set()
+            await log.stop()
+        assert len(_lines(tmp_path / "access.log")) == 6
+
+    @pytest.mark.asyncio
+    async def test_writer_survives_unexpected_errors(self, tmp_path):
+        log = AccessLog(JSONLinesSink(str(tmp_path / "access.log")), capacity=10, batch_size=1, flush_interval=60)
+        write, calls = log.sink.write, []
+
+        def flaky(records):
+            calls.append(records)
+            if len(calls) == 1:
+                raise TypeError("Object of type bytes is not JSON serializable")
+            write(records)
+
+        log.sink.write = flaky
+        log.start()
+        try:
+            _request(log)
+            await asyncio.sleep(0.05)  # the first batch hit the error
+            _request(log)
+            await asyncio.sleep(0.05)
+            assert log.stats()["written"] == 1
+        finally:
+            await log.stop()
+
+
+class TestMiddleware:
+    """Every request through the app is logged with its caller, route and sizes."""
+
+    @pytest.fixture
+    def access_log(self, settings, tmp_path, monkeypatch) -> AccessLog:
+        """A fresh log with the configured sample rules, recorded into by the app for this test."""
+        sink = JSONLinesSink(str(tmp_path / "access.log"))
+        rules = parse_sample_rules(settings.ACCESS_LOG_SAMPLE_RULES)
+        log = AccessLog(sink, capacity=100, batch_size=10, flush_interval=60, sample_rules=rules)
+        monkeypatch.setattr(access_log_service, "_log", log)
+        yield log
+        log.sink.close()
+
+    def test_authenticated_request(self, client, auth_headers, access_log, tmp_path):
+        client.get("/api/claude-settings", headers=auth_headers)
+        client.portal.call(access_log.flush)
+        (record,) = _lines(tmp_path / "access.log")
+        assert record["type"] == "access"
+        assert (record["method"], record["route"], record["status"]) == ("GET", "/api/claude-settings", 200)
+        assert record["user"] == "mock-user-id"
+        assert record["bytes_out"] > 0 and record["latency_ms"] > 0
+
+    def test_rejected_token_is_audited(self, client, access_log, tmp_path):
+        client.get("/v1/models", headers={"Authorization": "Bearer not-a-token"})
+        client.portal.call(access_log.flush)
+        records = _lines(tmp_path / "access.log")
+        audit = next(record for record in records if record["type"] == "audit")
+        assert (audit["action"], audit["outcome"], audit["user"]) == ("authenticate", "invalid_token", None)
+        access = next(record for record in records if record["type"] == "access")
+        assert access["status"] == 401 and access["user"] is None  # errors are never sampled out
+
+    def test_heartbeats_are_not_logged(self, client, access_log):
+        client.get("/health")
+        assert access_log.stats()["recorded"] == 0 and access_log.stats()["sampled_out"] == 1
+
+    def test_metrics(self, client):
+        body = client.get("/metrics").text
+        assert "access_log_records_dropped_total" in body
+        assert "access_log_requests_sampled_out_total" in body
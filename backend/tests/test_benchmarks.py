@@ -0,0 +1,42 @@
+"""Smoke test for the offline benchmark suite (runs in a subprocess)."""
+
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_benchmark_suite_runs_and_writes_json(tmp_path):
+    output = tmp_path / "bench.json"
+    args = ["--requests", "5", "--concurrency", "2", "--micro-iterations", "10", "--binary-size-mb", "0.1"]
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_proxy", *args, "--output", str(output)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert completed.returncode == 0, completed.stderr
+
+    results = {r["name"]: r for r in json.loads(output.read_text())["results"]}
+    for name in ("health", "models", "settings", "cli_download", "sso_flow", "validate_token_cached", "mock_token"):
+        assert results[name]["errors"] == 0
+        assert results[name]["p99_ms"] >= results[name]["p50_ms"] > 0
+
+
+def test_startup_benchmark_runs(tmp_path):
+    output = tmp_path / "startup.json"
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--runs", "1", "--output", str(output)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert completed.returncode == 0, completed.stderr
+
+    results = {r["name"]: r for r in json.loads(output.read_text())["results"]}
+    assert results["health"]["errors"] == 0
+    assert results["first_authenticated"]["p50_ms"] >= results["health"]["p50_ms"] > 0
@@ -1,7 +1,19 @@
 """Tests for GET /cli/{platform}."""
 
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import random
+
+from fastapi import HTTPException
 import pytest
 
+from app.config import Settings, get_settings
+from app.main import app
+from app.responses import BinaryFileResponse, FileSliceResponse
+from app.services.artifact_store import ARTIFACTS_SUBDIR, DELTAS_SUBDIR, HISTORY_FILE, get_artifact_index, zstandard
+from app.services.cli_service import get_cli_binary
+
 
 class TestCLIDownload:
     """CLI binary download endpoint tests."""
@@ -31,3 +43,338 @@ class TestCLIDownload:
         assert response.status_code == 200
         disposition = response.headers["content-disposition"]
         assert ".exe" in disposition
+
+
+_BINARY = bytes(range(256)) * 1024  # 256 KiB of non-trivial content
+
+
+@pytest.fixture
+def binaries_dir(tmp_path, settings):
+    """Serve real binaries from a temporary CLI_BINARIES_DIR."""
+    (tmp_path / "claude-linux").write_bytes(_BINARY)
+    (tmp_path / "claude-win.exe").write_bytes(_BINARY[:1000])
+    overridden = settings.model_copy(update={"CLI_BINARIES_DIR": str(tmp_path)})
+    app.dependency_overrides[get_settings] = lambda: overridden
+    yield tmp_path
+    app.dependency_overrides.pop(get_settings, None)
+
+
+class TestCLIBinariesFromDisk:
+    """Streaming, Range and conditional downloads from CLI_BINARIES_DIR."""
+
+    def test_serves_file_contents(self, client, auth_headers, binaries_dir):
+        response = client.get("/cli/linux", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.content == _BINARY
+        assert response.headers["content-length"] == str(len(_BINARY))
+        assert response.headers["accept-ranges"] == "bytes"
+        assert "etag" in response.headers
+        assert "last-modified" in response.headers
+
+    def test_range_request_returns_partial_content(self, client, auth_headers, binaries_dir):
+        headers = {**auth_headers, "Range": "bytes=1000-1999"}
+        response = client.get("/cli/linux", headers=headers)
+        assert response.status_code == 206
+        assert response.content == _BINARY[1000:2000]
+        assert response.headers["content-range"] == f"bytes 1000-1999/{len(_BINARY)}"
+
+    def test_resume_from_offset(self, client, auth_headers, binaries_dir):
+        headers = {**auth_headers, "Range": f"bytes={len(_BINARY) - 10}-"}
+        response = client.get("/cli/linux", headers=headers)
+        assert response.status_code == 206
+        assert response.content == _BINARY[-10:]
+
+    def test_if_none_match_returns_304(self, client, auth_headers, binaries_dir):
+        etag = client.get("/cli/linux", headers=auth_headers).headers["etag"]
+        response = client.get("/cli/linux", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_stale_if_range_returns_full_body(self, client, auth_headers, binaries_dir):
+        headers = {**auth_headers, "Range": "bytes=0-9", "If-Range": '"stale"'}
+        response = client.get("/cli/linux", headers=headers)
+        assert response.status_code == 200
+        assert response.content == _BINARY
+
+    def test_etag_changes_when_file_is_replaced(self, client, auth_headers, binaries_dir):
+        before = client.get("/cli/win", headers=auth_headers).headers["etag"]
+        (binaries_dir / "claude-win.exe").write_bytes(b"new build")
+        response = client.get("/cli/win", headers=auth_headers)
+        assert response.content == b"new build"
+        assert response.headers["etag"] != before
+
+    def test_missing_binary_is_404_outside_mock_mode(self, tmp_path):
+        with pytest.raises(HTTPException) as exc:
+            get_cli_binary("linux", Settings(MOCK_MODE=False, CLI_BINARIES_DIR=str(tmp_path)))
+        assert exc.value.status_code == 404
+
+
+class TestZeroCopy:
+    """BinaryFileResponse hands the file to the server when it can."""
+
+    @pytest.mark.asyncio
+    async def test_uses_pathsend_extension(self, tmp_path):
+        path = tmp_path / "claude-linux"
+        path.write_bytes(_BINARY)
+        response = BinaryFileResponse(str(path), etag='"x"', stat_result=os.stat(path))
+
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "headers": [],
+            "extensions": {"http.response.pathsend": {}},
+        }
+        await response(scope, None, send)
+        assert sent[-1] == {"type": "http.response.pathsend", "path": str(path)}
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("extensions", [{}, {"http.response.zerocopysend": {}}])
+    async def test_slice(self, tmp_path, extensions):
+        path = tmp_path / "claude-linux"
+        path.write_bytes(_BINARY)
+        response = FileSliceResponse(str(path), offset=1000, length=300_000, etag='"x"', stat_result=os.stat(path))
+
+        sent = []
+
+        async def send(message):
+            if message["type"] == "http.response.zerocopysend":
+                message["file"].seek(message["offset"])
+                message = {"body": message["file"].read(message["count"])}
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "headers": [(b"range", b"bytes=0-9")], "extensions": extensions}
+        await response(scope, None, send)
+        assert sent[0]["status"] == 200
+        assert (b"content-length", b"300000") in sent[0]["headers"]
+        assert b"".join(message["body"] for message in sent[1:]) == _BINARY[1000:301_000]
+
+
+def _index_all(settings) -> None:
+    for future in get_artifact_index(settings).refresh_all():
+        future.result(timeout=30)
+
+
+class TestArtifactManifest:
+    """Content-addressed index, precompressed variants and GET /cli/manifest."""
+
+    def test_manifest_lists_digests(self, client, auth_headers, binaries_dir):
+        (binaries_dir / "claude-linux.version").write_text("2.1.0\n")
+        settings = app.dependency_overrides[get_settings]()
+        _index_all(settings)
+
+        response = client.get("/cli/manifest", headers=auth_headers)
+        assert response.status_code == 200
+        linux = response.json()["artifacts"]["linux"]
+        assert linux["sha256"] == hashlib.sha256(_BINARY).hexdigest()
+        assert linux["size"] == len(_BINARY)
+        assert linux["version"] == "2.1.0"
+        assert set(linux["encodings"]) == {"gzip", "zstd"}
+        assert "mac-intel" not in response.json()["artifacts"]
+
+    def test_manifest_requires_auth(self, client):
+        assert client.get("/cli/manifest").status_code == 403
+
+    @pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+    def test_precompressed_variant_served(self, client, auth_headers, binaries_dir, encoding):
+        _index_all(app.dependency_overrides[get_settings]())
+        response = client.get("/cli/linux", headers={**auth_headers, "Accept-Encoding": encoding})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == encoding
+        assert int(response.headers["content-length"]) < len(_BINARY)
+        assert response.content == _BINARY  # decoded by the client
+
+    def test_identity_when_no_encoding_accepted(self, client, auth_headers, binaries_dir):
+        _index_all(app.dependency_overrides[get_settings]())
+        response = client.get("/cli/linux", headers={**auth_headers, "Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert response.headers["etag"] == f'"{hashlib.sha256(_BINARY).hexdigest()}"'
+
+    def test_matching_digest_skips_download(self, client, auth_headers, binaries_dir):
+        _index_all(app.dependency_overrides[get_settings]())
+        etag = f'"{hashlib.sha256(_BINARY).hexdigest()}"'
+        headers = {**auth_headers, "If-None-Match": etag, "Accept-Encoding": "zstd"}
+        assert client.get("/cli/linux", headers=headers).status_code == 304
+
+    def test_variant_etag_is_echoed(self, client, auth_headers, binaries_dir):
+        _index_all(app.dependency_overrides[get_settings]())
+        etag = f'"{hashlib.sha256(_BINARY).hexdigest()}.gzip"'
+        response = client.get("/cli/linux", headers={**auth_headers, "If-None-Match": etag, "Accept-Encoding": "gzip"})
+        assert response.status_code == 304
+        assert (response.headers["etag"], response.headers["vary"]) == (etag, "Accept-Encoding")
+
+    def test_incompressible_variants_are_not_rebuilt(self, binaries_dir, settings):
+        (binaries_dir / "claude-linux").write_bytes(random.Random(1).randbytes(64 * 1024))
+        local = settings.model_copy(update={"CLI_BINARIES_DIR": str(binaries_dir)})
+        _index_all(local)
+        entry = get_artifact_index(local).get("linux")
+        assert entry.variants == {} and entry.oversized
+        written = {path: os.stat(path).st_ino for path in entry.oversized}
+
+        get_artifact_index(local).build("linux")  # a reindex, as after a restart
+        assert {path: os.stat(path).st_ino for path in entry.oversized} == written
+
+    def test_rebuilt_binary_replaces_variants(self, binaries_dir, settings):
+        local = settings.model_copy(update={"CLI_BINARIES_DIR": str(binaries_dir)})
+        index = get_artifact_index(local)
+        _index_all(local)
+        old_digest = index.get("linux").sha256
+
+        (binaries_dir / "claude-linux").write_bytes(_BINARY[::-1] + b"v2")
+        index.get("linux")  # notices the change and schedules re-indexing
+        _index_all(local)
+
+        entry = index.get("linux")
+        assert entry.sha256 != old_digest
+        remaining = os.listdir(binaries_dir / ARTIFACTS_SUBDIR)
+        assert not any(name.startswith(old_digest) for name in remaining)
+        assert any(name.startswith(entry.sha256) for name in remaining)
+
+
+def _apply_patch(old: bytes, patch: bytes) -> bytes:
+    """What ``zstd -d --patch-from=old`` does."""
+    dictionary = zstandard.ZstdCompressionDict(old, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+    return zstandard.ZstdDecompressor(dict_data=dictionary, max_window_size=1 << 31).decompress(patch)
+
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard not installed")
+class TestBinaryPatches:
+    """Patches from earlier builds to the latest one: GET /cli/{platform}?from=."""
+
+    OLD = random.Random(0).randbytes(512 * 1024)  # incompressible, like a real binary
+    NEW = OLD[:100_000] + b"release 2.2.0" + OLD[100_000:400_000] + OLD[400_100:]
+
+    @pytest.fixture
+    def released(self, binaries_dir):
+        """claude-linux went from 2.1.0 (OLD) to 2.2.0 (NEW)."""
+        settings = app.dependency_overrides[get_settings]()
+        for content, version in ((self.OLD, "2.1.0"), (self.NEW, "2.2.0")):
+            (binaries_dir / "claude-linux").write_bytes(content)
+            (binaries_dir / "claude-linux.version").write_text(version)
+            get_artifact_index(settings).get("linux")  # notices the change
+            _index_all(settings)
+        return settings
+
+    def test_patch_is_made_once_and_is_small(self, released, binaries_dir):
+        entry = get_artifact_index(released).get("linux")
+        old_digest = hashlib.sha256(self.OLD).hexdigest()
+        patch = entry.patches[old_digest]
+        assert patch.size < len(self.NEW) // 100
+        assert os.path.basename(patch.path) == f"{old_digest}-{entry.sha256}.zstpatch"
+        assert (binaries_dir / ARTIFACTS_SUBDIR / DELTAS_SUBDIR / HISTORY_FILE).exists()
+
+    @pytest.mark.parametrize("current", ["sha256", "version"])
+    def test_patch_served_and_applies(self, client, auth_headers, released, current):
+        old_digest = hashlib.sha256(self.OLD).hexdigest()
+        response = client.get(
+            "/cli/linux",
+            params={"from": old_digest if current == "sha256" else "2.1.0"},
+            headers={**auth_headers, "Accept-Encoding": "identity"},
+        )
+        assert response.status_code == 200
+        assert response.headers["x-patch-from"] == old_digest
+        assert response.headers["x-patch-format"] == "zstd-patch-from"
+        assert response.headers["x-checksum-sha256"] == hashlib.sha256(self.NEW).hexdigest()
+        assert _apply_patch(self.OLD, response.content) == self.NEW
+
+    def test_unknown_build_gets_full_download(self, client, auth_headers, released):
+        response = client.get("/cli/linux?from=1.0.0", headers={**auth_headers, "Accept-Encoding": "identity"})
+        assert "x-patch-from" not in response.headers
+        assert response.content == self.NEW
+
+    def test_latest_build_is_not_modified(self, client, auth_headers, released):
+        assert client.get("/cli/linux?from=2.2.0", headers=auth_headers).status_code == 304
+
+    def test_manifest_lists_patches(self, client, auth_headers, released):
+        linux = client.get("/cli/manifest", headers=auth_headers).json()["artifacts"]["linux"]
+        assert list(linux["patches"]) == [hashlib.sha256(self.OLD).hexdigest()]
+
+    def _release(self, binaries_dir, settings, count: int) -> list[str]:
+        index = get_artifact_index(settings)
+        digests = []
+        for release in range(count):
+            content = self.OLD + bytes([release])
+            (binaries_dir / "claude-linux").write_bytes(content)
+            index.get("linux")
+            _index_all(settings)
+            digests.append(hashlib.sha256(content).hexdigest())
+        return digests
+
+    def test_patches_from_every_retained_build(self, binaries_dir, settings):
+        local = settings.model_copy(update={"CLI_BINARIES_DIR": str(binaries_dir), "CLI_DELTA_HISTORY": 3})
+        digests = self._release(binaries_dir, local, 5)
+        assert sorted(get_artifact_index(local).get("linux").patches) == sorted(digests[1:4])
+
+    def test_history_is_bounded(self, binaries_dir, settings):
+        local = settings.model_copy(update={"CLI_BINARIES_DIR": str(binaries_dir), "CLI_DELTA_HISTORY": 1})
+        digests = self._release(binaries_dir, local, 3)
+        assert list(get_artifact_index(local).get("linux").patches) == [digests[1]]
+        remaining = os.listdir(binaries_dir / ARTIFACTS_SUBDIR / DELTAS_SUBDIR)
+        assert not any(name.startswith(digests[0]) for name in remaining)
+
+    def test_rebuilt_binary_keeps_patch_source(self, binaries_dir, released):
+        """The old build's variants go; its patch source stays with the deltas."""
+        entry = get_artifact_index(released).get("linux")
+        old_digest = hashlib.sha256(self.OLD).hexdigest()
+        assert not any(name.startswith(old_digest) for name in os.listdir(binaries_dir / ARTIFACTS_SUBDIR))
+        deltas = os.listdir(binaries_dir / ARTIFACTS_SUBDIR / DELTAS_SUBDIR)
+        assert {f"{old_digest}.zst", f"{entry.sha256}.zst", f"{old_digest}-{entry.sha256}.zstpatch"} <= set(deltas)
+
+
+class TestChunkedDownload:
+    """GET /cli/{platform}/chunks and /chunks/{index}."""
+
+    CHUNK = 64 * 1024
+
+    @pytest.fixture
+    def chunked(self, binaries_dir):
+        settings = app.dependency_overrides[get_settings]().model_copy(update={"CLI_CHUNK_SIZE": self.CHUNK})
+        app.dependency_overrides[get_settings] = lambda: settings
+        _index_all(settings)
+        return settings
+
+    def test_manifest(self, client, auth_headers, chunked):
+        manifest = client.get("/cli/linux/chunks", headers=auth_headers).json()
+        assert manifest["sha256"] == hashlib.sha256(_BINARY).hexdigest()
+        assert manifest["chunk_size"] == self.CHUNK
+        assert len(manifest["chunks"]) == len(_BINARY) // self.CHUNK
+        third = manifest["chunks"][3]
+        assert third["offset"] == 3 * self.CHUNK and third["url"] == "/cli/linux/chunks/3"
+        assert third["sha256"] == hashlib.sha256(_BINARY[3 * self.CHUNK:4 * self.CHUNK]).hexdigest()
+
+    def test_short_last_chunk(self, client, auth_headers, chunked):
+        chunks = client.get("/cli/win/chunks", headers=auth_headers).json()["chunks"]
+        assert [(c["offset"], c["size"]) for c in chunks] == [(0, 1000)]
+
+    def test_parallel_download_reassembles_binary(self, client, auth_headers, chunked):
+        manifest = client.get("/cli/linux/chunks", headers=auth_headers).json()
+
+        def fetch(chunk):
+            response = client.get(chunk["url"], headers=auth_headers)
+            assert response.status_code == 200
+            assert response.headers["x-checksum-sha256"] == chunk["sha256"]
+            assert hashlib.sha256(response.content).hexdigest() == chunk["sha256"]
+            return response.content
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            assert b"".join(pool.map(fetch, manifest["chunks"])) == _BINARY
+
+    def test_chunk_if_none_match(self, client, auth_headers, chunked):
+        etag = client.get("/cli/linux/chunks/0", headers=auth_headers).headers["etag"]
+        response = client.get("/cli/linux/chunks/0", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+
+    def test_out_of_range_chunk(self, client, auth_headers, chunked):
+        assert client.get("/cli/linux/chunks/4", headers=auth_headers).status_code == 404
+        assert client.get("/cli/mac-intel/chunks", headers=auth_headers).status_code == 404
+
+    def test_unindexed_binary_asks_to_retry(self, client, auth_headers, chunked, binaries_dir):
+        (binaries_dir / "claude-linux").write_bytes(_BINARY + b"v2")
+        response = client.get("/cli/linux/chunks", headers=auth_headers)
+        assert response.status_code == 503 and response.headers["retry-after"] == "1"
+        _index_all(chunked)
+        assert client.get("/cli/linux/chunks", headers=auth_headers).json()["chunks"][-1]["size"] == 2
@@ -0,0 +1,97 @@
+"""Tests for the shared outbound HTTP client and its retry policy."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app import http_client, startup
+from app.auth.entra import exchange_code_for_token
+from app.config import Settings
+from app.http_client import get_http_client, request_with_retry
+
+_FAST = Settings(HTTP_MAX_RETRIES=2, HTTP_RETRY_BACKOFF_SECONDS=0.001)
+
+
+def _client_returning(*statuses: int, headers: dict | None = None):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status = statuses[min(len(calls), len(statuses) - 1)]
+        calls.append(request)
+        return httpx.Response(status, headers=headers, json={"n": len(calls)})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+
+class TestRequestWithRetry:
+    """Retry with jitter on 429 / 5xx."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("status", [429, 500, 503])
+    async def test_retries_transient_errors(self, status):
+        client, calls = _client_returning(status, 200)
+        response = await request_with_retry(client, "GET", "https://idp.test/x", _FAST)
+        assert response.status_code == 200
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self):
+        client, calls = _client_returning(503)
+        response = await request_with_retry(client, "GET", "https://idp.test/x", _FAST)
+        assert response.status_code == 503
+        assert len(calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self):
+        client, calls = _client_returning(400)
+        response = await request_with_retry(client, "GET", "https://idp.test/x", _FAST)
+        assert response.status_code == 400
+        assert len(calls) == 1
+
+    def test_retry_after_header_is_honoured(self):
+        response = httpx.Response(429, headers={"Retry-After": "0.5"})
+        assert http_client._retry_delay(response, 0, 0.2) == 0.5
+
+
+class TestSharedClient:
+    """Lifespan-managed client reuse."""
+
+    def test_lifespan_creates_shared_client(self, client):
+        # The session TestClient has entered the app lifespan, which builds
+        # the client in the background.
+        client.portal.call(startup.wait_for_prewarm)
+        assert http_client._client is not None
+        assert not http_client._client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_callers_wait_for_the_lifespan_build(self, monkeypatch):
+        monkeypatch.setattr(http_client, "_client", None)
+        monkeypatch.setattr(http_client, "_client_loop", None)
+        building = asyncio.create_task(http_client.start_http_client(_FAST))
+        await asyncio.sleep(0)  # build started in a worker thread
+        async with http_client.outbound_client(_FAST) as shared:
+            assert shared is await building
+        await shared.aclose()
+
+    def test_no_shared_client_outside_app_loop(self):
+        assert get_http_client() is None
+
+    @pytest.mark.asyncio
+    async def test_token_exchange_uses_shared_client(self, monkeypatch):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(503)
+            return httpx.Response(200, json={"access_token": "real", "token_type": "bearer"})
+
+        shared = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(http_client, "get_http_client", lambda: shared)
+
+        settings = Settings(MOCK_MODE=False, HTTP_RETRY_BACKOFF_SECONDS=0.001)
+        token = await exchange_code_for_token("code", "http://localhost/cb", settings)
+        assert token["access_token"] == "real"
+        assert len(calls) == 2
+        assert calls[0].url == settings.entra_token_url
@@ -0,0 +1,138 @@
+"""Tests for the streaming inference proxy (/v1/messages, /v1/chat/completions)."""
+
+import asyncio
+import json
+
+import pytest
+
+from app.main import app
+from app.metrics import PROXY_RESPONSES
+
+MODEL = "claude-sonnet-4-20250514"
+
+
+def _sse_data(text: str) -> list[dict]:
+    return [
+        json.loads(line[len("data: "):])
+        for line in text.splitlines()
+        if line.startswith("data: ") and line != "data: [DONE]"
+    ]
+
+
+class TestInferenceProxy:
+    """Requests are relayed to the upstream with the proxy's credential."""
+
+    def test_streams_messages(self, client, auth_headers, fake_upstream):
+        response = client.post(
+            "/v1/messages",
+            json={"model": MODEL, "stream": True, "max_tokens": 16, "messages": []},
+            headers={**auth_headers, "anthropic-version": "2023-06-01"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.headers["cache-control"] == "no-cache"
+        events = _sse_data(response.text)
+        assert events[0]["type"] == "message_start"
+        assert events[-1]["type"] == "message_stop"
+
+        forwarded = fake_upstream.requests[-1]
+        assert forwarded["path"] == "/v1/messages"
+        assert forwarded["body"]["model"] == MODEL
+        assert forwarded["headers"]["x-api-key"] == "upstream-secret"
+        assert forwarded["headers"]["anthropic-version"] == "2023-06-01"
+        assert "authorization" not in forwarded["headers"]  # the caller's token stays here
+
+    def test_chat_completions_json(self, client, auth_headers, fake_upstream):
+        response = client.post(
+            "/v1/chat/completions",
+            json={"model": MODEL, "messages": [{"role": "user", "content": "hi"}]},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        assert response.json()["object"] == "chat.completion"
+        assert fake_upstream.requests[-1]["headers"]["authorization"] == "Bearer upstream-secret"
+
+    def test_upstream_errors_pass_through(self, client, auth_headers, fake_upstream):
+        fake_upstream.status = 429
+        response = client.post("/v1/messages", json={"model": MODEL}, headers=auth_headers)
+        assert response.status_code == 429
+        assert response.json()["error"]["type"] == "rate_limit_error"
+
+
+class TestInferenceValidation:
+    """Requests the proxy answers itself."""
+
+    def test_requires_auth(self, client, fake_upstream):
+        assert client.post("/v1/messages", json={"model": MODEL}).status_code == 403
+
+    def test_unknown_model(self, client, auth_headers, fake_upstream):
+        response = client.post("/v1/messages", json={"model": "not-in-catalog"}, headers=auth_headers)
+        assert response.status_code == 404
+        assert fake_upstream.requests == []
+
+    def test_invalid_body(self, client, auth_headers, fake_upstream):
+        response = client.post("/v1/messages", content=b"[1, 2]", headers=auth_headers)
+        assert response.status_code == 400
+        response = client.post("/v1/messages", json={"stream": True}, headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_not_configured(self, client, auth_headers):
+        assert client.post("/v1/messages", json={"model": MODEL}, headers=auth_headers).status_code == 503
+
+    def test_upstream_unreachable(self, client, auth_headers, settings, monkeypatch):
+        monkeypatch.setattr(settings, "UPSTREAM_BASE_URL", "http://127.0.0.1:1")
+        response = client.post("/v1/messages", json={"model": MODEL}, headers=auth_headers)
+        assert response.status_code == 502
+
+
+class TestClientDisconnect:
+    """A client going away cancels the upstream request."""
+
+    @pytest.mark.asyncio
+    async def test_disconnect_closes_upstream_stream(self, auth_headers, fake_upstream):
+        fake_upstream.endless = True
+        body = json.dumps({"model": MODEL, "stream": True}).encode()
+        first_chunk = asyncio.Event()
+        sent = []
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await first_chunk.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body" and message.get("body"):
+                first_chunk.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/v1/messages",
+            "raw_path": b"/v1/messages",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"content-type", b"application/json"),
+                *((name.lower().encode(), value.encode()) for name, value in auth_headers.items()),
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        cancelled_before = PROXY_RESPONSES.get("messages", "cancelled")
+
+        # The upstream never finishes, so returning at all means the first
+        # chunk was relayed before the body was complete and the stream was
+        # torn down on disconnect.
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+        assert sent[0]["status"] == 200
+        assert await asyncio.to_thread(fake_upstream.disconnected.wait, 5)
+        assert PROXY_RESPONSES.get("messages", "cancelled") == cancelled_before + 1
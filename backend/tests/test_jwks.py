@@ -0,0 +1,143 @@
+"""Tests for production JWKS validation against a local stand-in JWKS server."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+from cryptography.hazmat.primitives.asymmetric import rsa
+import jwt as pyjwt
+import pytest
+
+from app.auth.entra import verify_token
+from app.auth.jwks import get_jwks_store
+from app.config import Settings
+
+
+class _JWKSServer:
+    """Minimal JWKS endpoint whose key set can be rotated by the test."""
+
+    def __init__(self, delay: float = 0.0):
+        self.keys: list[dict] = []
+        self.document = None  # served instead of {"keys": keys} if set
+        self.requests = 0
+        self.delay = delay
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                outer.requests += 1
+                time.sleep(outer.delay)
+                body = json.dumps({"keys": outer.keys} if outer.document is None else outer.document).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/discovery/v2.0/keys"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def publish(self, kid: str, private_key) -> None:
+        jwk = pyjwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+        self.keys.append({**jwk, "kid": kid, "use": "sig", "alg": "RS256"})
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+
+
+def _rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _sign(settings: Settings, private_key, kid: str) -> str:
+    now = datetime.now(timezone.utc)
+    payload = {
+        "sub": "prod-user",
+        "iat": now,
+        "exp": now + timedelta(minutes=5),
+        "iss": settings.entra_issuer,
+        "aud": settings.ENTRA_CLIENT_ID,
+    }
+    return pyjwt.encode(payload, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def jwks_server():
+    server = _JWKSServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def prod_settings(jwks_server):
+    return Settings(MOCK_MODE=False, ENTRA_JWKS_URL=jwks_server.url, JWKS_MIN_REFETCH_SECONDS=60)
+
+
+class TestJWKSValidation:
+    """RS256 verification with a kid-indexed key store."""
+
+    @pytest.mark.asyncio
+    async def test_valid_token_accepted(self, jwks_server, prod_settings):
+        key = _rsa_key()
+        jwks_server.publish("k1", key)
+        store = get_jwks_store(prod_settings)
+        await store.start()
+        try:
+            payload = await verify_token(_sign(prod_settings, key, "k1"), prod_settings)
+        finally:
+            await store.stop()
+        assert payload["sub"] == "prod-user"
+        assert jwks_server.requests == 1
+
+    @pytest.mark.asyncio
+    async def test_wrong_signature_rejected(self, jwks_server, prod_settings):
+        jwks_server.publish("k1", _rsa_key())
+        await get_jwks_store(prod_settings).refresh()
+        forged = _sign(prod_settings, _rsa_key(), "k1")
+        assert await verify_token(forged, prod_settings) is None
+
+    @pytest.mark.asyncio
+    async def test_rotated_kid_triggers_single_refetch(self, jwks_server, prod_settings):
+        jwks_server.publish("old", _rsa_key())
+        store = get_jwks_store(prod_settings)
+        await store.refresh()
+        assert jwks_server.requests == 1
+
+        new_key = _rsa_key()
+        jwks_server.publish("new", new_key)
+        jwks_server.delay = 0.1
+        token = _sign(prod_settings, new_key, "new")
+
+        results = await asyncio.gather(*(verify_token(token, prod_settings) for _ in range(20)))
+        assert all(r is not None for r in results)
+        assert jwks_server.requests == 2
+        assert store.kids == {"old", "new"}
+
+    @pytest.mark.asyncio
+    async def test_unknown_kid_refetch_is_rate_limited(self, jwks_server, prod_settings):
+        jwks_server.publish("k1", _rsa_key())
+        await get_jwks_store(prod_settings).refresh()
+
+        bogus = _sign(prod_settings, _rsa_key(), "does-not-exist")
+        for _ in range(5):
+            assert await verify_token(bogus, prod_settings) is None
+        assert jwks_server.requests == 2  # the initial load plus one refetch
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("document", [["k1"], {"keys": {"k1": {}}}, {"keys": ["k1"]}, {}])
+    async def test_malformed_document_keeps_current_keys(self, jwks_server, prod_settings, document):
+        jwks_server.publish("k1", _rsa_key())
+        store = get_jwks_store(prod_settings)
+        await store.refresh()
+
+        jwks_server.document = document
+        with pytest.raises(ValueError):
+            await store.refresh()  # the error type the refreshers catch and log
+        assert store.kids == {"k1"}
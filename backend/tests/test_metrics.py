@@ -0,0 +1,67 @@
+"""Tests for GET /metrics and the instrumentation middleware."""
+
+from app.metrics import AUTH_FAILURES, HTTP_REQUESTS, HTTP_RESPONSE_BYTES, Registry
+
+
+class TestMetricsEndpoint:
+    """Prometheus exposition endpoint tests."""
+
+    def test_metrics_is_public_text(self, client):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE http_requests_total counter" in response.text
+
+    def test_exports_token_cache_stats(self, client, auth_headers):
+        client.get("/v1/models", headers=auth_headers)
+        body = client.get("/metrics").text
+        assert "token_cache_hit_ratio " in body
+        assert "token_cache_hits_total " in body
+
+
+class TestMetricsMiddleware:
+    """Per-route request accounting."""
+
+    def test_counts_requests_by_route_template(self, client, auth_headers):
+        before = HTTP_REQUESTS.get("GET", "/v1/models", "200")
+        client.get("/v1/models", headers=auth_headers)
+        assert HTTP_REQUESTS.get("GET", "/v1/models", "200") == before + 1
+
+    def test_uses_template_not_raw_path(self, client, auth_headers):
+        before = HTTP_REQUESTS.get("GET", "/cli/{platform}", "200")
+        client.get("/cli/linux", headers=auth_headers)
+        client.get("/cli/win", headers=auth_headers)
+        assert HTTP_REQUESTS.get("GET", "/cli/{platform}", "200") == before + 2
+
+    def test_counts_response_bytes(self, client, auth_headers):
+        before = HTTP_RESPONSE_BYTES.get("/cli/{platform}")
+        response = client.get("/cli/linux", headers=auth_headers)
+        assert HTTP_RESPONSE_BYTES.get("/cli/{platform}") == before + len(response.content)
+
+    def test_counts_auth_failures(self, client):
+        before = AUTH_FAILURES.get()
+        response = client.get("/v1/models", headers={"Authorization": "Bearer not-a-jwt"})
+        assert response.status_code == 401
+        assert AUTH_FAILURES.get() == before + 1
+
+    def test_unmatched_paths_share_one_label(self, client):
+        before = HTTP_REQUESTS.get("GET", "unmatched", "404")
+        client.get("/no/such/path/1")
+        client.get("/no/such/path/2")
+        assert HTTP_REQUESTS.get("GET", "unmatched", "404") == before + 2
+
+
+class TestHistogram:
+    """Exposition format of histograms."""
+
+    def test_renders_cumulative_buckets(self):
+        registry = Registry()
+        histogram = registry.histogram("op_seconds", "Op latency.", ("op",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, "read")
+        histogram.observe(0.5, "read")
+        histogram.observe(5.0, "read")
+        lines = registry.render().splitlines()
+        assert 'op_seconds_bucket{op="read",le="0.1"} 1' in lines
+        assert 'op_seconds_bucket{op="read",le="1.0"} 2' in lines
+        assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in lines
+        assert 'op_seconds_count{op="read"} 3' in lines
@@ -0,0 +1,128 @@
+"""Tests for the hot-reloadable model catalog."""
+
+import json
+import os
+
+import jwt as pyjwt
+import pytest
+
+from app.services import model_service
+from app.services.model_service import FileCatalogSource, ModelCatalog, StaticCatalogSource
+
+_MODELS = [
+    {"id": "public-model", "created": 1, "owned_by": "anthropic"},
+    {"id": "eng-model", "created": 2, "owned_by": "anthropic", "groups": ["eng"]},
+    {"id": "research-model", "created": 3, "owned_by": "anthropic", "groups": ["research"]},
+]
+
+
+def _write(path, models) -> None:
+    path.write_text(json.dumps({"data": models}))
+    # Make sure the fingerprint changes even on coarse-mtime filesystems.
+    stat_result = os.stat(path)
+    os.utime(path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    path = tmp_path / "models.json"
+    _write(path, _MODELS)
+    return path
+
+
+class TestModelCatalog:
+    """Snapshots, versions and group filtering."""
+
+    def test_static_source_has_mock_models(self):
+        catalog = ModelCatalog(StaticCatalogSource())
+        assert catalog.version == 1
+        assert catalog.snapshot.get("claude-sonnet-4-20250514") is not None
+
+    def test_lookup_by_id(self, catalog_file):
+        catalog = ModelCatalog(FileCatalogSource(str(catalog_file)))
+        assert catalog.snapshot.get("eng-model").groups == ["eng"]
+        assert catalog.snapshot.get("missing") is None
+
+    def test_group_filtering(self, catalog_file):
+        snapshot = ModelCatalog(FileCatalogSource(str(catalog_file))).snapshot
+        ids = lambda groups: [m.id for m in snapshot.visible(frozenset(groups))]  # noqa: E731
+        assert ids([]) == ["public-model"]
+        assert ids(["eng"]) == ["public-model", "eng-model"]
+        assert ids(["eng", "research", "sales"]) == ["public-model", "eng-model", "research-model"]
+
+    def test_visible_keeps_catalog_order(self, catalog_file):
+        _write(catalog_file, [_MODELS[1], _MODELS[0], _MODELS[2]])
+        snapshot = ModelCatalog(FileCatalogSource(str(catalog_file))).snapshot
+        assert [m.id for m in snapshot.visible(frozenset({"eng"}))] == ["eng-model", "public-model"]
+
+    @pytest.mark.parametrize(
+        ("claim", "expected"),
+        [
+            (["eng", "research"], {"eng", "research"}),
+            ("eng", {"eng"}),
+            (None, set()),
+            (42, set()),
+            ({"eng": True}, set()),
+            (["eng", 7], {"eng"}),
+        ],
+    )
+    def test_user_groups_claim_shapes(self, settings, claim, expected):
+        user = {"sub": "someone"} if claim is None else {"sub": "someone", settings.MODEL_GROUPS_CLAIM: claim}
+        assert model_service.user_groups(user, settings) == expected
+
+    def test_payload_memoized_per_relevant_groups(self, catalog_file):
+        snapshot = ModelCatalog(FileCatalogSource(str(catalog_file))).snapshot
+        # Groups the catalog does not mention share the anonymous payload.
+        assert snapshot.payload_for(["sales"]) is snapshot.payload_for([])
+        assert snapshot.payload_for(["eng"]) is not snapshot.payload_for([])
+
+    def test_reload_bumps_version_and_notifies(self, catalog_file):
+        catalog = ModelCatalog(FileCatalogSource(str(catalog_file)))
+        seen = []
+        catalog.on_change(lambda snapshot: seen.append(snapshot.version))
+        old = catalog.snapshot
+
+        assert catalog.reload() is False  # unchanged file
+        _write(catalog_file, _MODELS[:1])
+        assert catalog.reload() is True
+
+        assert catalog.version == 2
+        assert seen == [2]
+        assert [m.id for m in catalog.snapshot.models] == ["public-model"]
+        assert len(old.models) == 3  # readers holding the old snapshot are unaffected
+
+    def test_unsubscribed_listener_is_not_called(self, catalog_file):
+        catalog = ModelCatalog(FileCatalogSource(str(catalog_file)))
+        seen = []
+        unsubscribe = catalog.on_change(lambda snapshot: seen.append(snapshot.version))
+        unsubscribe()
+        assert catalog.reload(force=True) is True and seen == []
+
+    def test_invalid_file_keeps_current_snapshot(self, catalog_file):
+        catalog = ModelCatalog(FileCatalogSource(str(catalog_file)))
+        catalog_file.write_text("{not json")
+        os.utime(catalog_file, ns=(0, 1))
+        assert catalog.reload() is False
+        assert catalog.version == 1
+        assert len(catalog.snapshot.models) == 3
+
+
+class TestModelsRouteWithGroups:
+    """GET /v1/models filters by the caller's groups claim."""
+
+    def test_groups_claim_controls_visibility(self, client, settings, catalog_file, monkeypatch):
+        monkeypatch.setattr(model_service, "_catalog", ModelCatalog(FileCatalogSource(str(catalog_file))))
+
+        claims = {
+            "sub": "eng-user",
+            "groups": ["eng"],
+            "exp": 4_102_444_800,
+            "iss": settings.entra_authority,
+            "aud": settings.ENTRA_CLIENT_ID,
+        }
+        token = pyjwt.encode(claims, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+        response = client.get("/v1/models", headers={"Authorization": f"Bearer {token}"})
+
+        assert response.status_code == 200
+        assert [m["id"] for m in response.json()["data"]] == ["public-model", "eng-model"]
+        assert "groups" not in response.json()["data"][1]
@@ -0,0 +1,185 @@
+"""Tests for the layered settings policy engine."""
+
+import json
+
+import jwt as pyjwt
+import pytest
+
+from app.services import settings_service
+from app.services.policy_engine import Claims, apply_merge_patch, compile_policy, deep_merge, merge_patch
+
+_POLICY = {
+    "base": {
+        "env": {"ANTHROPIC_BASE_URL": "https://proxy/v1", "ANTHROPIC_MODEL": "default-model"},
+        "permissions": {"allow": ["Read(*)"], "deny": []},
+        "allowedTools": ["read"],
+    },
+    "rules": [
+        {
+            "name": "engineering",
+            "match": {"groups": ["eng", "platform"]},
+            "settings": {"permissions": {"allow": ["Bash(*)"]}, "allowedTools": ["bash"]},
+        },
+        {
+            "name": "contractors",
+            "match": {"email_domain": "Vendor.example"},
+            "settings": {"permissions": {"deny": ["WebFetch(*)"]}},
+        },
+        {
+            "name": "eu-eng-model",
+            "match": {"groups": ["eng"], "tenant": ["eu-tenant"]},
+            "settings": {"env": {"ANTHROPIC_MODEL": "eu-model"}},
+        },
+    ],
+}
+
+
+@pytest.fixture
+def policy():
+    return compile_policy(_POLICY)
+
+
+class TestPolicyMatching:
+    """Rule compilation and claim matching."""
+
+    def test_no_claims_gets_base(self, policy):
+        rendered = policy.render(Claims())
+        assert rendered["permissions"] == {"allow": ["Read(*)"], "deny": []}
+        assert rendered["env"]["ANTHROPIC_MODEL"] == "default-model"
+
+    def test_any_listed_group_matches(self, policy):
+        rendered = policy.render(Claims(groups=frozenset({"platform"})))
+        assert rendered["permissions"]["allow"] == ["Read(*)", "Bash(*)"]
+        assert rendered["allowedTools"] == ["read", "bash"]
+
+    def test_all_dimensions_must_match(self, policy):
+        eng_only = policy.render(Claims(groups=frozenset({"eng"})))
+        eng_eu = policy.render(Claims(groups=frozenset({"eng"}), tenant="eu-tenant"))
+        assert eng_only["env"]["ANTHROPIC_MODEL"] == "default-model"
+        assert eng_eu["env"]["ANTHROPIC_MODEL"] == "eu-model"
+        assert eng_eu["env"]["ANTHROPIC_BASE_URL"] == "https://proxy/v1"
+
+    def test_email_domain_from_payload(self, policy):
+        claims = Claims.from_payload({"email": "someone@VENDOR.example"})
+        assert policy.render(claims)["permissions"]["deny"] == ["WebFetch(*)"]
+
+    @pytest.mark.parametrize(
+        ("payload", "expected"),
+        [
+            ({"groups": "eng", "tid": "t1", "email": "a@b.example"}, Claims(frozenset({"eng"}), "t1", "b.example")),
+            ({"groups": ["eng", 7, None], "email": ["a@b.example"], "tid": 42}, Claims(frozenset({"eng"}))),
+            ({"groups": {"eng": True}, "email": 7}, Claims()),
+        ],
+    )
+    def test_malformed_claims_are_ignored(self, payload, expected):
+        assert Claims.from_payload(payload) == expected
+
+    def test_rule_mask(self, policy):
+        claims = Claims(groups=frozenset({"eng"}), tenant="eu-tenant", email_domain="vendor.example")
+        assert policy.mask_for(claims) == 0b111
+
+    def test_unknown_dimension_rejected(self):
+        with pytest.raises(ValueError):
+            compile_policy({"rules": [{"match": {"department": ["x"]}}]})
+
+    @pytest.mark.parametrize(
+        "document",
+        [
+            [],
+            {"rules": "engineering"},
+            {"rules": ["engineering"]},
+            {"rules": [{"match": "eng"}]},
+            {"rules": [{"match": {"groups": ["eng", 7]}}]},
+            {"rules": [{"settings": "x"}]},
+            {"rules": [{"match": {"groups": ["eng"]}, "settings": {"permissions": "x"}}]},
+        ],
+    )
+    def test_malformed_policy_rejected_at_compile_time(self, document):
+        with pytest.raises(ValueError):
+            compile_policy(document)
+
+    def test_deep_merge_does_not_mutate(self):
+        base = {"a": {"b": [1]}}
+        merged = deep_merge(base, {"a": {"b": [1, 2], "c": 3}})
+        assert merged == {"a": {"b": [1, 2], "c": 3}}
+        assert base == {"a": {"b": [1]}}
+
+
+class TestMergePatch:
+    """RFC 7386 patches between rendered documents."""
+
+    def test_patch_round_trips(self):
+        source = {"env": {"A": "1", "B": "2"}, "permissions": {"allow": ["Read(*)"], "deny": []}, "extra": True}
+        target = {"env": {"A": "1", "C": "3"}, "permissions": {"allow": ["Read(*)", "Bash(*)"], "deny": []}}
+        patch = merge_patch(source, target)
+        assert patch == {"env": {"B": None, "C": "3"}, "permissions": {"allow": ["Read(*)", "Bash(*)"]}, "extra": None}
+        assert apply_merge_patch(source, patch) == target
+
+    def test_identical_documents_give_empty_patch(self):
+        assert merge_patch({"a": {"b": [1]}}, {"a": {"b": [1]}}) == {}
+
+    def test_null_values_cannot_round_trip(self):
+        source, target = {"a": 1}, {"a": None}
+        assert apply_merge_patch(source, merge_patch(source, target)) != target
+
+    def test_served_claims_reproduce_payloads(self, policy):
+        payload = policy.payload_for(Claims(groups=frozenset({"eng", "sales"}), tenant="eu-tenant"))
+        (claims,) = policy.served_claims()
+        assert policy.payload_for(claims) is payload
+
+
+class TestPolicyMemoization:
+    """Rendered payloads are shared across equivalent claim-sets."""
+
+    def test_irrelevant_claims_share_payload(self, policy):
+        a = policy.payload_for(Claims(groups=frozenset({"eng", "sales"}), email_domain="corp.example"))
+        b = policy.payload_for(Claims(groups=frozenset({"eng"}), tenant="us-tenant"))
+        assert a is b
+
+    def test_same_rule_mask_shares_payload(self, policy):
+        a = policy.payload_for(Claims(groups=frozenset({"eng"})))
+        b = policy.payload_for(Claims(groups=frozenset({"platform"})))
+        assert a is b
+        assert json.loads(a.body)["allowedTools"] == ["read", "bash"]
+
+
+class TestSettingsRouteWithPolicy:
+    """GET /api/claude-settings resolves settings for the caller."""
+
+    def test_caller_claims_select_rules(self, client, settings, tmp_path, monkeypatch):
+        policy_file = tmp_path / "policy.json"
+        policy_file.write_text(json.dumps(_POLICY))
+        monkeypatch.setattr(
+            settings_service,
+            "_policy",
+            settings_service._load_policy(settings.model_copy(update={"SETTINGS_POLICY_PATH": str(policy_file)})),
+        )
+
+        claims = {
+            "sub": "contractor",
+            "email": "c@vendor.example",
+            "groups": ["eng"],
+            "exp": 4_102_444_800,
+            "iss": settings.entra_authority,
+            "aud": settings.ENTRA_CLIENT_ID,
+        }
+        token = pyjwt.encode(claims, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+        data = client.get("/api/claude-settings", headers={"Authorization": f"Bearer {token}"}).json()
+
+        assert data["permissions"] == {"allow": ["Read(*)", "Bash(*)"], "deny": ["WebFetch(*)"]}
+        assert data["allowedTools"] == ["read", "bash"]
+
+    def test_invalid_policy_at_startup_serves_defaults(self, client, auth_headers, settings, tmp_path, monkeypatch):
+        policy_file = tmp_path / "policy.json"
+        policy_file.write_text("{not json")
+        monkeypatch.setattr(settings, "SETTINGS_POLICY_PATH", str(policy_file))
+        monkeypatch.setattr(settings_service, "_policy", None)
+        monkeypatch.setattr(settings_service, "_policy_fp", None)
+
+        response = client.get("/api/claude-settings", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == settings_service._DEFAULT_SETTINGS
+
+    def test_reload_bumps_version(self, settings):
+        before = settings_service.get_settings_version()
+        assert settings_service.reload_enterprise_settings(settings) == before + 1
@@ -0,0 +1,114 @@
+"""Tests for the refresh-token store and proxy-signed session tokens."""
+
+import time
+
+import jwt as pyjwt
+import pytest
+
+from app.auth.entra import sign_session_token, validate_token
+from app.auth.refresh_tokens import (
+    RefreshTokenError,
+    RefreshTokenReuseError,
+    RefreshTokenStore,
+    session_claims,
+)
+from app.config import MOCK_JWT_SECRET
+from app.shared_state import FileStateBackend, MemoryStateBackend
+
+_CLAIMS = {"sub": "user-1", "email": "user@enterprise.local", "groups": ["eng"]}
+
+
+@pytest.fixture
+def store():
+    return RefreshTokenStore(MemoryStateBackend(), ttl=60, max_age=3600)
+
+
+class TestRefreshTokenStore:
+    """Rotation, reuse detection and expiry."""
+
+    def test_rotate_returns_claims_and_new_token(self, store):
+        token = store.issue(_CLAIMS)
+        claims, replacement = store.rotate(token)
+        assert claims == _CLAIMS
+        assert replacement != token
+        assert store.family_of(replacement) == store.family_of(token)
+
+    def test_tokens_are_single_use(self, store):
+        token = store.issue(_CLAIMS)
+        store.rotate(token)
+        with pytest.raises(RefreshTokenReuseError):
+            store.rotate(token)
+
+    def test_reuse_revokes_family(self, store):
+        token = store.issue(_CLAIMS)
+        _, replacement = store.rotate(token)
+        with pytest.raises(RefreshTokenReuseError):
+            store.rotate(token)
+        with pytest.raises(RefreshTokenError):
+            store.rotate(replacement)
+
+    def test_other_families_unaffected(self, store):
+        victim, bystander = store.issue(_CLAIMS), store.issue(_CLAIMS)
+        store.rotate(victim)
+        with pytest.raises(RefreshTokenReuseError):
+            store.rotate(victim)
+        store.rotate(bystander)
+
+    def test_idle_expiry(self):
+        store = RefreshTokenStore(MemoryStateBackend(), ttl=0.05, max_age=3600)
+        token = store.issue(_CLAIMS)
+        time.sleep(0.1)
+        with pytest.raises(RefreshTokenError):
+            store.rotate(token)
+
+    def test_family_max_age_is_absolute(self):
+        store = RefreshTokenStore(MemoryStateBackend(), ttl=60, max_age=0.1)
+        token = store.issue(_CLAIMS)
+        _, token = store.rotate(token)
+        time.sleep(0.15)
+        with pytest.raises(RefreshTokenError):
+            store.rotate(token)
+
+    def test_redeemable_from_another_worker(self, tmp_path):
+        worker_a = RefreshTokenStore(FileStateBackend(str(tmp_path)), ttl=60, max_age=3600)
+        worker_b = RefreshTokenStore(FileStateBackend(str(tmp_path)), ttl=60, max_age=3600)
+        token = worker_a.issue(_CLAIMS)
+        claims, _ = worker_b.rotate(token)
+        assert claims == _CLAIMS
+        with pytest.raises(RefreshTokenReuseError):
+            worker_a.rotate(token)
+
+    def test_session_claims_drop_registered_claims(self):
+        payload = {**_CLAIMS, "iat": 1, "exp": 2, "iss": "x", "aud": "y"}
+        assert session_claims(payload) == _CLAIMS
+
+
+class TestSessionTokens:
+    """Access tokens signed locally after a refresh."""
+
+    def test_valid_in_mock_mode(self, settings):
+        token = sign_session_token(_CLAIMS, settings)["access_token"]
+        assert validate_token(token, settings)["sub"] == "user-1"
+
+    def test_valid_in_production_mode(self, settings):
+        production = settings.model_copy(update={"MOCK_MODE": False, "SESSION_TOKEN_SECRET": "session-secret"})
+        token = sign_session_token(_CLAIMS, production)["access_token"]
+        payload = validate_token(token, production)
+        assert payload["iss"] == production.SESSION_TOKEN_ISSUER
+        assert payload["groups"] == ["eng"]
+
+    def test_production_rejects_wrong_secret(self, settings):
+        production = settings.model_copy(update={"MOCK_MODE": False, "SESSION_TOKEN_SECRET": "session-secret"})
+        forged = sign_session_token(_CLAIMS, production.model_copy(update={"SESSION_TOKEN_SECRET": "other"}))
+        assert validate_token(forged["access_token"], production) is None
+
+    @pytest.mark.parametrize("secret", ["", MOCK_JWT_SECRET])
+    def test_production_without_session_secret(self, settings, secret):
+        production = settings.model_copy(update={"MOCK_MODE": False, "SESSION_TOKEN_SECRET": secret})
+        assert not production.session_tokens_enabled
+        with pytest.raises(RuntimeError):
+            sign_session_token(_CLAIMS, production)
+        # Minted with the public mock key: must not pass as a proxy-signed session.
+        claims = {**_CLAIMS, "iss": production.SESSION_TOKEN_ISSUER, "aud": production.ENTRA_CLIENT_ID}
+        forged = pyjwt.encode(claims, MOCK_JWT_SECRET, algorithm=production.JWT_ALGORITHM)
+        assert validate_token(forged, production) is None
@@ -0,0 +1,167 @@
+"""Tests for the deterministic-request response cache."""
+
+import os
+import time
+
+import pytest
+
+from app.schemas.models import CatalogModel
+from app.services import response_cache
+from app.services.model_service import CatalogSnapshot, get_model_catalog
+from app.services.response_cache import ResponseCache, cache_key, is_deterministic
+
+CACHED_MODEL = "claude-3-haiku-20240307"
+REQUEST = {
+    "model": CACHED_MODEL,
+    "temperature": 0,
+    "max_tokens": 64,
+    "messages": [{"role": "user", "content": "hi"}],
+}
+
+
+async def _spilled(cache: ResponseCache) -> None:
+    """Wait for pending disk spills."""
+    for future in list(cache._spills):
+        await future
+
+
+class TestCacheKey:
+    """Semantically identical requests share a key."""
+
+    def test_canonicalization(self):
+        reordered = {
+            "messages": [{"content": "hi", "role": "user"}],
+            "max_tokens": 64.0,
+            "temperature": 0.0,
+            "model": CACHED_MODEL,
+            "metadata": {"user_id": "someone"},
+        }
+        assert cache_key("messages", reordered, {}) == cache_key("messages", REQUEST, {})
+
+    def test_distinguishes_requests(self):
+        key = cache_key("messages", REQUEST, {})
+        assert cache_key("messages", {**REQUEST, "model": "other"}, {}) != key
+        assert cache_key("chat_completions", REQUEST, {}) != key
+        assert cache_key("messages", REQUEST, {"anthropic-version": "2023-06-01"}) != key
+
+    def test_only_greedy_single_choice_requests(self):
+        assert is_deterministic({"temperature": 0})
+        assert not is_deterministic({})
+        assert not is_deterministic({"temperature": 0.7})
+        assert not is_deterministic({"temperature": 0, "n": 3})
+
+
+class TestTiers:
+    """Memory LRU spills to a disk LRU; TTLs apply to both."""
+
+    @pytest.mark.asyncio
+    async def test_memory_hit_and_ttl(self):
+        cache = ResponseCache(memory_bytes=1024)
+        cache.put("a", "application/json", b"{}", ttl=60)
+        cache.put("expired", "application/json", b"{}", ttl=0.01)
+        time.sleep(0.02)
+        assert (await cache.get("a")).body == b"{}"
+        assert await cache.get("expired") is None
+        assert cache.stats()["hits"]["memory"] == 1 and cache.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_evictions_spill_to_disk_and_promote(self, tmp_path):
+        cache = ResponseCache(memory_bytes=100, disk_dir=str(tmp_path), disk_bytes=10_000)
+        for key in "abc":
+            cache.put(key, "text/event-stream", key.encode() * 40, ttl=60)
+        await _spilled(cache)
+        assert len(cache.memory) == 2 and len(cache.disk) == 1
+
+        entry = await cache.get("a")
+        assert entry.body == b"a" * 40
+        assert cache.stats()["hits"]["disk"] == 1
+        assert cache.memory.get("a", time.time()) is not None  # promoted
+
+    @pytest.mark.asyncio
+    async def test_disk_tier_survives_restart_and_is_bounded(self, tmp_path):
+        first = ResponseCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=10_000)
+        for key in ("old", "new"):
+            first.put(key, "application/json", b"x" * 4000, ttl=60)
+            await _spilled(first)
+        os.utime(tmp_path / "old.entry", (time.time() - 60, time.time() - 60))
+
+        second = ResponseCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=5_000)
+        second.load()
+        assert "old" not in second.disk and "new" in second.disk
+        assert (await second.get("new")).body == b"x" * 4000
+
+    @pytest.mark.asyncio
+    async def test_spill_replaces_the_disk_copy(self, tmp_path):
+        cache = ResponseCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=10_000)
+        cache.put("a", "application/json", b"stale", ttl=60)
+        await _spilled(cache)
+        cache.put("a", "application/json", b"fresh", ttl=60)
+        await _spilled(cache)
+        assert (await cache.get("a")).body == b"fresh" and len(cache.disk) == 1
+
+    @pytest.mark.asyncio
+    async def test_disk_tier_only_touches_its_own_files(self, tmp_path):
+        (tmp_path / "README").write_text("shared directory")
+        (tmp_path / "upload.tmp").write_text("someone else's write")
+        os.utime(tmp_path / "upload.tmp", (time.time() - 600, time.time() - 600))
+        cache = ResponseCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=10)
+        cache.load()
+        cache.put("a", "application/json", b"x" * 100, ttl=60)  # over budget: evicted at once
+        await _spilled(cache)
+        assert len(cache.disk) == 0
+        assert sorted(os.listdir(tmp_path)) == ["README", "upload.tmp"]
+
+
+class TestProxyCache:
+    """The inference routes serve repeated deterministic requests from cache."""
+
+    @pytest.fixture
+    def cache(self, monkeypatch, fake_upstream):
+        catalog = get_model_catalog()
+        models = [CatalogModel(**model.model_dump()) for model in catalog.snapshot.models]
+        models = [
+            model.model_copy(update={"response_cache_ttl": 300}) if model.id == CACHED_MODEL else model
+            for model in models
+        ]
+        monkeypatch.setattr(catalog, "_snapshot", CatalogSnapshot.build(catalog.version, models))
+        cache = ResponseCache(memory_bytes=1 << 20)
+        monkeypatch.setattr(response_cache, "_cache", cache)
+        return cache
+
+    def test_stream_is_replayed_from_cache(self, client, auth_headers, fake_upstream, cache):
+        body = {**REQUEST, "stream": True}
+        first = client.post("/v1/messages", json=body, headers=auth_headers)
+        second = client.post("/v1/messages", json=body, headers=auth_headers)
+
+        assert first.headers["x-cache"] == "MISS" and second.headers["x-cache"] == "HIT"
+        assert second.headers["content-type"].startswith("text/event-stream")
+        assert second.content == first.content
+        assert len(fake_upstream.requests) == 1
+        assert fake_upstream.requests[0]["headers"]["accept-encoding"] == "identity"
+        stats = cache.stats()
+        assert stats["hit_ratio"] == 0.5 and stats["bytes_saved"] == len(first.content)
+
+    def test_json_response_is_cached(self, client, auth_headers, fake_upstream, cache):
+        client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        response = client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        assert response.headers["x-cache"] == "HIT"
+        assert response.json()["id"] == "msg_fake"
+
+    def test_non_deterministic_or_opted_out_requests_bypass(self, client, auth_headers, fake_upstream, cache):
+        for _ in range(2):
+            response = client.post("/v1/messages", json={**REQUEST, "temperature": 1}, headers=auth_headers)
+            assert "x-cache" not in response.headers
+            client.post("/v1/messages", json=REQUEST, headers={**auth_headers, "cache-control": "no-store"})
+        assert len(fake_upstream.requests) == 4
+
+    def test_models_without_ttl_are_not_cached(self, client, auth_headers, fake_upstream, cache):
+        body = {**REQUEST, "model": "claude-sonnet-4-20250514"}
+        for _ in range(2):
+            assert "x-cache" not in client.post("/v1/messages", json=body, headers=auth_headers).headers
+        assert len(fake_upstream.requests) == 2
+
+    def test_upstream_errors_are_not_cached(self, client, auth_headers, fake_upstream, cache):
+        fake_upstream.status = 429
+        client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        fake_upstream.status = 200
+        assert client.post("/v1/messages", json=REQUEST, headers=auth_headers).headers["x-cache"] == "MISS"
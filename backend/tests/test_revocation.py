@@ -0,0 +1,129 @@
+"""Tests for token revocation and the admin API."""
+
+import time
+import uuid
+
+import jwt as pyjwt
+import pytest
+
+from app.auth.entra import sign_session_token
+from app.auth.revocation import RevocationList
+from app.config import get_settings
+from app.main import app
+from app.shared_state import FileStateBackend, MemoryStateBackend, StateSync
+
+
+def _revocations(backend=None) -> RevocationList:
+    return RevocationList(StateSync(backend or MemoryStateBackend()), default_ttl=60, retention=3600)
+
+
+class TestRevocationList:
+    """Membership checks and incremental propagation."""
+
+    def test_revoke_jti(self):
+        revocations = _revocations()
+        revocations.revoke("jti", "token-1")
+        assert revocations.is_revoked({"sub": "u", "jti": "token-1", "iat": time.time()})
+        assert not revocations.is_revoked({"sub": "u", "jti": "token-2", "iat": time.time()})
+
+    def test_entra_uti_counts_as_jti(self):
+        revocations = _revocations()
+        revocations.revoke("jti", "uti-1")
+        assert revocations.is_revoked({"uti": "uti-1"})
+
+    @pytest.mark.parametrize("kind", ["sub", "oid"])
+    def test_subject_revocation_covers_earlier_sessions_only(self, kind):
+        revocations = _revocations()
+        before = time.time() - 10
+        revocations.revoke(kind, "user-1")
+        assert revocations.is_revoked({kind: "user-1", "iat": before})
+        assert revocations.is_revoked({kind: "user-1", "iat": time.time() + 10, "auth_time": before})
+        assert not revocations.is_revoked({kind: "user-1", "iat": time.time() + 10})
+        assert not revocations.is_revoked({kind: "user-2", "iat": before})
+
+    def test_expired_entries_do_not_match(self):
+        revocations = _revocations()
+        revocations.revoke("jti", "old", expires_at=time.time() - 1)
+        assert not revocations.is_revoked({"jti": "old"})
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError):
+            _revocations().revoke("email", "x@y")
+
+    def test_other_workers_apply_only_new_events(self, tmp_path):
+        worker_a = _revocations(FileStateBackend(str(tmp_path)))
+        worker_b = _revocations(FileStateBackend(str(tmp_path)))
+
+        worker_a.revoke("jti", "t1")
+        worker_a.revoke("sub", "u1")
+        assert worker_b.catch_up() == 2
+        assert worker_b.is_revoked({"jti": "t1"})
+        assert worker_b.catch_up() == 0
+
+        worker_a.revoke("jti", "t2")
+        assert worker_b.catch_up() == 1
+        assert len(worker_b) == 3
+
+    def test_large_list(self):
+        revocations = _revocations()
+        for index in range(200_000):
+            revocations._apply({"kind": "jti", "value": f"t{index}", "revoked_at": 0, "expires": 4e9})
+        assert revocations.is_revoked({"jti": "t199999"})
+        assert not revocations.is_revoked({"jti": "fresh", "sub": "u", "oid": "o", "iat": 1})
+
+
+def _token(settings, **claims) -> str:
+    return sign_session_token({"sub": f"user-{uuid.uuid4().hex}", **claims}, settings)["access_token"]
+
+
+@pytest.fixture
+def admin_settings(settings):
+    overridden = settings.model_copy(update={"ADMIN_GROUPS": "proxy-admins"})
+    app.dependency_overrides[get_settings] = lambda: overridden
+    yield overridden
+    app.dependency_overrides.pop(get_settings, None)
+
+
+class TestAdminAPI:
+    """POST/GET /admin/revocations and enforcement in require_auth."""
+
+    def test_requires_admin_group(self, client, admin_settings):
+        headers = {"Authorization": f"Bearer {_token(admin_settings, groups=['eng'])}"}
+        response = client.post("/admin/revocations", json={"kind": "jti", "value": "x"}, headers=headers)
+        assert response.status_code == 403
+
+    def test_disabled_without_admin_groups(self, client, settings):
+        headers = {"Authorization": f"Bearer {_token(settings, groups=[''])}"}
+        assert client.get("/admin/revocations", headers=headers).status_code == 403
+
+    def test_revoked_token_is_rejected(self, client, admin_settings):
+        admin = {"Authorization": f"Bearer {_token(admin_settings, roles=['proxy-admins'])}"}
+        victim = _token(admin_settings)
+        victim_headers = {"Authorization": f"Bearer {victim}"}
+        assert client.get("/v1/models", headers=victim_headers).status_code == 200
+
+        jti = pyjwt.decode(victim, options={"verify_signature": False})["jti"]
+        response = client.post("/admin/revocations", json={"kind": "jti", "value": jti}, headers=admin)
+        assert response.status_code == 201
+        assert response.json()["kind"] == "jti"
+
+        rejected = client.get("/v1/models", headers=victim_headers)
+        assert rejected.status_code == 401
+        assert rejected.json()["detail"] == "Token has been revoked"
+
+        stats = client.get("/admin/revocations", headers=admin).json()
+        assert stats["entries"]["jti"] >= 1
+
+    def test_subject_revocation_blocks_refresh(self, client, admin_settings):
+        admin = {"Authorization": f"Bearer {_token(admin_settings, groups=['proxy-admins'])}"}
+        login = client.get(
+            "/sso/login", params={"redirect": "http://127.0.0.1:8080/callback"}, follow_redirects=False
+        )
+        refresh_token = login.headers["location"].split("refresh_token=")[1]
+        access_token = login.headers["location"].split("token=")[1].split("&")[0]
+        oid = pyjwt.decode(access_token, options={"verify_signature": False})["oid"]
+
+        client.post("/admin/revocations", json={"kind": "oid", "value": oid}, headers=admin)
+        response = client.post("/sso/refresh", json={"refresh_token": refresh_token})
+        assert response.status_code == 401
+        assert "revoked" in response.json()["detail"]
@@ -1,5 +1,29 @@
 """Tests for GET /api/claude-settings."""
 
+import json
+
+import pytest
+
+from app.services import settings_service
+from app.services.policy_engine import apply_merge_patch
+
+
+@pytest.fixture
+def write_policy(settings, tmp_path):
+    """Call with a settings policy document to write and reload it; returns the new settings version.
+
+    The configured policy is reloaded after the test.
+    """
+    path = tmp_path / "policy.json"
+    policy_settings = settings.model_copy(update={"SETTINGS_POLICY_PATH": str(path)})
+
+    def write(policy: dict) -> int:
+        path.write_text(json.dumps(policy))
+        return settings_service.reload_enterprise_settings(policy_settings)
+
+    yield write
+    settings_service.reload_enterprise_settings(settings)
+
 
 class TestSettings:
     """Enterprise settings endpoint tests."""
@@ -27,3 +51,59 @@ class TestSettings:
             headers={"Authorization": "Bearer not-a-real-jwt"},
         )
         assert response.status_code == 401
+
+    def test_settings_etag_and_304(self, client, auth_headers):
+        """Unchanged settings should answer If-None-Match with 304."""
+        etag = client.get("/api/claude-settings", headers=auth_headers).headers["etag"]
+        response = client.get("/api/claude-settings", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+
+
+class TestSettingsDelta:
+    """GET /api/claude-settings?since=N answers with a merge patch or 304."""
+
+    def test_openapi_documents_both_shapes(self, client):
+        responses = client.get("/openapi.json").json()["paths"]["/api/claude-settings"]["get"]["responses"]
+        assert set(responses["200"]["content"]) == {"application/json", "application/merge-patch+json"}
+        assert "304" in responses
+
+    RULES = [
+        {"name": "many", "match": {}, "settings": {"permissions": {"allow": [f"Read(/srv/{n}/*)" for n in range(200)]}}}
+    ]
+
+    def test_version_header_and_unchanged(self, client, auth_headers, write_policy):
+        version = write_policy({"rules": self.RULES})
+        response = client.get("/api/claude-settings", headers=auth_headers)
+        assert response.headers["x-settings-version"] == str(version)
+
+        unchanged = client.get("/api/claude-settings", params={"since": version}, headers=auth_headers)
+        assert unchanged.status_code == 304
+        assert unchanged.headers["etag"] == response.headers["etag"]
+
+    def test_patch_since_previous_version(self, client, auth_headers, write_policy):
+        before = write_policy({"rules": self.RULES})
+        old = client.get("/api/claude-settings", headers=auth_headers).json()
+
+        deny = {"name": "no-fetch", "match": {}, "settings": {"permissions": {"deny": ["WebFetch(*)"]}}}
+        settings_service._patches.clear()
+        after = write_policy({"rules": [*self.RULES, deny]})
+        assert len(settings_service._patches) == 1  # precomputed during the reload
+
+        response = client.get("/api/claude-settings", params={"since": before}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/merge-patch+json"
+        assert response.headers["x-settings-version"] == str(after)
+        assert response.json() == {"permissions": {"deny": ["WebFetch(*)"]}}
+
+        current = client.get("/api/claude-settings", headers=auth_headers)
+        assert apply_merge_patch(old, response.json()) == current.json()
+        assert len(response.content) < len(current.content) / 10
+
+    def test_unknown_version_gets_full_document(self, client, auth_headers, write_policy, settings):
+        version = write_policy({"rules": self.RULES})
+        for _ in range(settings.SETTINGS_HISTORY_SIZE):
+            write_policy({"rules": self.RULES})
+        for since in (version, version + 10_000):
+            response = client.get("/api/claude-settings", params={"since": since}, headers=auth_headers)
+            assert response.headers["content-type"] == "application/json"
+            assert "permissions" in response.json()
@@ -0,0 +1,296 @@
+"""Tests for the multi-worker shared state backends and generation sync."""
+
+import asyncio
+import json
+import os
+import socketserver
+import threading
+import time
+
+import pytest
+
+from app import shared_state
+from app.config import get_settings
+from app.services.model_service import FileCatalogSource, ModelCatalog
+from app.shared_state import (
+    FileStateBackend,
+    MemoryStateBackend,
+    PrefixedBackend,
+    RedisStateBackend,
+    StateBackendError,
+    StateSync,
+)
+
+
+class _RedisStandIn:
+    """In-process server speaking the subset of RESP2 the backend uses."""
+
+    def __init__(self, password: str = ""):
+        self.values: dict[bytes, tuple[float, bytes]] = {}
+        self.password = password
+        self.lock = threading.Lock()
+        outer = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                authed = not outer.password
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    args = []
+                    for _ in range(int(line[1:])):
+                        length = int(self.rfile.readline()[1:])
+                        args.append(self.rfile.read(length + 2)[:-2])
+                    command = args[0].upper()
+                    if command == b"AUTH":
+                        authed = args[-1].decode() == outer.password
+                        self.wfile.write(b"+OK\r\n" if authed else b"-WRONGPASS invalid password\r\n")
+                    elif not authed:
+                        self.wfile.write(b"-NOAUTH Authentication required.\r\n")
+                    else:
+                        self.wfile.write(outer.execute(command, args[1:]))
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def _bulk(value) -> bytes:
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _live(self, key: bytes):
+        entry = self.values.get(key)
+        if entry is None or (entry[0] and entry[0] <= time.time()):
+            self.values.pop(key, None)
+            return None
+        return entry[1]
+
+    def execute(self, command: bytes, args: list[bytes]) -> bytes:
+        with self.lock:
+            if command == b"SELECT":
+                return b"+OK\r\n"
+            if command == b"GET":
+                return self._bulk(self._live(args[0]))
+            if command == b"MGET":
+                return b"*%d\r\n" % len(args) + b"".join(self._bulk(self._live(key)) for key in args)
+            if command == b"SET":
+                key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+                if b"NX" in options and self._live(key) is not None:
+                    return b"$-1\r\n"
+                expires = 0.0
+                if b"PX" in options:
+                    expires = time.time() + int(args[2 + options.index(b"PX") + 1]) / 1000
+                self.values[key] = (expires, value)
+                return b"+OK\r\n"
+            if command == b"DEL":
+                return b":%d\r\n" % int(self.values.pop(args[0], None) is not None)
+            if command == b"INCRBY":
+                value = int(self._live(args[0]) or 0) + int(args[1])
+                self.values[args[0]] = (0.0, str(value).encode())
+                return b":%d\r\n" % value
+            return b"-ERR unknown command\r\n"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture(params=["memory", "file", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryStateBackend()
+    elif request.param == "file":
+        yield FileStateBackend(str(tmp_path))
+    else:
+        server = _RedisStandIn()
+        client = RedisStateBackend(f"redis://127.0.0.1:{server.port}/0")
+        yield client
+        client.close()
+        server.close()
+
+
+class TestBackends:
+    """Every backend implements the same key/value contract."""
+
+    def test_get_set_delete(self, backend):
+        assert backend.get("missing") is None
+        backend.set("k", b"v")
+        assert backend.get("k") == b"v"
+        assert backend.get_many(["k", "missing"]) == [b"v", None]
+        backend.delete("k")
+        assert backend.get("k") is None
+
+    def test_ttl_expires(self, backend):
+        backend.set("short", b"v", ttl=0.05)
+        assert backend.get("short") == b"v"
+        time.sleep(0.1)
+        assert backend.get("short") is None
+
+    def test_add_only_when_absent(self, backend):
+        assert backend.add("once", b"first") is True
+        assert backend.add("once", b"second") is False
+        assert backend.get("once") == b"first"
+
+    def test_incr(self, backend):
+        assert backend.incr("counter") == 1
+        assert backend.incr("counter", 5) == 6
+
+
+class TestFileBackend:
+    """Several workers on one host share a directory."""
+
+    def test_instances_see_each_other(self, tmp_path):
+        worker_a, worker_b = FileStateBackend(str(tmp_path)), FileStateBackend(str(tmp_path))
+        worker_a.set("k", b"v")
+        assert worker_b.get("k") == b"v"
+
+    def test_concurrent_increments_are_not_lost(self, tmp_path):
+        workers = [FileStateBackend(str(tmp_path)) for _ in range(4)]
+
+        def hammer(worker):
+            for _ in range(50):
+                worker.incr("counter")
+
+        threads = [threading.Thread(target=hammer, args=(worker,)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert workers[0].get("counter") == b"200"
+
+    def test_prefix_namespaces_keys(self, tmp_path):
+        one = PrefixedBackend(FileStateBackend(str(tmp_path)), "one:")
+        two = PrefixedBackend(FileStateBackend(str(tmp_path)), "two:")
+        one.set("k", b"1")
+        assert two.get("k") is None
+
+
+class TestRedisBackend:
+    """Redis-protocol specifics."""
+
+    def test_authenticates_and_reconnects(self):
+        server = _RedisStandIn(password="s3cret")
+        try:
+            client = RedisStateBackend(f"redis://:s3cret@127.0.0.1:{server.port}/2")
+            client.set("k", b"v")
+            client._sock.close()  # simulate a dropped connection
+            assert client.get("k") == b"v"
+        finally:
+            server.close()
+
+    def test_error_reply_raises(self):
+        server = _RedisStandIn(password="s3cret")
+        try:
+            client = RedisStateBackend(f"redis://:wrong@127.0.0.1:{server.port}")
+            with pytest.raises(StateBackendError):
+                client.get("k")
+        finally:
+            server.close()
+
+    def test_unreachable_server_raises(self):
+        client = RedisStateBackend("redis://127.0.0.1:1", timeout=0.2)
+        with pytest.raises(StateBackendError):
+            client.get("k")
+
+
+class TestStateSync:
+    """Generation counters keep workers in step."""
+
+    @pytest.fixture
+    def workers(self, tmp_path):
+        return StateSync(FileStateBackend(str(tmp_path))), StateSync(FileStateBackend(str(tmp_path)))
+
+    @pytest.mark.asyncio
+    async def test_bump_runs_handler_on_other_workers_only(self, workers):
+        worker_a, worker_b = workers
+        seen_a, seen_b = [], []
+        worker_a.subscribe("settings", seen_a.append)
+        worker_b.subscribe("settings", seen_b.append)
+
+        generation = worker_a.bump("settings")
+        assert await worker_a.poll() == []
+        assert await worker_b.poll() == ["settings"]
+        assert seen_a == [] and seen_b == [generation]
+        assert await worker_b.poll() == []  # handled once
+
+    @pytest.mark.asyncio
+    async def test_async_handlers_are_awaited(self, workers):
+        worker_a, worker_b = workers
+        done = []
+
+        async def handler(generation):
+            await asyncio.sleep(0)
+            done.append(generation)
+
+        worker_b.subscribe("jwks", handler)
+        await worker_a.notify("jwks")
+        await worker_b.poll()
+        assert done == [1]
+
+    def test_claim_is_shared_per_fingerprint(self, workers):
+        worker_a, worker_b = workers
+        first = worker_a.claim("models", (1, 100))
+        assert worker_b.claim("models", (1, 100)) == first
+        assert worker_b.claim("models", (2, 100)) == first + 1
+
+    @pytest.mark.asyncio
+    async def test_watch_claims_on_fingerprint_change(self, workers):
+        worker_a, worker_b = workers
+        fingerprint = {"value": 1}
+        seen_a, seen_b = [], []
+        for worker, seen in ((worker_a, seen_a), (worker_b, seen_b)):
+            worker.watch("config", lambda: fingerprint["value"])
+            worker.subscribe("config", seen.append)
+
+        assert await worker_a.poll() == []
+        fingerprint["value"] = 2
+        await worker_a.poll()
+        await worker_b.poll()
+        assert seen_a == seen_b == [1]  # both followed one shared generation
+
+
+def _model(model_id: str) -> dict:
+    return {"id": model_id, "created": 1717200000, "owned_by": "anthropic"}
+
+
+class TestCatalogAcrossWorkers:
+    """Catalog versions agree across workers."""
+
+    def test_same_content_same_version(self, tmp_path):
+        catalog_file = tmp_path / "models.json"
+        catalog_file.write_text(json.dumps([_model("m1")]))
+        syncs = [StateSync(FileStateBackend(str(tmp_path / "state"))) for _ in range(2)]
+
+        def catalog_for(sync):
+            def next_version(fingerprint):
+                return sync.bump("models") if fingerprint is None else sync.claim("models", fingerprint)
+
+            return ModelCatalog(FileCatalogSource(str(catalog_file)), next_version=next_version)
+
+        worker_a, worker_b = catalog_for(syncs[0]), catalog_for(syncs[1])
+        assert worker_a.version == worker_b.version == 1
+
+        catalog_file.write_text(json.dumps([_model("m1"), _model("m2")]))
+        os.utime(catalog_file, ns=(0, 1))
+        assert worker_b.reload() and worker_a.reload()
+        assert worker_a.version == worker_b.version == 2
+
+        worker_a.reload(force=True)  # explicit reload: a new version the others follow
+        assert worker_a.version == 3
+        assert syncs[1].generation("models") == 3
+
+
+class TestConfigReload:
+    """get_settings() follows reloads announced by any worker."""
+
+    def test_reload_config_clears_settings_cache(self, monkeypatch):
+        before = get_settings()
+        monkeypatch.setenv("APP_NAME", "Reloaded Proxy")
+        try:
+            assert shared_state.reload_config().APP_NAME == "Reloaded Proxy"
+            assert get_settings() is not before
+        finally:
+            monkeypatch.delenv("APP_NAME")
+            get_settings.cache_clear()
@@ -0,0 +1,88 @@
+"""Tests for the async single-flight utility and the reloads it coalesces."""
+
+import asyncio
+import json
+
+import pytest
+
+from app.services.model_service import FileCatalogSource, ModelCatalog
+from app.services.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Concurrent callers for one key share a single call."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(10)))
+        assert results == ["value"] * 10
+        assert len(calls) == 1
+        assert flight.stats() == {"in_flight": 0, "calls": 1, "shared": 9}
+
+    @pytest.mark.asyncio
+    async def test_failure_reaches_every_caller_and_is_not_cached(self):
+        flight = SingleFlight()
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            if len(attempts) == 1:
+                raise RuntimeError("upstream down")
+            return "recovered"
+
+        results = await asyncio.gather(*(flight.do("key", flaky) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await flight.do("key", flaky) == "recovered"
+        assert len(attempts) == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_the_others(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return 42
+
+        leaver = asyncio.create_task(flight.do("key", work))
+        stayer = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        leaver.cancel()
+        release.set()
+        assert await stayer == 42
+        with pytest.raises(asyncio.CancelledError):
+            await leaver
+
+    @pytest.mark.asyncio
+    async def test_keys_are_independent(self):
+        flight = SingleFlight()
+
+        async def echo(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        assert await asyncio.gather(flight.do("a", lambda: echo("a")), flight.do("b", lambda: echo("b"))) == ["a", "b"]
+        assert flight.calls == 2
+
+
+class TestCatalogRefresh:
+    """Concurrent catalog reload triggers run one load."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_refreshes_coalesce(self, tmp_path):
+        catalog_file = tmp_path / "models.json"
+        catalog_file.write_text(json.dumps([{"id": "m1", "created": 1717200000, "owned_by": "anthropic"}]))
+        catalog = ModelCatalog(FileCatalogSource(str(catalog_file)))
+
+        results = await asyncio.gather(*(catalog.refresh(force=True) for _ in range(5)))
+        assert results == [True] * 5
+        assert catalog.version == 2
@@ -1,4 +1,6 @@
-"""Tests for SSO login and callback routes."""
+"""Tests for SSO login, callback and refresh routes."""
+
+from urllib.parse import parse_qsl, urlsplit
 
 
 class TestSSOLogin:
@@ -40,3 +42,53 @@ class TestSSOCallback:
         """Missing authorization code should return 400."""
         response = client.get("/sso/callback")
         assert response.status_code == 400
+
+
+def _login(client) -> dict:
+    response = client.get(
+        "/sso/login",
+        params={"redirect": "http://127.0.0.1:8080/callback"},
+        follow_redirects=False,
+    )
+    return dict(parse_qsl(urlsplit(response.headers["location"]).query))
+
+
+class TestSSORefresh:
+    """POST /sso/refresh"""
+
+    def test_login_returns_refresh_token(self, client):
+        assert _login(client)["refresh_token"]
+
+    def test_refresh_issues_working_access_token(self, client):
+        tokens = _login(client)
+        response = client.post("/sso/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["token_type"] == "bearer"
+        assert body["refresh_token"] != tokens["refresh_token"]
+
+        models = client.get("/v1/models", headers={"Authorization": f"Bearer {body['access_token']}"})
+        assert models.status_code == 200
+
+    def test_refresh_token_rotates(self, client):
+        first = _login(client)["refresh_token"]
+        second = client.post("/sso/refresh", json={"refresh_token": first}).json()["refresh_token"]
+        third = client.post("/sso/refresh", json={"refresh_token": second})
+        assert third.status_code == 200
+
+    def test_reuse_revokes_the_session(self, client):
+        first = _login(client)["refresh_token"]
+        second = client.post("/sso/refresh", json={"refresh_token": first}).json()["refresh_token"]
+
+        replay = client.post("/sso/refresh", json={"refresh_token": first})
+        assert replay.status_code == 401
+        assert "reuse" in replay.json()["detail"]
+        # The legitimate holder's newer token is revoked with the family.
+        assert client.post("/sso/refresh", json={"refresh_token": second}).status_code == 401
+
+    def test_unknown_refresh_token(self, client):
+        response = client.post("/sso/refresh", json={"refresh_token": "not-a-real-token"})
+        assert response.status_code == 401
+
+    def test_missing_body(self, client):
+        assert client.post("/sso/refresh").status_code == 422
@@ -0,0 +1,66 @@
+"""Tests for lazy imports, startup pre-warming and the startup profiler."""
+
+import os
+import subprocess
+import sys
+
+from app import startup
+from app.startup import StartupProfile, parse_import_times, summarize_imports
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _io_helpers
+import time:      3000 |       3120 |   httpx
+import time:       500 |        500 |   app.config
+import time:      1000 |       4620 | app.main
+"""
+
+
+class TestLazyImports:
+    """Heavy dependencies stay off the import path of app.main."""
+
+    def test_app_import_does_not_load_httpx_or_jwt(self):
+        code = "import sys, app.main; print(sorted({'httpx', 'httpcore', 'jwt'} & set(sys.modules)))"
+        completed = subprocess.run(
+            [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=60
+        )
+        assert completed.returncode == 0, completed.stderr
+        assert completed.stdout.strip() == "[]"
+
+
+class TestStartupProfile:
+    """Lifespan phases are timed and exported."""
+
+    def test_lifespan_phases_are_recorded(self, client):
+        client.portal.call(startup.wait_for_prewarm)
+        phases = startup.get_startup_profile().phases
+        expected = ("ready", "model_catalog", "settings_policy", "state_sync", "prewarm_http_client", "prewarm_imports")
+        assert set(expected) <= set(phases)
+        assert "jwt" in sys.modules
+
+        body = client.get("/metrics").text
+        assert 'startup_phase_seconds{phase="ready"}' in body
+
+    def test_report_is_slowest_first(self):
+        profile = StartupProfile()
+        profile.record("fast", 0.001)
+        profile.record("slow", 0.5)
+        assert profile.report().splitlines()[0].split()[0] == "slow"
+
+
+class TestImportTimes:
+    """python -X importtime output is summarized per package and app module."""
+
+    def test_parse(self):
+        times = parse_import_times(IMPORTTIME_OUTPUT)
+        assert [entry.module for entry in times] == ["_io_helpers", "httpx", "app.config", "app.main"]
+        assert (times[1].self_us, times[1].cumulative_us) == (3000, 3120)
+
+    def test_summary(self):
+        summary = summarize_imports(parse_import_times(IMPORTTIME_OUTPUT), top=5)
+        assert "Total import time: 4.6 ms" in summary
+        packages = summary.split("Packages (self time):")[1].split("App modules")[0].split()
+        assert packages[0] == "httpx"
+        assert "app.main" in summary.split("App modules")[1]
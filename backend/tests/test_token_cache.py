@@ -0,0 +1,78 @@
+"""Tests for the verified-token cache in front of validate_token."""
+
+import time
+
+from app.auth import entra
+from app.auth.entra import _mock_token, validate_token
+from app.auth.token_cache import TokenCache
+from app.config import Settings
+
+
+class TestTokenCache:
+    """LRU / expiry / invalidation behaviour of TokenCache."""
+
+    def test_hit_after_put(self, settings):
+        cache = TokenCache(max_size=4)
+        cache.put("tok", {"sub": "a", "exp": time.time() + 60}, settings)
+        assert cache.get("tok", settings)["sub"] == "a"
+        assert cache.stats()["hits"] == 1
+
+    def test_miss_counts(self, settings):
+        cache = TokenCache(max_size=4)
+        assert cache.get("unknown", settings) is None
+        assert cache.stats()["misses"] == 1
+
+    def test_peek_leaves_counters_alone(self, settings):
+        cache = TokenCache(max_size=4)
+        cache.put("tok", {"sub": "a", "exp": time.time() + 60}, settings)
+        assert cache.peek("tok", settings)["sub"] == "a" and cache.peek("unknown", settings) is None
+        assert cache.stats()["hits"] == 0 and cache.stats()["misses"] == 0
+
+    def test_expired_entry_is_dropped(self, settings):
+        cache = TokenCache(max_size=4)
+        cache.put("tok", {"exp": time.time() - 1}, settings)
+        assert cache.get("tok", settings) is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self, settings):
+        cache = TokenCache(max_size=2)
+        exp = time.time() + 60
+        cache.put("a", {"exp": exp}, settings)
+        cache.put("b", {"exp": exp}, settings)
+        cache.get("a", settings)  # "b" is now least recently used
+        cache.put("c", {"exp": exp}, settings)
+        assert cache.get("b", settings) is None
+        assert cache.get("a", settings) is not None
+        assert cache.get("c", settings) is not None
+
+    def test_tokens_without_exp_are_not_cached(self, settings):
+        cache = TokenCache(max_size=4)
+        cache.put("tok", {"sub": "a"}, settings)
+        assert len(cache) == 0
+
+    def test_settings_change_clears_cache(self, settings):
+        cache = TokenCache(max_size=4)
+        cache.put("tok", {"exp": time.time() + 60}, settings)
+        rotated = Settings(JWT_SECRET="rotated-secret")
+        assert cache.get("tok", rotated) is None
+        assert len(cache) == 0
+
+
+class TestValidateTokenCaching:
+    """validate_token should only verify a given token once."""
+
+    def test_repeat_validation_skips_decode(self, settings, monkeypatch):
+        token = _mock_token(settings)["access_token"]
+        first = validate_token(token, settings)
+        assert first is not None
+
+        def _fail(*_args, **_kwargs):
+            raise AssertionError("token should have been served from the cache")
+
+        monkeypatch.setattr(entra, "_decode_token", _fail)
+        assert validate_token(token, settings) == first
+
+    def test_rotated_secret_invalidates_cached_token(self, settings):
+        token = _mock_token(settings)["access_token"]
+        assert validate_token(token, settings) is not None
+        assert validate_token(token, Settings(JWT_SECRET="rotated-secret")) is None
@@ -0,0 +1,89 @@
+"""Tests for the change broadcaster and /api/updates subscriptions."""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.services.broadcaster import VersionBroadcaster, sse_stream
+
+
+class TestVersionBroadcaster:
+    """Fan-out of version bumps to waiting subscribers."""
+
+    @pytest.mark.asyncio
+    async def test_wait_wakes_all_waiters_on_publish(self):
+        broadcaster = VersionBroadcaster()
+        broadcaster.publish("models", 1)
+
+        waiters = [asyncio.create_task(broadcaster.wait({"models": 1}, timeout=5)) for _ in range(500)]
+        await asyncio.sleep(0)
+        broadcaster.publish("models", 2)
+
+        assert all(await asyncio.gather(*waiters))
+
+    @pytest.mark.asyncio
+    async def test_wait_times_out_without_change(self):
+        broadcaster = VersionBroadcaster()
+        broadcaster.publish("models", 1)
+        assert await broadcaster.wait({"models": 1}, timeout=0.01) is False
+
+    @pytest.mark.asyncio
+    async def test_wait_returns_immediately_if_client_is_behind(self):
+        broadcaster = VersionBroadcaster()
+        broadcaster.publish("settings", 3)
+        assert await broadcaster.wait({"settings": 2}, timeout=0) is True
+
+    @pytest.mark.asyncio
+    async def test_publish_from_another_thread(self):
+        broadcaster = VersionBroadcaster()
+        broadcaster.bind(asyncio.get_running_loop())
+        broadcaster.publish("models", 1)
+
+        waiter = asyncio.create_task(broadcaster.wait({"models": 1}, timeout=5))
+        await asyncio.sleep(0)
+        threading.Thread(target=broadcaster.publish, args=("models", 2)).start()
+
+        assert await waiter is True
+        assert broadcaster.versions == {"models": 2}
+
+    @pytest.mark.asyncio
+    async def test_sse_stream_emits_versions_and_keepalives(self):
+        broadcaster = VersionBroadcaster()
+        broadcaster.publish("models", 1)
+        stream = sse_stream(broadcaster, heartbeat=0.01)
+
+        assert (await anext(stream)).startswith(b"retry:")
+        assert await anext(stream) == b'event: versions\ndata: {"models": 1}\n\n'
+        assert broadcaster.subscribers == 1
+        assert await anext(stream) == b": keepalive\n\n"
+
+        broadcaster.publish("models", 2)
+        assert await anext(stream) == b'event: versions\ndata: {"models": 2}\n\n'
+        await stream.aclose()
+        assert broadcaster.subscribers == 0
+
+
+class TestUpdatesRoutes:
+    """GET /api/updates long-poll."""
+
+    def test_long_poll_returns_current_versions(self, client, auth_headers):
+        response = client.get("/api/updates", headers=auth_headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["changed"] is True
+        assert body["versions"]["models"] >= 1
+        assert body["versions"]["settings"] >= 1
+
+    def test_long_poll_times_out_when_up_to_date(self, client, auth_headers):
+        versions = client.get("/api/updates", headers=auth_headers).json()["versions"]
+        response = client.get(
+            "/api/updates",
+            params={**versions, "timeout": 0.05},
+            headers=auth_headers,
+        )
+        assert response.json() == {"changed": False, "versions": versions}
+
+    def test_updates_unauthenticated(self, client):
+        assert client.get("/api/updates").status_code == 403
+        assert client.get("/api/updates/stream").status_code == 403
@@ -0,0 +1,270 @@
+"""Tests for multi-upstream routing: balancing, circuit breakers, health checks and failover."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.auth.entra import sign_session_token
+from app.config import get_settings
+from app.main import app
+from app.services import inference_proxy
+from app.services.model_service import CatalogSnapshot, get_model_catalog
+from app.services.upstream_pool import BreakerPolicy, CircuitBreaker, UpstreamPool, get_upstream_pool, parse_pools
+
+MODEL = "claude-sonnet-4-20250514"
+REQUEST = {"model": MODEL, "max_tokens": 16, "messages": [{"role": "user", "content": "hi"}]}
+
+POLICY = BreakerPolicy(window=10, min_requests=4, error_ratio=0.5, open_seconds=5)
+
+
+def _pool(settings, **overrides) -> UpstreamPool:
+    return UpstreamPool(settings.model_copy(update={"UPSTREAM_BASE_URL": "http://a,http://b", **overrides}))
+
+
+class TestParsePools:
+    """UPSTREAM_BASE_URL is the default pool; UPSTREAM_POOLS adds named ones."""
+
+    def test_pools(self):
+        pools = parse_pools("http://a/, http://b", "eu=http://c;us=http://d,http://e")
+        assert pools == {"default": ["http://a", "http://b"], "eu": ["http://c"], "us": ["http://d", "http://e"]}
+
+    @pytest.mark.parametrize("spec", ["eu", "=http://c", "eu="])
+    def test_invalid(self, spec):
+        with pytest.raises(ValueError):
+            parse_pools("", spec)
+
+
+class TestCircuitBreaker:
+    """Closed → open on an error spike → half-open probe → closed or open."""
+
+    def test_opens_on_error_ratio(self):
+        breaker = CircuitBreaker(POLICY)
+        for ok in (True, False, True):
+            breaker.record(ok, now=1.0)
+        assert breaker.state == breaker.CLOSED  # below min_requests
+        breaker.record(False, now=1.0)
+        assert breaker.state == breaker.OPEN and not breaker.allows(2.0)
+
+    def test_errors_outside_the_window_do_not_count(self):
+        breaker = CircuitBreaker(POLICY)
+        for now in (1.0, 2.0, 3.0, 12.0):
+            breaker.record(False, now)
+        assert breaker.state == breaker.CLOSED
+
+    def test_half_open_admits_one_probe(self):
+        breaker = CircuitBreaker(POLICY)
+        for _ in range(4):
+            breaker.record(False, now=1.0)
+        assert breaker.allows(7.0)
+        probe = breaker.attempt()
+        assert probe and not breaker.allows(7.0)  # the probe is in flight
+        breaker.record(True, now=7.5, probe=probe)
+        assert breaker.state == breaker.CLOSED
+
+    def test_probe_without_outcome_frees_the_slot(self):
+        breaker = CircuitBreaker(POLICY)
+        for _ in range(4):
+            breaker.record(False, now=1.0)
+        breaker.allows(7.0)
+        breaker.release(breaker.attempt())  # e.g. a pool timeout: no response to judge the target by
+        assert breaker.state == breaker.HALF_OPEN and breaker.allows(100.0)
+
+    def test_request_from_before_the_opening_does_not_decide(self, settings):
+        target = _pool(settings).pools["default"][0]
+        breaker = target.breaker
+        long_running = target.begin()  # sent while the breaker was closed
+        for _ in range(breaker.policy.min_requests):
+            breaker.record(False, now=1.0)
+        half_open_at = 1.0 + breaker.policy.open_seconds
+        assert breaker.allows(half_open_at) and breaker.state == breaker.HALF_OPEN
+        probe = target.begin()
+        assert probe and not long_running
+
+        target.observe(0.01, True, 1.0, long_running)
+        target.release(long_running)
+        assert breaker.state == breaker.HALF_OPEN
+        assert not breaker.allows(half_open_at)  # still one probe at a time
+
+        target.observe(0.01, False, 1.0, probe)
+        assert breaker.state == breaker.OPEN
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(POLICY)
+        for _ in range(4):
+            breaker.record(False, now=1.0)
+        breaker.allows(7.0)
+        breaker.record(False, now=7.5, probe=breaker.attempt())
+        assert breaker.state == breaker.OPEN and breaker.opened == 2
+
+
+class TestBalancing:
+    """Targets are picked by peak-EWMA latency × load, or by outstanding requests."""
+
+    def test_ewma_prefers_the_faster_target(self, settings):
+        pool = _pool(settings)
+        a, b = pool.pools["default"]
+        a.observe(0.5, True, pool.decay)
+        b.observe(0.05, True, pool.decay)
+        assert pool.choose("default") is b
+        for _ in range(10):
+            b.begin()  # b is now busy enough that a is cheaper
+        assert pool.choose("default") is a
+
+    def test_latency_spike_counts_at_once(self, settings):
+        pool = _pool(settings)
+        a, _ = pool.pools["default"]
+        a.observe(0.05, True, pool.decay)
+        a.observe(2.0, True, pool.decay)
+        assert a.ewma == 2.0
+        a.observe(0.05, True, pool.decay)
+        assert 0.05 < a.ewma <= 2.0  # decays back rather than forgetting
+
+    def test_least_outstanding(self, settings):
+        pool = _pool(settings, UPSTREAM_BALANCER="least_outstanding")
+        a, b = pool.pools["default"]
+        a.observe(0.01, True, pool.decay)
+        a.begin()
+        assert pool.choose("default") is b
+
+    def test_skips_unhealthy_and_open_targets(self, settings):
+        pool = _pool(settings)
+        a, b = pool.pools["default"]
+        a.healthy = False
+        assert pool.choose("default") is b
+        for _ in range(5):
+            b.observe(0.01, False, pool.decay)
+        assert b.breaker.state == b.breaker.OPEN
+        assert pool.choose("default") in (a, b)  # nothing available: try anyway
+        assert pool.choose("default", exclude=[a, b]) is None
+
+    def test_reconfigure_keeps_target_state(self, settings):
+        pool = _pool(settings)
+        a, _ = pool.pools["default"]
+        a.observe(0.3, True, pool.decay)
+        pool.configure(settings.model_copy(update={"UPSTREAM_BASE_URL": "http://a,http://c"}))
+        assert pool.pools["default"][0] is a and pool.pools["default"][1].url == "http://c"
+
+    def test_invalid_balancer(self, settings):
+        with pytest.raises(ValueError):
+            _pool(settings, UPSTREAM_BALANCER="round_robin")
+
+
+class TestProxyRouting:
+    """The inference routes balance and fail over across fake upstreams."""
+
+    def test_slow_upstream_gets_little_traffic(self, client, auth_headers, fake_upstreams):
+        slow, fast = fake_upstreams
+        slow.delay = 0.2
+        for _ in range(6):
+            assert client.post("/v1/messages", json=REQUEST, headers=auth_headers).status_code == 200
+        assert len(slow.requests) == 1 and len(fast.requests) == 5
+
+    def test_fails_over_when_unreachable(self, client, auth_headers, settings, fake_upstreams, monkeypatch):
+        _, live = fake_upstreams
+        monkeypatch.setattr(settings, "UPSTREAM_BASE_URL", f"http://127.0.0.1:1,{live.url}")
+        response = client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        assert response.status_code == 200 and len(live.requests) == 1
+        dead = get_upstream_pool(settings).pools["default"][0]
+        assert dead.failures == 1 and dead.outstanding == 0
+
+    def test_fails_over_when_declined(self, client, auth_headers, fake_upstreams):
+        overloaded, other = fake_upstreams
+        overloaded.status = 503
+        response = client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        assert response.status_code == 200
+        assert len(overloaded.requests) == 1 and len(other.requests) == 1
+
+    def test_last_answer_passes_through_when_all_decline(self, client, auth_headers, fake_upstreams):
+        for server in fake_upstreams:
+            server.status = 429
+        response = client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        assert response.status_code == 429
+        assert [len(server.requests) for server in fake_upstreams] == [1, 1]
+
+    def test_server_errors_are_not_retried(self, client, auth_headers, fake_upstreams):
+        failing, other = fake_upstreams
+        failing.status = 500  # the upstream may have started work
+        assert client.post("/v1/messages", json=REQUEST, headers=auth_headers).status_code == 500
+        assert len(other.requests) == 0
+
+    def test_open_breaker_diverts_traffic(self, client, auth_headers, settings, fake_upstreams):
+        broken, healthy = fake_upstreams
+        target = get_upstream_pool(settings).pools["default"][0]
+        for _ in range(settings.UPSTREAM_BREAKER_MIN_REQUESTS):
+            target.breaker.record(False, time.monotonic())
+        for _ in range(3):
+            client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        assert len(broken.requests) == 0 and len(healthy.requests) == 3
+
+    @pytest.mark.asyncio
+    async def test_active_health_check(self, settings, fake_upstreams):
+        down, up = fake_upstreams
+        down.status = 503
+        pool = get_upstream_pool(settings)
+        async with httpx.AsyncClient() as http:
+            await pool.check(http, settings)
+        assert [target.healthy for target in pool.pools["default"]] == [False, True]
+        assert down.health_checks == 1 and pool.choose("default").url == up.url
+
+    def test_model_routed_to_its_pool(self, client, auth_headers, settings, fake_upstreams, monkeypatch):
+        default, eu = fake_upstreams
+        monkeypatch.setattr(settings, "UPSTREAM_BASE_URL", default.url)
+        monkeypatch.setattr(settings, "UPSTREAM_POOLS", f"eu={eu.url}")
+        catalog = get_model_catalog()
+        models = [
+            model.model_copy(update={"upstream": "eu"}) if model.id == MODEL else model
+            for model in catalog.snapshot.models
+        ]
+        monkeypatch.setattr(catalog, "_snapshot", CatalogSnapshot.build(catalog.version, models))
+
+        client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        client.post("/v1/messages", json={**REQUEST, "model": "claude-3-haiku-20240307"}, headers=auth_headers)
+        assert [r["body"]["model"] for r in eu.requests] == [MODEL]
+        assert [r["body"]["model"] for r in default.requests] == ["claude-3-haiku-20240307"]
+
+    def test_unknown_pool_is_unavailable(self, client, auth_headers, settings, fake_upstreams, monkeypatch):
+        catalog = get_model_catalog()
+        models = [model.model_copy(update={"upstream": "apac"}) for model in catalog.snapshot.models]
+        monkeypatch.setattr(catalog, "_snapshot", CatalogSnapshot.build(catalog.version, models))
+        response = client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        assert response.status_code == 503 and "apac" in response.json()["detail"]
+
+    def test_no_target_left_is_unavailable(self, client, auth_headers, fake_upstreams, monkeypatch):
+        monkeypatch.setattr(UpstreamPool, "choose", lambda self, pool, exclude=(): None)
+        response = client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        assert response.status_code == 503
+
+    @pytest.mark.asyncio
+    async def test_cancel_before_headers_closes_the_owned_client(self, settings, fake_upstreams, monkeypatch):
+        async def hang(request):
+            await asyncio.sleep(60)
+
+        owned = httpx.AsyncClient(transport=httpx.MockTransport(hang))
+        monkeypatch.setattr(inference_proxy, "get_upstream_client", lambda: None)
+        monkeypatch.setattr(inference_proxy, "build_upstream_client", lambda settings: owned)
+        task = asyncio.create_task(inference_proxy.forward("messages", b"{}", {}, settings))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert owned.is_closed
+        assert all(target.outstanding == 0 for target in get_upstream_pool(settings).pools["default"])
+
+    def test_admin_status(self, client, settings, fake_upstreams):
+        overridden = settings.model_copy(update={"ADMIN_GROUPS": "proxy-admins"})
+        app.dependency_overrides[get_settings] = lambda: overridden
+        try:
+            token = sign_session_token({"sub": "admin", "roles": ["proxy-admins"]}, overridden)["access_token"]
+            status = client.get("/admin/upstreams", headers={"Authorization": f"Bearer {token}"}).json()
+        finally:
+            app.dependency_overrides.pop(get_settings, None)
+        assert [entry["url"] for entry in status] == [server.url for server in fake_upstreams]
+        assert status[0]["breaker"] == "closed" and status[0]["healthy"] is True
+
+    def test_metrics(self, client, auth_headers, fake_upstreams):
+        client.post("/v1/messages", json=REQUEST, headers=auth_headers)
+        body = client.get("/metrics").text
+        assert f'upstream_target_up{{pool="default",target="{fake_upstreams[0].url}"}} 1' in body
+        assert "upstream_target_breaker_open" in body
@@ -0,0 +1,137 @@
+"""Tests for usage accounting: metering, the ring buffer and the SQLite store."""
+
+import json
+import sqlite3
+import uuid
+
+import pytest
+
+from app.auth.entra import sign_session_token
+from app.config import get_settings
+from app.main import app
+from app.services.usage import SQLiteUsageStore, UsageLedger, UsageRecord, get_usage_ledger
+
+MODEL = "claude-sonnet-4-20250514"
+
+
+def _feed(meter, body: bytes, size: int) -> None:
+    for offset in range(0, len(body), size):
+        meter.feed(body[offset:offset + size])
+
+
+def _record(user="u1", model=MODEL, tokens=(10, 5), status=200) -> UsageRecord:
+    return UsageRecord(1.0, user, model, "messages", status, "completed", True, *tokens, 1.0, 2.0)
+
+
+ANTHROPIC_STREAM = (
+    b'event: message_start\ndata: {"type": "message_start", "message": {"usage": {"input_tokens": 25, '
+    b'"output_tokens": 1}}}\n\n'
+    b'event: content_block_delta\ndata: {"type": "content_block_delta", "delta": {"text": "the usage was"}}\n\n'
+    b'event: message_delta\ndata: {"type": "message_delta", "usage": {"output_tokens": 42}}\n\n'
+    b'event: message_stop\ndata: {"type": "message_stop"}\n\n'
+)
+OPENAI_STREAM = (
+    b'data: {"choices": [{"delta": {"content": "hi"}}]}\n\n'
+    b'data: {"choices": [], "usage": {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10}}\n\n'
+    b"data: [DONE]\n\n"
+)
+
+
+class TestUsageMeter:
+    """Usage is picked out of relayed chunks, however they are split."""
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+    def test_anthropic_stream(self, tmp_path, chunk_size):
+        ledger = UsageLedger(SQLiteUsageStore(str(tmp_path / "usage.sqlite3")), 100, 10, flush_interval=60)
+        meter = ledger.meter({"oid": "o1", "sub": "s1"}, MODEL, "messages", stream=True)
+        meter.response_started(200, "text/event-stream; charset=utf-8")
+        _feed(meter, ANTHROPIC_STREAM, chunk_size)
+        meter.finish("completed")
+
+        (record,) = ledger._queue
+        assert (record.user, record.input_tokens, record.output_tokens) == ("o1", 25, 42)
+
+    def test_openai_stream(self, tmp_path):
+        ledger = UsageLedger(SQLiteUsageStore(str(tmp_path / "usage.sqlite3")), 100, 10, flush_interval=60)
+        meter = ledger.meter({"sub": "s1"}, MODEL, "chat_completions", stream=True)
+        meter.response_started(200, "text/event-stream")
+        _feed(meter, OPENAI_STREAM, 13)
+        meter.finish("completed")
+        assert (ledger._queue[0].input_tokens, ledger._queue[0].output_tokens) == (7, 3)
+
+    def test_json_body_reads_trailing_usage_only(self, tmp_path):
+        ledger = UsageLedger(SQLiteUsageStore(str(tmp_path / "usage.sqlite3")), 100, 10, flush_interval=60)
+        meter = ledger.meter({"sub": "s1"}, MODEL, "messages", stream=False)
+        meter.response_started(200, "application/json")
+        body = {
+            "content": [{"type": "text", "text": 'a "usage": {"input_tokens": 999}'}],
+            "usage": {"input_tokens": 4, "output_tokens": 2},
+        }
+        _feed(meter, json.dumps(body).encode(), 16)
+        meter.finish("completed")
+        assert (ledger._queue[0].input_tokens, ledger._queue[0].output_tokens) == (4, 2)
+
+
+class TestUsageLedger:
+    """Records are buffered and flushed in batches."""
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_batches(self, tmp_path):
+        ledger = UsageLedger(SQLiteUsageStore(str(tmp_path / "usage.sqlite3")), 100, 10, flush_interval=60)
+        for index in range(25):
+            ledger.record(_record(user=f"u{index % 2}"))
+        assert await ledger.flush() == 25
+        assert ledger.stats()["buffered"] == 0
+
+        totals = {row["user"]: row for row in ledger.store.summary()}
+        assert totals["u0"]["requests"] == 13 and totals["u0"]["input_tokens"] == 130
+        assert totals["u1"]["output_tokens"] == 60
+        await ledger.stop()
+
+    def test_full_buffer_drops_oldest(self, tmp_path):
+        ledger = UsageLedger(SQLiteUsageStore(str(tmp_path / "usage.sqlite3")), 3, 10, flush_interval=60)
+        for index in range(5):
+            ledger.record(_record(user=f"u{index}"))
+        assert [record.user for record in ledger._queue] == ["u2", "u3", "u4"]
+        assert ledger.stats()["dropped"] == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_records(self, tmp_path, monkeypatch):
+        ledger = UsageLedger(SQLiteUsageStore(str(tmp_path / "usage.sqlite3")), 100, 10, flush_interval=60)
+        ledger.record(_record())
+
+        def broken(records):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        monkeypatch.setattr(ledger.store, "write", broken)
+        assert await ledger.flush() == 0
+        assert ledger.stats()["buffered"] == 1
+        monkeypatch.undo()
+        assert await ledger.flush() == 1
+
+
+class TestProxyAccounting:
+    """Proxied requests are attributed to the caller."""
+
+    @pytest.fixture
+    def admin_settings(self, settings, fake_upstream):
+        overridden = settings.model_copy(update={"ADMIN_GROUPS": "proxy-admins"})
+        app.dependency_overrides[get_settings] = lambda: overridden
+        yield overridden
+        app.dependency_overrides.pop(get_settings, None)
+
+    @pytest.mark.parametrize("stream, output_tokens", [(True, 5), (False, 1)])
+    def test_request_is_recorded(self, client, admin_settings, fake_upstream, stream, output_tokens):
+        user = f"user-{uuid.uuid4().hex}"
+        token = sign_session_token({"sub": user, "oid": user, "groups": ["proxy-admins"]}, admin_settings)
+        headers = {"Authorization": f"Bearer {token['access_token']}", "Accept-Encoding": "gzip"}
+        response = client.post("/v1/messages", json={"model": MODEL, "stream": stream}, headers=headers)
+        assert response.status_code == 200
+        assert fake_upstream.requests[-1]["headers"]["accept-encoding"] == "identity"  # metered as plain JSON
+
+        client.portal.call(get_usage_ledger().flush)
+        summary = client.get("/admin/usage", headers=headers).json()
+        (totals,) = [row for row in summary["totals"] if row["user"] == user]
+        assert (totals["model"], totals["requests"]) == (MODEL, 1)
+        assert (totals["input_tokens"], totals["output_tokens"]) == (12, output_tokens)
+        assert summary["pipeline"]["flushed"] >= 1